@@ -0,0 +1,426 @@
+"""
+Offline join-load benchmark for Discord Member Tracking Bot.
+Drives the storage path of on_member_join (get_or_create_server ->
+add_member -> flush/save) with fake members at fixed join rates, against
+servers pre-seeded with large histories, and compares storage modes.
+
+Every scenario is measured in a fresh process, so the reported RSS is not
+inflated by earlier scenarios. No Discord connection or network access is
+needed.
+
+Usage:
+    python benchmark.py
+    python benchmark.py --modes json,journal,sqlite --rates 10,100,1000 --servers 3 --seed 10000,100000
+    python benchmark.py --save baseline.json
+    python benchmark.py --baseline baseline.json   # exit code 1 on regressions
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta, timezone
+from types import SimpleNamespace
+import logger
+from data_manager import MultiServerDataManager
+from join_records import write_join_file
+from metrics import process_rss_bytes
+from stats import LatencyStats
+
+BASE_NAME = "join_logs"
+GUILD_ID_START = 900000000000000000
+USER_ID_START = 100000000000000000
+
+# Compared against a baseline run (relative change that counts as a regression)
+REGRESSION_CHECKS = (
+    ("p99_ms", "handler p99", 1),
+    ("persist_p99_ms", "persist p99", 1),
+    ("first_join_ms", "first join", 1),
+    ("rss_mb", "RSS", 1),
+    ("throughput", "throughput", -1)
+)
+
+def fake_guild(index):
+    """Build a stand-in for discord.Guild with the attributes the handler uses."""
+    return SimpleNamespace(id=GUILD_ID_START + index, name=f"Bench Server {index}", member_count=0)
+
+def fake_member(guild, user_id, now, rng):
+    """Build a stand-in for discord.Member with the attributes build_join_record uses."""
+    return SimpleNamespace(
+        id=user_id,
+        name=f"user{user_id % 1000000}",
+        discriminator=f"{user_id % 10000:04d}",
+        joined_at=now,
+        created_at=now - timedelta(days=rng.expovariate(1 / 400)),
+        avatar=None if rng.random() < 0.3 else "a1b2c3",
+        bot=False,
+        guild=guild
+    )
+
+def seed_records(count, rng, rejoin_ratio):
+    """
+    Generate a join history ending now, in the stored record format.
+    
+    Args:
+        count: Number of records
+        rng: random.Random instance
+        rejoin_ratio: Share of records that are rejoins of earlier users
+    
+    Yields:
+        Join record dictionaries, oldest first
+    """
+    start = datetime.now(timezone.utc) - timedelta(days=365)
+    step = timedelta(days=365) / max(count, 1)
+    counts = {}
+    next_user = USER_ID_START
+    for i in range(count):
+        if counts and rng.random() < rejoin_ratio:
+            user_id = USER_ID_START + rng.randrange(next_user - USER_ID_START)
+        else:
+            user_id = next_user
+            next_user += 1
+        counts[user_id] = counts.get(user_id, 0) + 1
+        joined = start + step * i
+        yield {
+            "username": f"user{user_id % 1000000}",
+            "user_id": str(user_id),
+            "discriminator": f"{user_id % 10000:04d}",
+            "joined_at": joined.isoformat(),
+            "account_created": (joined - timedelta(days=rng.expovariate(1 / 400))).isoformat(),
+            "has_avatar": rng.random() >= 0.3,
+            "join_count": counts[user_id],
+            "is_rejoin": counts[user_id] > 1
+        }
+
+def seed_directory(path, servers, records, rejoin_ratio):
+    """
+    Write pre-seeded per-server JSON files (the json mode layout).
+    
+    Args:
+        path: Directory to write into
+        servers: Number of servers
+        records: Join records per server
+        rejoin_ratio: Share of seeded joins that are rejoins
+    """
+    os.makedirs(path, exist_ok=True)
+    naming = MultiServerDataManager(os.path.join(path, BASE_NAME))
+    for index in range(servers):
+        guild = fake_guild(index)
+        filename = naming._get_filename(guild.name, guild.id)
+        rng = random.Random(index)
+        with open(filename, 'w', encoding='utf-8') as f:
+            write_join_file(f, {"server_name": guild.name, "server_id": str(guild.id)},
+                            seed_records(records, rng, rejoin_ratio))
+
+def prepare_directory(path, mode, servers):
+    """
+    Bring a seeded directory to the steady state of a long-running bot.
+    
+    Opens every server once in the given mode and saves it, so journal
+    snapshots, sidecar files and the SQLite import exist before measuring
+    (a real bot only pays for those once).
+    
+    Args:
+        path: Seeded directory
+        mode: Storage mode
+        servers: Number of servers
+    """
+    dm = MultiServerDataManager(os.path.join(path, BASE_NAME), storage_mode=mode)
+    rng = random.Random(0)
+    now = datetime.now(timezone.utc)
+    for index in range(servers):
+        guild = fake_guild(index)
+        server_dm = dm.get_or_create_server(guild)
+        server_dm.add_member(fake_member(guild, USER_ID_START - 1 - index, now, rng))
+        server_dm.save_data()
+    dm.close_all()
+    if dm.store is not None:
+        dm.store.close()
+
+async def drive_joins(scenario):
+    """
+    Run one scenario in this process and measure it.
+    
+    Joins are issued open-loop at the target rate, round-robin across
+    servers. If the handler cannot keep up the schedule falls behind and
+    the achieved throughput shows it. The run stops once every join was
+    issued or twice the duration has passed.
+    
+    Args:
+        scenario: Scenario dictionary (see build_scenarios)
+    
+    Returns:
+        Result dictionary
+    """
+    path = scenario["dir"]
+    rate, servers, duration = scenario["rate"], scenario["servers"], scenario["duration"]
+    total = max(1, int(rate * duration))
+    rng = random.Random(42)
+    
+    rss_before = process_rss_bytes()
+    dm = MultiServerDataManager(os.path.join(path, BASE_NAME), storage_mode=scenario["mode"])
+    dm.persist_latency = LatencyStats(window=total)
+    if scenario["flush"] != "sync":
+        dm.start_write_behind(mode=scenario["flush"], interval_ms=scenario["interval_ms"],
+                              batch_size=scenario["batch_size"])
+    
+    guilds = [fake_guild(index) for index in range(servers)]
+    latency = LatencyStats(window=total)
+    first_join = LatencyStats(window=servers)
+    seen = set()
+    next_user = USER_ID_START + 10 ** 12  # Never collides with seeded users
+    
+    start = time.perf_counter()
+    deadline = start + duration * 2  # Give a slow mode room, but bound the run
+    issued = 0
+    for i in range(total):
+        due = start + i / rate
+        delay = due - time.perf_counter()
+        if delay > 0:
+            await asyncio.sleep(delay)
+        elif time.perf_counter() > deadline:
+            break
+        
+        guild = guilds[i % servers]
+        if rng.random() < scenario["rejoin_ratio"]:
+            user_id = USER_ID_START + rng.randrange(scenario["seed"])
+        else:
+            user_id = next_user
+            next_user += 1
+        member = fake_member(guild, user_id, datetime.now(timezone.utc), rng)
+        
+        # Same storage calls as on_member_join
+        t0 = time.perf_counter()
+        server_dm = dm.get_or_create_server(member.guild)
+        server_dm.add_member(member)
+        elapsed = time.perf_counter() - t0
+        
+        if guild.id in seen:
+            latency.add(elapsed)
+        else:
+            seen.add(guild.id)
+            first_join.add(elapsed)  # Includes loading the server's index
+        issued += 1
+    handler_done = time.perf_counter()
+    
+    # Write-behind: wait for the flusher to persist everything still pending
+    await dm.stop_write_behind()
+    drained = time.perf_counter()
+    
+    # Shutdown path: the final save of every server
+    for server_dm in dm.get_all_servers():
+        server_dm.save_data()
+    saved = time.perf_counter()
+    rss_after = process_rss_bytes()
+    dm.close_all()
+    if dm.store is not None:
+        dm.store.close()
+    logger.flush()
+    
+    handler = latency.summary()
+    persist = dm.persist_latency.summary()
+    return {
+        "joins": issued,
+        "throughput": round(issued / (handler_done - start), 1),
+        "p50_ms": handler["p50_ms"],
+        "p99_ms": handler["p99_ms"],
+        "max_ms": handler["max_ms"],
+        "first_join_ms": first_join.summary()["max_ms"],
+        "persist_p99_ms": persist["p99_ms"],
+        "drain_ms": round((drained - handler_done) * 1000, 1),
+        "save_ms": round((saved - drained) * 1000, 1),
+        "rss_mb": round((rss_after or 0) / 1048576, 1),
+        "rss_growth_mb": round(((rss_after or 0) - (rss_before or 0)) / 1048576, 1)
+    }
+
+def run_scenario_process(scenario):
+    """
+    Measure one scenario in a child process.
+    
+    Args:
+        scenario: Scenario dictionary
+    
+    Returns:
+        Result dictionary, or None if the child failed
+    """
+    proc = subprocess.run(
+        [sys.executable, os.path.abspath(__file__), "--child", json.dumps(scenario)],
+        capture_output=True, text=True
+    )
+    lines = proc.stdout.strip().splitlines()
+    if proc.returncode != 0 or not lines:
+        sys.stderr.write(proc.stderr[-2000:])
+        return None
+    return json.loads(lines[-1])
+
+def build_scenarios(args):
+    """Expand the command line lists into one scenario per combination."""
+    scenarios = []
+    for seed in args.seed:
+        for flush in args.flush:
+            for rate in args.rates:
+                for mode in args.modes:
+                    scenarios.append({
+                        "mode": mode, "flush": flush, "rate": rate, "servers": args.servers,
+                        "seed": seed, "duration": args.duration, "rejoin_ratio": args.rejoin_ratio,
+                        "interval_ms": args.interval_ms, "batch_size": args.batch_size,
+                        "log_level": args.log_level
+                    })
+    return scenarios
+
+def scenario_key(result):
+    """Identify a scenario across runs."""
+    return (result["mode"], result["flush"], result["rate"], result["servers"], result["seed"])
+
+def print_table(results, reference_mode):
+    """
+    Print results with each mode's p99 relative to the reference mode.
+    
+    Args:
+        results: Result dictionaries (scenario merged in)
+        reference_mode: Mode the "vs" column compares against
+    """
+    reference = {
+        (r["flush"], r["rate"], r["servers"], r["seed"]): r["p99_ms"]
+        for r in results if r["mode"] == reference_mode
+    }
+    header = (f"{'mode':<8} {'flush':<10} {'rate/s':>7} {'srv':>4} {'seed':>8} {'joins':>7} "
+              f"{'achieved/s':>10} {'p50 ms':>8} {'p99 ms':>8} {'max ms':>8} {'vs ' + reference_mode:>10} "
+              f"{'persist p99':>11} {'1st join':>9} {'drain ms':>9} {'save ms':>8} {'RSS MB':>7}")
+    print(header)
+    print("-" * len(header))
+    for r in results:
+        base = reference.get((r["flush"], r["rate"], r["servers"], r["seed"]))
+        ratio = f"{r['p99_ms'] / base:.2f}x" if base else "-"
+        print(f"{r['mode']:<8} {r['flush']:<10} {r['rate']:>7} {r['servers']:>4} {r['seed']:>8} "
+              f"{r['joins']:>7} {r['throughput']:>10} {r['p50_ms']:>8} {r['p99_ms']:>8} "
+              f"{r['max_ms']:>8} {ratio:>10} {r['persist_p99_ms']:>11} {r['first_join_ms']:>9} "
+              f"{r['drain_ms']:>9} {r['save_ms']:>8} {r['rss_mb']:>7}")
+
+def find_regressions(results, baseline, tolerance):
+    """
+    Compare results with a saved baseline run.
+    
+    Latencies and RSS regress when they grow by more than tolerance,
+    throughput when it drops by more than tolerance. Sub-millisecond
+    latencies are ignored, they are mostly timer noise.
+    
+    Args:
+        results: Result dictionaries from this run
+        baseline: Result dictionaries from the baseline file
+        tolerance: Allowed relative change (0.2 = 20%)
+    
+    Returns:
+        List of human readable regression descriptions
+    """
+    old = {scenario_key(r): r for r in baseline}
+    found = []
+    for r in results:
+        before = old.get(scenario_key(r))
+        if before is None:
+            continue
+        for field, label, direction in REGRESSION_CHECKS:
+            was, now = before.get(field), r.get(field)
+            if not was or now is None:
+                continue
+            if field.endswith("_ms") and max(was, now) < 1:
+                continue
+            change = (now - was) / was
+            if change * direction > tolerance:
+                found.append(f"{r['mode']}/{r['flush']} {r['rate']}/s seed={r['seed']}: "
+                             f"{label} {was} -> {now} ({change:+.0%})")
+    return found
+
+def parse_list(value, cast=str):
+    return [cast(item) for item in value.split(",") if item.strip()]
+
+def main():
+    parser = argparse.ArgumentParser(description="Offline join-load benchmark for the storage modes.")
+    parser.add_argument("--modes", type=parse_list, default=["json", "journal", "sqlite"],
+                        help="Storage modes to compare (default: json,journal,sqlite)")
+    parser.add_argument("--flush", type=parse_list, default=["sync"],
+                        help="FLUSH_MODE values: sync, every_join, interval, batch (default: sync)")
+    parser.add_argument("--rates", type=lambda v: parse_list(v, int), default=[10, 100, 1000],
+                        help="Target joins per second (default: 10,100,1000)")
+    parser.add_argument("--servers", type=int, default=3, help="Number of servers (default: 3)")
+    parser.add_argument("--seed", type=lambda v: parse_list(v, int), default=[10000],
+                        help="Pre-seeded joins per server (default: 10000)")
+    parser.add_argument("--duration", type=float, default=10,
+                        help="Seconds of load per scenario (default: 10)")
+    parser.add_argument("--rejoin-ratio", type=float, default=0.1,
+                        help="Share of joins that are rejoins (default: 0.1)")
+    parser.add_argument("--interval-ms", type=int, default=200, help="FLUSH_INTERVAL_MS for write-behind")
+    parser.add_argument("--batch-size", type=int, default=50, help="FLUSH_BATCH_SIZE for write-behind")
+    parser.add_argument("--log-level", default="INFO",
+                        help="Logger level during the run; output is discarded (default: INFO)")
+    parser.add_argument("--dir", help="Working directory (default: a temporary directory)")
+    parser.add_argument("--keep", action="store_true", help="Keep the working directory")
+    parser.add_argument("--save", help="Write the results to this JSON file")
+    parser.add_argument("--baseline", help="Compare with results saved by --save")
+    parser.add_argument("--tolerance", type=float, default=0.2,
+                        help="Relative change reported as a regression (default: 0.2)")
+    parser.add_argument("--child", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    
+    if args.child:
+        scenario = json.loads(args.child)
+        logger.configure(level=scenario["log_level"], console=False)
+        print(json.dumps(asyncio.run(drive_joins(scenario))))
+        return 0
+    
+    logger.configure(level="ERROR")
+    workdir = args.dir or tempfile.mkdtemp(prefix="member-tracker-bench-")
+    results = []
+    try:
+        for scenario in build_scenarios(args):
+            seeded = os.path.join(workdir, f"seed-{scenario['servers']}x{scenario['seed']}")
+            if not os.path.isdir(seeded):
+                print(f"Seeding {scenario['servers']} servers x {scenario['seed']} joins...", flush=True)
+                seed_directory(seeded, scenario["servers"], scenario["seed"], args.rejoin_ratio)
+            
+            run_dir = os.path.join(workdir, "run")
+            shutil.rmtree(run_dir, ignore_errors=True)
+            shutil.copytree(seeded, run_dir)
+            prepare_directory(run_dir, scenario["mode"], scenario["servers"])
+            
+            scenario["dir"] = run_dir
+            print(f"Running {scenario['mode']}/{scenario['flush']} at {scenario['rate']} joins/s...", flush=True)
+            result = run_scenario_process(scenario)
+            if result is None:
+                print(f"   Scenario failed: {scenario['mode']}/{scenario['flush']} at {scenario['rate']} joins/s")
+                continue
+            del scenario["dir"]
+            results.append(dict(scenario, **result))
+    finally:
+        if not args.keep and not args.dir:
+            shutil.rmtree(workdir, ignore_errors=True)
+    
+    print()
+    if not results:
+        return 1
+    print_table(results, args.modes[0])
+    
+    if args.save:
+        with open(args.save, 'w', encoding='utf-8') as f:
+            json.dump(results, f, indent=2)
+        print(f"\nResults saved to {args.save}")
+    
+    if args.baseline:
+        with open(args.baseline, 'r', encoding='utf-8') as f:
+            regressions = find_regressions(results, json.load(f), args.tolerance)
+        if regressions:
+            print(f"\n{len(regressions)} regression(s) against {args.baseline}:")
+            for line in regressions:
+                print(f"   {line}")
+            return 1
+        print(f"\nNo regressions against {args.baseline}")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -15,9 +15,26 @@ from datetime import datetime
 
 # Import local modules
 from config import Config
+import logger
 from logger import log, log_error, log_success, log_warning
 from data_manager import MultiServerDataManager
+from ingest import JoinPipeline
+from loop_monitor import LoopMonitor
+from metrics import ROLLUP_SECONDS, BotMetrics
 from reporter import Reporter
+from scheduler import Scheduler
+from shutdown import ShutdownCoordinator
+from timer_manager import TimerManager
+
+# Logging is queued and written by a background thread
+logger.configure(
+    level=Config.LOG_LEVEL,
+    json_format=Config.LOG_JSON,
+    filename=Config.LOG_FILE,
+    max_bytes=int(Config.LOG_MAX_MB * 1024 * 1024),
+    rotate_hours=Config.LOG_ROTATE_HOURS,
+    backups=Config.LOG_BACKUPS
+)
 
 # Bot setup with required intents for self-bot
 intents = discord.Intents.default()
@@ -35,12 +52,27 @@ bot = commands.Bot(
 data_manager = None
 reporter = None
 telegram_notifier = None
+telegram_outbox = None
 start_time = None
+metrics = BotMetrics(bot)  # Served on /metrics by the health server
+loop_monitor = None
+health_server = None
+join_pipeline = None
+shutdown_coordinator = None
+scheduler = None  # Runs every timed job (reports, snapshots, status logs, timer)
+timer_manager = None
+
+async def take_snapshots():
+    """Scheduler job: bring every server's files up to date off the event loop."""
+    failed = await asyncio.to_thread(data_manager.checkpoint)
+    if failed:
+        log_warning(f"Snapshot failed for {failed} server(s)")
 
 @bot.event
 async def on_ready():
     """Called when self-bot successfully connects to Discord."""
-    global data_manager, reporter, start_time, telegram_notifier
+    global data_manager, reporter, start_time, telegram_notifier, telegram_outbox, health_server
+    global loop_monitor, join_pipeline, shutdown_coordinator, scheduler, timer_manager
     
     log("="*60)
     log_success(f"🤖 Self-bot logged in as {bot.user.name}#{bot.user.discriminator}")
@@ -50,9 +82,39 @@ async def on_ready():
     log_warning("⚠️  This violates Discord ToS - use at your own risk!")
     log("="*60)
     
-    # Initialize multi-server data manager
-    base_filename = Config.OUTPUT_FILE.replace('.json', '') if Config.OUTPUT_FILE else 'join_logs'
-    data_manager = MultiServerDataManager(base_filename)
+    # Watch for callbacks that block the event loop (and delay gateway heartbeats)
+    if Config.LOOP_LAG_WARN_MS > 0 and loop_monitor is None:
+        loop_monitor = LoopMonitor(slow_threshold=Config.LOOP_LAG_WARN_MS / 1000)
+        loop_monitor.start()
+        metrics.loop_monitor = loop_monitor
+    
+    # One scheduler for all timed work; it survives reconnects
+    if scheduler is None:
+        scheduler = Scheduler()
+        scheduler.start()
+        metrics.scheduler = scheduler
+    
+    # One data manager for the whole process; it survives reconnects, so its
+    # write-behind flusher, journals and counters are never duplicated
+    if data_manager is None:
+        base_filename = Config.OUTPUT_FILE.replace('.json', '') if Config.OUTPUT_FILE else 'join_logs'
+        data_manager = MultiServerDataManager(
+            base_filename,
+            storage_mode=Config.STORAGE_MODE,
+            compact_every=Config.JOURNAL_COMPACT_EVERY,
+            sqlite_path=Config.SQLITE_PATH,
+            segment_period=None if Config.SEGMENT_PERIOD == 'none' else Config.SEGMENT_PERIOD,
+            hot_window=Config.HOT_WINDOW_JOINS,
+            compression=None if Config.DATA_COMPRESSION == 'none' else Config.DATA_COMPRESSION
+        )
+        if Config.FLUSH_MODE != 'sync':
+            data_manager.start_write_behind(
+                mode=Config.FLUSH_MODE,
+                interval_ms=Config.FLUSH_INTERVAL_MS,
+                batch_size=Config.FLUSH_BATCH_SIZE,
+                fsync=Config.FLUSH_FSYNC
+            )
+        metrics.data_manager = data_manager
     
     # Initialize tracking for all guilds you're in
     if bot.guilds:
@@ -60,6 +122,8 @@ async def on_ready():
         for guild in bot.guilds:
             data_manager.get_or_create_server(guild)
             log(f"   • {guild.name} - {guild.member_count} total members")
+        # Read every server's index in the background, not in the first join or report
+        scheduler.call_later(0, "index-servers", data_manager.index_servers)
     else:
         log_warning("You are not in any servers!")
         log("Join servers with your Discord account to start monitoring")
@@ -68,15 +132,38 @@ async def on_ready():
     
     # Initialize reporter if channel ID is configured
     start_time = datetime.now()
+    if reporter:
+        await reporter.stop()  # Reconnected: replace the previous reporter
     if Config.REPORT_CHANNEL_ID:
-        reporter = Reporter(bot, Config.REPORT_CHANNEL_ID, data_manager, start_time)
+        reporter = Reporter(
+            bot,
+            Config.REPORT_CHANNEL_ID,
+            data_manager,
+            start_time,
+            every_joins=Config.REPORT_EVERY_JOINS,
+            interval_seconds=Config.REPORT_INTERVAL_MINUTES * 60
+        )
+        reporter.start(scheduler)
         log(f"Reports will be sent to channel ID: {Config.REPORT_CHANNEL_ID}")
     
     # Initialize Telegram notifier for instant notifications
     telegram_notifier = None
+    telegram_outbox = None
     if Config.TELEGRAM_BOT_TOKEN and Config.TELEGRAM_CHAT_ID:
-        from telegram_sender import TelegramSender
-        telegram_notifier = TelegramSender(Config.TELEGRAM_BOT_TOKEN, Config.TELEGRAM_CHAT_ID)
+        from telegram_sender import get_telegram_sender, get_telegram_outbox
+        telegram_notifier = get_telegram_sender(Config.TELEGRAM_BOT_TOKEN, Config.TELEGRAM_CHAT_ID)
+        telegram_notifier.compress_uploads = Config.COMPRESS_UPLOADS
+        # Join notifications are queued and rate limited; bursts become digests
+        telegram_outbox = get_telegram_outbox(
+            Config.TELEGRAM_BOT_TOKEN,
+            Config.TELEGRAM_CHAT_ID,
+            rate_per_sec=Config.TELEGRAM_RATE_PER_SEC,
+            burst=Config.TELEGRAM_BURST,
+            digest_seconds=Config.TELEGRAM_DIGEST_SECONDS,
+            max_queue=Config.TELEGRAM_QUEUE_SIZE
+        )
+        metrics.telegram_sender = telegram_notifier
+        metrics.telegram_outbox = telegram_outbox
         log_success("📱 Telegram instant notifications enabled!")
         
         # Send startup notification to Telegram
@@ -93,13 +180,51 @@ async def on_ready():
     else:
         log_warning("⚠️  Telegram not configured - no instant notifications")
     
-    # Start health server for Render/UptimeRobot (if needed)
-    try:
-        from health_server import HealthServer
-        health_server = HealthServer(port=int(os.getenv('PORT', 8080)))
-        await health_server.start()
-    except Exception as e:
-        log_warning(f"Health server not started: {e}")
+    # Joins are queued by the handler and saved/notified by background workers
+    if Config.INGEST_WORKERS > 0:
+        if join_pipeline is None:
+            join_pipeline = JoinPipeline(
+                data_manager,
+                workers=Config.INGEST_WORKERS,
+                queue_size=Config.INGEST_QUEUE_SIZE,
+                batch_size=Config.INGEST_BATCH_SIZE,
+                overflow=Config.INGEST_OVERFLOW
+            )
+            join_pipeline.start()
+            metrics.join_pipeline = join_pipeline
+        join_pipeline.data_manager = data_manager
+        join_pipeline.reporter = reporter
+        join_pipeline.telegram_outbox = telegram_outbox
+    
+    # Start health server for Render/UptimeRobot (if needed); it survives reconnects
+    if health_server is None:
+        try:
+            from health_server import HealthServer
+            health_server = HealthServer(port=int(os.getenv('PORT', 8080)), metrics=metrics)
+            await health_server.start()
+        except Exception as e:
+            health_server = None
+            log_warning(f"Health server not started: {e}")
+    
+    # One shutdown sequence for !stopbot and SIGTERM/SIGINT (Render sends SIGTERM on redeploy)
+    if shutdown_coordinator is None:
+        shutdown_coordinator = ShutdownCoordinator(bot, data_manager, deadline=Config.SHUTDOWN_DEADLINE_SECONDS)
+        shutdown_coordinator.install_signal_handlers()
+    shutdown_coordinator.data_manager = data_manager
+    shutdown_coordinator.reporter = reporter
+    shutdown_coordinator.join_pipeline = join_pipeline
+    shutdown_coordinator.telegram_sender = telegram_notifier
+    shutdown_coordinator.services = [service for service in (health_server, loop_monitor) if service]
+    shutdown_coordinator.scheduler = scheduler
+    
+    # Timed jobs: auto-disable timer and status log, snapshots, metric rollups
+    if timer_manager is None:
+        timer_manager = TimerManager(Config.TIMER_HOURS, bot, data_manager, coordinator=shutdown_coordinator)
+        timer_manager.start(scheduler, status_interval=Config.STATUS_LOG_MINUTES * 60)
+        if Config.SNAPSHOT_INTERVAL_MINUTES > 0:
+            scheduler.every(Config.SNAPSHOT_INTERVAL_MINUTES * 60, "snapshot", take_snapshots)
+        scheduler.every(ROLLUP_SECONDS, "metrics-rollup", metrics.rollup)
+    timer_manager.data_manager = data_manager
     
     log("="*60)
     log_success("✅ Monitoring for new member joins...")
@@ -113,18 +238,30 @@ async def on_guild_join(guild):
     
     if data_manager:
         # Create tracking for this new server
-        data_manager.get_or_create_server(guild)
+        await data_manager.index_servers([data_manager.get_or_create_server(guild)])
     
     # Notify via Telegram
-    if telegram_notifier:
+    if telegram_outbox:
         try:
             msg = f"🆕 *Joined New Server*\n\n"
             msg += f"🖥️ Server: {guild.name}\n"
             msg += f"👥 Members: {guild.member_count}\n"
             msg += f"📅 Joined at: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}"
-            await telegram_notifier.send_message(msg)
+            telegram_outbox.send_message(msg)
         except Exception as e:
-            log_warning(f"Failed to send guild join notification: {e}")
+            log_warning(f"Failed to queue guild join notification: {e}")
+
+@bot.event
+async def on_guild_channel_delete(channel):
+    """Called when a server channel is deleted."""
+    if reporter:
+        reporter.invalidate_channel(channel.id)
+
+@bot.event
+async def on_private_channel_delete(channel):
+    """Called when a DM or group channel is deleted."""
+    if reporter:
+        reporter.invalidate_channel(channel.id)
 
 @bot.event
 async def on_member_join(member):
@@ -136,22 +273,28 @@ async def on_member_join(member):
         log_error("Data manager not initialized!")
         return
     
-    # Get the server-specific data manager
+    # Only queue the join; the pipeline saves, notifies and counts it in order
+    if join_pipeline:
+        await join_pipeline.submit(member)
+        return
+    
+    # Get the server-specific data manager (its index is read off the loop)
     server_dm = data_manager.get_or_create_server(member.guild)
+    await data_manager.index_servers([server_dm])
     
     # Add member to tracking data for this server
     server_dm.add_member(member)
     
-    # Send instant Telegram notification if configured
-    if telegram_notifier:
+    # Queue the Telegram notification (sent in the background, rate limited)
+    if telegram_outbox:
         try:
-            await telegram_notifier.send_member_join_notification(member, member.guild.name)
+            telegram_outbox.notify_join(member, member.guild.name)
         except Exception as e:
-            log_warning(f"Failed to send Telegram notification: {e}")
+            log_warning(f"Failed to queue Telegram notification: {e}")
     
-    # Send periodic report if configured and threshold reached
-    if reporter and reporter.should_send_periodic_report(member.guild.id):
-        await reporter.send_periodic_report(member.guild.id)
+    # Count the join towards the next periodic report (sent in the background)
+    if reporter:
+        reporter.record_join(member.guild.id)
 
 @bot.command(name='ping')
 async def ping(ctx):
@@ -170,41 +313,10 @@ async def stop_bot(ctx):
     if ctx.author.id != bot.user.id:
         return  # Silently ignore commands from others
     
-    # Trigger shutdown
+    # Trigger shutdown: save, upload, final report and disconnect
     await ctx.send("✅ Saving data and shutting down...")
     log(f"Manual shutdown triggered by {ctx.author.name}#{ctx.author.discriminator}")
-    
-    # Save all data
-    log("="*60)
-    log("SHUTDOWN INITIATED: Manual shutdown via !stopbot command")
-    log("="*60)
-    
-    total_joins = data_manager.get_total_joins_all_servers()
-    log(f"Final stats: {total_joins} members tracked across all servers")
-    
-    # Save each server's data
-    for server_dm in data_manager.get_all_servers():
-        if server_dm.save_data():
-            log_success(f"[{server_dm.server_name}] Data saved to: {server_dm.filename}")
-        else:
-            log_warning(f"[{server_dm.server_name}] Failed to save data to file")
-    
-    # Send files to Telegram if configured
-    if Config.TELEGRAM_BOT_TOKEN and Config.TELEGRAM_CHAT_ID:
-        try:
-            from telegram_sender import TelegramSender
-            log("📱 Sending data files to Telegram...")
-            telegram = TelegramSender(Config.TELEGRAM_BOT_TOKEN, Config.TELEGRAM_CHAT_ID)
-            await telegram.send_all_data_files(data_manager)
-            log_success("All files sent to Telegram successfully!")
-        except Exception as e:
-            log_warning(f"Failed to send files to Telegram: {e}")
-    
-    # Disconnect
-    log("Disconnecting from Discord...")
-    await bot.close()
-    log_success("Bot disconnected successfully")
-    log("="*60)
+    await shutdown_coordinator.shutdown("Manual shutdown via !stopbot command")
 
 @bot.event
 async def on_error(event, *args, **kwargs):
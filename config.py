@@ -20,14 +20,87 @@ class Config:
     # Optional configuration with defaults
     OUTPUT_FILE = os.getenv('OUTPUT_FILE', 'join_logs')
     
+    # Storage mode: "json" rewrites each server file per join,
+    # "journal" appends one JSON Lines record per join,
+    # "sqlite" stores all servers in one SQLite database
+    STORAGE_MODE = os.getenv('STORAGE_MODE', 'json').lower()
+    SQLITE_PATH = os.getenv('SQLITE_PATH')  # Default: <OUTPUT_FILE>.db
+    JOURNAL_COMPACT_EVERY = os.getenv('JOURNAL_COMPACT_EVERY', '10000')
+    
+    # Seal joins from past periods into read-only segment files:
+    # "day", "month" or "none" (json and journal modes)
+    SEGMENT_PERIOD = os.getenv('SEGMENT_PERIOD', 'none').lower()
+    
+    # Joins per server kept in memory (json and journal modes); older
+    # history stays on disk and is streamed when needed, and the rejoin
+    # index moves to a SQLite file per server. 0 keeps the whole history
+    # in memory once it has been read
+    HOT_WINDOW_JOINS = os.getenv('HOT_WINDOW_JOINS', '0')
+    
+    # Store the per-server files gzip-compressed ("gzip") or as plain
+    # JSON ("none"), and gzip plain data files before uploading them
+    DATA_COMPRESSION = os.getenv('DATA_COMPRESSION', 'none').lower()
+    COMPRESS_UPLOADS = os.getenv('COMPRESS_UPLOADS', 'false').lower() in ('1', 'true', 'yes')
+    
+    # Write-behind flushing: "sync" writes inside the join handler,
+    # "every_join", "interval" or "batch" write from a background thread
+    FLUSH_MODE = os.getenv('FLUSH_MODE', 'every_join').lower()
+    FLUSH_INTERVAL_MS = os.getenv('FLUSH_INTERVAL_MS', '200')
+    FLUSH_BATCH_SIZE = os.getenv('FLUSH_BATCH_SIZE', '50')
+    FLUSH_FSYNC = os.getenv('FLUSH_FSYNC', 'false').lower() in ('1', 'true', 'yes')
+    
+    # Join ingest pipeline: worker shards (0 handles joins inside the
+    # handler), queued joins across all shards, joins per batch and what to
+    # do when a shard is full ("block", "drop_new" or "drop_old")
+    INGEST_WORKERS = os.getenv('INGEST_WORKERS', '4')
+    INGEST_QUEUE_SIZE = os.getenv('INGEST_QUEUE_SIZE', '10000')
+    INGEST_BATCH_SIZE = os.getenv('INGEST_BATCH_SIZE', '100')
+    INGEST_OVERFLOW = os.getenv('INGEST_OVERFLOW', 'block').lower()
+    
+    # Event loop lag (ms) logged as a slow callback, with the code that blocked; 0 disables
+    LOOP_LAG_WARN_MS = os.getenv('LOOP_LAG_WARN_MS', '250')
+    
+    # Logging: lowest level shown (DEBUG, INFO, WARN, ERROR), JSON lines
+    # instead of text, and an optional log file rotated by size and/or age
+    LOG_LEVEL = os.getenv('LOG_LEVEL', 'INFO').upper()
+    LOG_JSON = os.getenv('LOG_JSON', 'false').lower() in ('1', 'true', 'yes')
+    LOG_FILE = os.getenv('LOG_FILE')
+    LOG_MAX_MB = os.getenv('LOG_MAX_MB', '10')
+    LOG_ROTATE_HOURS = os.getenv('LOG_ROTATE_HOURS', '24')
+    LOG_BACKUPS = os.getenv('LOG_BACKUPS', '5')
+    
     # Optional IDs (can be None)
     REPORT_CHANNEL_ID = os.getenv('REPORT_CHANNEL_ID')
+    
+    # Periodic reports: a server is reported after REPORT_EVERY_JOINS new
+    # joins, or after REPORT_INTERVAL_MINUTES if it had any new joins
+    REPORT_EVERY_JOINS = os.getenv('REPORT_EVERY_JOINS', '50')
+    REPORT_INTERVAL_MINUTES = os.getenv('REPORT_INTERVAL_MINUTES', '60')
     ADMIN_USER_ID = os.getenv('ADMIN_USER_ID')
     
+    # Hard limit (seconds) for the whole shutdown; uploads and the final
+    # report are dropped first when time runs short (Render allows 30s)
+    SHUTDOWN_DEADLINE_SECONDS = os.getenv('SHUTDOWN_DEADLINE_SECONDS', '25')
+    
+    # Scheduled jobs: auto-disable after TIMER_HOURS (0 = never, the default), a status
+    # log line every STATUS_LOG_MINUTES and a snapshot (journal compaction,
+    # pending writes, WAL checkpoint) every SNAPSHOT_INTERVAL_MINUTES (0 = off)
+    TIMER_HOURS = os.getenv('TIMER_HOURS', '0')
+    STATUS_LOG_MINUTES = os.getenv('STATUS_LOG_MINUTES', '60')
+    SNAPSHOT_INTERVAL_MINUTES = os.getenv('SNAPSHOT_INTERVAL_MINUTES', '15')
+    
     # Telegram integration (required for real-time notifications)
     TELEGRAM_BOT_TOKEN = os.getenv('TELEGRAM_BOT_TOKEN')
     TELEGRAM_CHAT_ID = os.getenv('TELEGRAM_CHAT_ID')
     
+    # Telegram outbound queue: sustained messages per second, burst size,
+    # minimum seconds between join messages per server (joins in between
+    # are merged into one digest) and maximum queued messages
+    TELEGRAM_RATE_PER_SEC = os.getenv('TELEGRAM_RATE_PER_SEC', '1')
+    TELEGRAM_BURST = os.getenv('TELEGRAM_BURST', '3')
+    TELEGRAM_DIGEST_SECONDS = os.getenv('TELEGRAM_DIGEST_SECONDS', '10')
+    TELEGRAM_QUEUE_SIZE = os.getenv('TELEGRAM_QUEUE_SIZE', '1000')
+    
     @classmethod
     def validate(cls):
         """Validate required configuration and return error messages if any."""
@@ -44,6 +117,92 @@ class Config:
             errors.append("   → 5. Copy the token and add it to your .env file")
             errors.append("   → Create a .env file based on .env.sample")
         
+        if cls.STORAGE_MODE not in ('json', 'journal', 'sqlite'):
+            errors.append(f"❌ STORAGE_MODE must be 'json', 'journal' or 'sqlite' (got: {cls.STORAGE_MODE})")
+        
+        if cls.SEGMENT_PERIOD not in ('none', 'day', 'month'):
+            errors.append(f"❌ SEGMENT_PERIOD must be 'none', 'day' or 'month' (got: {cls.SEGMENT_PERIOD})")
+        
+        try:
+            cls.HOT_WINDOW_JOINS = int(cls.HOT_WINDOW_JOINS)
+            if cls.HOT_WINDOW_JOINS < 0:
+                errors.append("❌ HOT_WINDOW_JOINS must be 0 or more")
+            elif cls.HOT_WINDOW_JOINS and cls.SEGMENT_PERIOD != 'none':
+                # Sealing picks the joins to move into segments from the active history in
+                # memory and rewrites the file without them; a hot window never loads it
+                errors.append("❌ HOT_WINDOW_JOINS cannot be combined with SEGMENT_PERIOD "
+                              "(sealing splits the history held in memory, which a hot window never loads)")
+        except ValueError:
+            errors.append(f"❌ HOT_WINDOW_JOINS must be a valid number (got: {cls.HOT_WINDOW_JOINS})")
+        
+        if cls.DATA_COMPRESSION not in ('none', 'gzip'):
+            errors.append(f"❌ DATA_COMPRESSION must be 'none' or 'gzip' (got: {cls.DATA_COMPRESSION})")
+        
+        if cls.FLUSH_MODE not in ('sync', 'every_join', 'interval', 'batch'):
+            errors.append(f"❌ FLUSH_MODE must be 'sync', 'every_join', 'interval' or 'batch' (got: {cls.FLUSH_MODE})")
+        
+        try:
+            cls.FLUSH_INTERVAL_MS = int(cls.FLUSH_INTERVAL_MS)
+            cls.FLUSH_BATCH_SIZE = int(cls.FLUSH_BATCH_SIZE)
+            cls.JOURNAL_COMPACT_EVERY = int(cls.JOURNAL_COMPACT_EVERY)
+            cls.LOOP_LAG_WARN_MS = int(cls.LOOP_LAG_WARN_MS)
+        except ValueError:
+            errors.append("❌ FLUSH_INTERVAL_MS, FLUSH_BATCH_SIZE, JOURNAL_COMPACT_EVERY and LOOP_LAG_WARN_MS must be valid numbers")
+        
+        if cls.INGEST_OVERFLOW not in ('block', 'drop_new', 'drop_old'):
+            errors.append(f"❌ INGEST_OVERFLOW must be 'block', 'drop_new' or 'drop_old' (got: {cls.INGEST_OVERFLOW})")
+        
+        try:
+            cls.INGEST_WORKERS = int(cls.INGEST_WORKERS)
+            cls.INGEST_QUEUE_SIZE = int(cls.INGEST_QUEUE_SIZE)
+            cls.INGEST_BATCH_SIZE = int(cls.INGEST_BATCH_SIZE)
+            if cls.INGEST_QUEUE_SIZE < 1 or cls.INGEST_BATCH_SIZE < 1:
+                errors.append("❌ INGEST_QUEUE_SIZE and INGEST_BATCH_SIZE must be at least 1")
+        except ValueError:
+            errors.append("❌ INGEST_WORKERS, INGEST_QUEUE_SIZE and INGEST_BATCH_SIZE must be valid numbers")
+        
+        try:
+            cls.TELEGRAM_RATE_PER_SEC = float(cls.TELEGRAM_RATE_PER_SEC)
+            cls.TELEGRAM_BURST = int(cls.TELEGRAM_BURST)
+            cls.TELEGRAM_DIGEST_SECONDS = float(cls.TELEGRAM_DIGEST_SECONDS)
+            cls.TELEGRAM_QUEUE_SIZE = int(cls.TELEGRAM_QUEUE_SIZE)
+            if cls.TELEGRAM_RATE_PER_SEC <= 0 or cls.TELEGRAM_BURST < 1:
+                errors.append("❌ TELEGRAM_RATE_PER_SEC must be above 0 and TELEGRAM_BURST at least 1")
+        except ValueError:
+            errors.append("❌ TELEGRAM_RATE_PER_SEC, TELEGRAM_BURST, TELEGRAM_DIGEST_SECONDS and TELEGRAM_QUEUE_SIZE must be valid numbers")
+        
+        try:
+            cls.REPORT_EVERY_JOINS = int(cls.REPORT_EVERY_JOINS)
+            cls.REPORT_INTERVAL_MINUTES = float(cls.REPORT_INTERVAL_MINUTES)
+        except ValueError:
+            errors.append("❌ REPORT_EVERY_JOINS and REPORT_INTERVAL_MINUTES must be valid numbers")
+        
+        try:
+            cls.SHUTDOWN_DEADLINE_SECONDS = float(cls.SHUTDOWN_DEADLINE_SECONDS)
+            if cls.SHUTDOWN_DEADLINE_SECONDS <= 0:
+                errors.append("❌ SHUTDOWN_DEADLINE_SECONDS must be above 0")
+        except ValueError:
+            errors.append(f"❌ SHUTDOWN_DEADLINE_SECONDS must be a valid number (got: {cls.SHUTDOWN_DEADLINE_SECONDS})")
+        
+        try:
+            cls.TIMER_HOURS = float(cls.TIMER_HOURS)
+            cls.STATUS_LOG_MINUTES = float(cls.STATUS_LOG_MINUTES)
+            cls.SNAPSHOT_INTERVAL_MINUTES = float(cls.SNAPSHOT_INTERVAL_MINUTES)
+            if cls.STATUS_LOG_MINUTES <= 0:
+                errors.append("❌ STATUS_LOG_MINUTES must be above 0")
+        except ValueError:
+            errors.append("❌ TIMER_HOURS, STATUS_LOG_MINUTES and SNAPSHOT_INTERVAL_MINUTES must be valid numbers")
+        
+        if cls.LOG_LEVEL not in ('DEBUG', 'INFO', 'WARN', 'ERROR'):
+            errors.append(f"❌ LOG_LEVEL must be DEBUG, INFO, WARN or ERROR (got: {cls.LOG_LEVEL})")
+        
+        try:
+            cls.LOG_MAX_MB = float(cls.LOG_MAX_MB)
+            cls.LOG_ROTATE_HOURS = float(cls.LOG_ROTATE_HOURS)
+            cls.LOG_BACKUPS = int(cls.LOG_BACKUPS)
+        except ValueError:
+            errors.append("❌ LOG_MAX_MB, LOG_ROTATE_HOURS and LOG_BACKUPS must be valid numbers")
+        
         # Convert string IDs to integers if provided
         if cls.REPORT_CHANNEL_ID:
             try:
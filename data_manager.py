@@ -2,26 +2,144 @@
 Data manager for Discord Member Tracking Bot.
 Handles loading, saving, and managing member join data in JSON format.
 Supports multiple servers with separate files per server.
+
+Two storage modes are available:
+    json    - the whole server file is rewritten on every join (default);
+              the joins already in it are copied over as raw bytes, so only
+              the new ones are serialized
+    journal - each join is appended as one JSON Lines record to a journal
+              file; the journal is periodically compacted into the classic
+              JSON file, which then serves as the recovery snapshot
+
+Either mode can partition history by time (segment_period "day" or
+"month"): joins from past periods are moved into sealed, read-only segment
+files (join_logs_ServerName_123456.2026-01.json) listed in the active
+file's "segments" manifest. Only the active file is rewritten, and range
+queries open only the segments they cover.
+
+With a hot window (json and journal modes) a server never loads its
+history: it keeps the user_id index, running counters and a ring buffer of
+its last hot_window joins in memory, and everything older is streamed from
+disk when a query or a rewrite needs it. The user_id index that rejoin
+detection reads on every join lives in a small SQLite file per server
+(see user_index.py), with only recently seen users and the joins since the
+last save in memory, so memory grows neither with the number of joins nor
+with the number of unique joiners. Sealing segments needs the loaded
+history (it splits the active joins by position), so a hot window cannot
+be combined with segment_period.
+
+With compression="gzip" the per-server file and its segments are stored as
+gzip-compressed JSON with one compact record per line
+(join_logs_ServerName_123456.json.gz). Files are read according to their
+suffix, so data saved in the other format is picked up and converted on
+the next write. The journal and the sidecar stay plain text.
+
+All JSON files are written atomically (temp file plus rename), so a crash
+mid-write never truncates a server's history.
 """
 
+import asyncio
+import heapq
 import json
 import os
 import re
-from datetime import datetime
-from logger import log, log_error, log_success
+import shutil
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone
+from itertools import chain, islice
+from export import export_joins
+from join_records import (EPOCH_NAIVE, JoinFileReader, JoinRecords, join_file_trailer, joined_micros,
+                          micros_to_iso, open_join_file, to_micros, write_join_file, write_join_records)
+from join_stats import JoinStats
+from logger import log, log_error, log_success, log_warning
+from stats import LatencyStats
+from user_index import REBUILD_BATCH, UserIndex
+
+def build_join_record(member):
+    """
+    Build the stored join record for a member.
+    
+    Args:
+        member: Discord Member object
+    
+    Returns:
+        Join record dictionary in the per-server JSON file format
+    """
+    return {
+        "username": member.name,
+        "user_id": str(member.id),
+        "discriminator": member.discriminator,
+        "joined_at": member.joined_at.isoformat() if member.joined_at else datetime.utcnow().isoformat(),
+        "account_created": member.created_at.isoformat(),
+        "has_avatar": member.avatar is not None
+    }
+
+SEGMENT_PERIODS = {"day": "%Y-%m-%d", "month": "%Y-%m"}
+
+RECENT_WINDOW = 50  # Latest joins kept for reports when no hot window is set
+
+def period_start(period, now=None):
+    """
+    Get the first moment of the current segment period.
+    
+    Args:
+        period: "day" or "month"
+        now: Reference time (default: current UTC time)
+    
+    Returns:
+        Naive UTC datetime
+    """
+    now = (now or datetime.now(timezone.utc)).astimezone(timezone.utc).replace(tzinfo=None)
+    start = now.replace(hour=0, minute=0, second=0, microsecond=0)
+    return start.replace(day=1) if period == "month" else start
+
+def period_key(period, micros):
+    """Get the segment name ("2026-01" or "2026-01-31") for a joined_at in epoch microseconds."""
+    return (EPOCH_NAIVE + timedelta(microseconds=micros)).strftime(SEGMENT_PERIODS[period])
+
 
 class MultiServerDataManager:
     """Manages member join data storage for multiple servers."""
     
-    def __init__(self, base_filename="join_logs"):
+    def __init__(self, base_filename="join_logs", storage_mode="json", compact_every=10000,
+                 sqlite_path=None, segment_period=None, hot_window=0, compression=None):
         """
         Initialize the multi-server data manager.
         
         Args:
             base_filename: Base name for data files (without extension)
+            storage_mode: "json" (rewrite file per join), "journal" (append-only)
+                or "sqlite" (one SQLite database for all servers)
+            compact_every: Journal records after which a server's journal is
+                compacted into its snapshot (journal mode only)
+            sqlite_path: Database path for sqlite mode (default: <base_filename>.db)
+            segment_period: "day" or "month" to seal past joins into segment
+                files, None to keep one file per server (json/journal modes)
+            hot_window: Recent joins each server keeps in memory, with older
+                history read from disk on demand (the user_id index goes to
+                a SQLite file); 0 loads the whole history when it is read
+                (json/journal modes)
+            compression: "gzip" to store the per-server files (and the
+                sqlite mode export) gzip-compressed, None for plain JSON
         """
         self.base_filename = base_filename
+        self.storage_mode = storage_mode
+        self.compact_every = compact_every
+        self.segment_period = segment_period
+        self.hot_window = hot_window
+        self.compression = compression
         self.servers = {}  # Dictionary: server_id -> server data manager
+        self.write_behind = None  # WriteBehindFlusher once started
+        self.store = None  # SqliteStore in sqlite mode
+        self.persist_latency = LatencyStats()  # Join recorded -> on disk, all servers
+        
+        if storage_mode == "sqlite":
+            from sqlite_store import SqliteStore
+            self.store = SqliteStore(sqlite_path or f"{base_filename}.db")
+            self.store.migrate_json_files(base_filename)
     
     def _sanitize_filename(self, server_name):
         """
@@ -49,9 +167,11 @@ class MultiServerDataManager:
         
         Returns:
             Filename in format: join_logs_ServerName_123456.json
+            (.json.gz with gzip compression)
         """
         sanitized_name = self._sanitize_filename(server_name)
-        return f"{self.base_filename}_{sanitized_name}_{server_id}.json"
+        suffix = ".json.gz" if self.compression == "gzip" else ".json"
+        return f"{self.base_filename}_{sanitized_name}_{server_id}{suffix}"
     
     def get_or_create_server(self, guild):
         """
@@ -67,7 +187,19 @@ class MultiServerDataManager:
         
         if server_id not in self.servers:
             filename = self._get_filename(guild.name, guild.id)
-            self.servers[server_id] = ServerDataManager(filename, guild.name, guild.id)
+            if self.store is not None:
+                from sqlite_store import SqliteServerDataManager
+                self.servers[server_id] = SqliteServerDataManager(
+                    self.store, filename, guild.name, guild.id
+                )
+            else:
+                self.servers[server_id] = ServerDataManager(
+                    filename, guild.name, guild.id,
+                    storage_mode=self.storage_mode, compact_every=self.compact_every,
+                    segment_period=self.segment_period, hot_window=self.hot_window
+                )
+            self.servers[server_id].write_behind = self.write_behind
+            self.servers[server_id].persist_latency = self.persist_latency
             log(f"📁 Tracking server: {guild.name} (ID: {guild.id})")
             log(f"   Data file: {filename}")
         
@@ -77,58 +209,1532 @@ class MultiServerDataManager:
         """Get all server data managers."""
         return self.servers.values()
     
-    def get_total_joins_all_servers(self):
-        """Get total joins across all servers."""
-        return sum(server.get_total_joins() for server in self.servers.values())
+    def get_total_joins_all_servers(self, indexed_only=False):
+        """
+        Get total joins across all servers.
+        
+        Args:
+            indexed_only: Skip servers whose counters are not in memory yet,
+                so nothing is read from disk (safe on the event loop)
+        
+        Returns:
+            Total number of tracked joins
+        """
+        servers = list(self.servers.values())
+        if indexed_only:
+            servers = [server for server in servers if server.is_indexed()]
+        return sum(server.get_total_joins() for server in servers)
+    
+    def count_unindexed(self):
+        """Get the number of servers whose counters have not been read from disk yet."""
+        return sum(1 for server in list(self.servers.values()) if not server.is_indexed())
+    
+    def start_write_behind(self, mode="every_join", interval_ms=200, batch_size=50, fsync=False):
+        """
+        Move join persistence off the event loop onto a background flusher.
+        
+        Args:
+            mode: "every_join", "interval" or "batch" (see WriteBehindFlusher)
+            interval_ms: Flush interval for "interval" mode, max wait for "batch"
+            batch_size: Pending records that trigger a flush in "batch" mode
+            fsync: Whether to fsync files after each flush
+        
+        Returns:
+            The running WriteBehindFlusher
+        """
+        if self.write_behind is None:
+            self.write_behind = WriteBehindFlusher(mode, interval_ms, batch_size, fsync,
+                                                   wait_stats=self.persist_latency)
+            for server in self.servers.values():
+                server.write_behind = self.write_behind
+            self.write_behind.start()
+        return self.write_behind
+    
+    async def stop_write_behind(self):
+        """Flush everything still pending and stop the background flusher."""
+        if self.write_behind is None:
+            return
+        await self.write_behind.stop()
+        for server in self.servers.values():
+            server.write_behind = None
+        self.write_behind = None
+    
+    async def index_servers(self, servers=None):
+        """
+        Read the counters of servers that are not indexed yet on a worker thread.
+        
+        Recording a join or answering a report needs the user_id index. In
+        journal mode (and with a hot window) that is the sidecar plus the
+        journal tail, but a json mode file cannot be appended to without the
+        whole history in memory, so there it is a full load. Doing it here
+        keeps that load off the event loop. Servers are indexed one at a time.
+        
+        Args:
+            servers: ServerDataManagers to index (default: all)
+        """
+        for server in list(self.servers.values()) if servers is None else servers:
+            if server.is_indexed():
+                continue
+            try:
+                await asyncio.to_thread(server.ensure_index)
+            except Exception as e:
+                log_error(f"Failed to index {server.server_name}: {e}")
+    
+    def checkpoint(self):
+        """
+        Bring every server's files up to date. Blocking; run it off the event loop.
+        
+        Bounds how much a restart has to replay: journals are compacted
+        into their snapshots, pending joins are written and the SQLite WAL
+        is checkpointed.
+        
+        Returns:
+            Number of servers that failed to checkpoint
+        """
+        failed = 0
+        for server in list(self.servers.values()):
+            if not server.checkpoint():
+                failed += 1
+        if self.store is not None:
+            self.store.checkpoint()
+        return failed
+    
+    def close_all(self):
+        """Close any open file handles held by the server data managers."""
+        for server in self.servers.values():
+            server.close()
+        if self.store is not None:
+            self.store.close()
+
+
+class WriteBehindFlusher:
+    """
+    Background group-commit flusher for dirty servers.
+    
+    Joins are recorded in memory by add_member and the owning server is
+    marked dirty here. A background task hands batches of dirty servers to a
+    single worker thread, so file writes never run on the event loop.
+    
+    Durability modes:
+        every_join - flush as soon as a join is recorded
+        interval   - flush every interval_ms milliseconds
+        batch      - flush once batch_size joins are pending, or after
+                     interval_ms at the latest
+    """
+    
+    MODES = ("every_join", "interval", "batch")
+    
+    def __init__(self, mode="every_join", interval_ms=200, batch_size=50, fsync=False,
+                 wait_stats=None):
+        """
+        Initialize the flusher.
+        
+        Args:
+            mode: Durability mode (every_join, interval or batch)
+            interval_ms: Flush interval in milliseconds
+            batch_size: Pending record count that triggers a flush in batch mode
+            fsync: Whether to fsync files after each flush
+            wait_stats: Optional LatencyStats to record join wait times into
+        """
+        if mode not in self.MODES:
+            raise ValueError(f"Unknown flush mode: {mode}")
+        self.mode = mode
+        self.interval = interval_ms / 1000
+        self.batch_size = batch_size
+        self.fsync = fsync
+        self.wait_stats = wait_stats or LatencyStats()  # How long joins waited before reaching disk
+        self.flushes = 0
+        self.failures = 0
+        self._dirty = set()
+        self._pending_count = 0
+        self._wakeup = None
+        self._task = None
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="join-flusher")
+        self._last_stats_log = time.monotonic()
+    
+    def start(self):
+        """Start the background flush task on the running event loop."""
+        self._wakeup = asyncio.Event()
+        self._task = asyncio.ensure_future(self._run())
+        log(f"💾 Write-behind flusher started (mode: {self.mode}, fsync: {self.fsync})")
+    
+    def mark_dirty(self, server_dm):
+        """
+        Mark a server as having joins waiting to be written.
+        
+        Args:
+            server_dm: ServerDataManager with pending records
+        """
+        self._dirty.add(server_dm)
+        self._pending_count += 1
+        if self._wakeup is None:
+            return
+        if self.mode == "every_join" or (self.mode == "batch" and self._pending_count >= self.batch_size):
+            self._wakeup.set()
+    
+    async def _run(self):
+        """Flush dirty servers whenever the durability mode says so."""
+        timeout = None if self.mode == "every_join" else self.interval
+        while True:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            try:
+                await self.flush_now()
+            except Exception as e:
+                # Keep the task alive: dirty servers are retried on the next round
+                log_error(f"Write-behind flush failed: {e}")
+    
+    async def flush_now(self):
+        """Write every dirty server on the worker thread and record wait times."""
+        if not self._dirty:
+            return
+        servers = list(self._dirty)
+        self._dirty.clear()
+        self._pending_count = 0
+        
+        loop = asyncio.get_event_loop()
+        try:
+            results = await loop.run_in_executor(self._executor, self._flush_servers, servers)
+        except Exception:
+            self._dirty.update(servers)
+            raise
+        
+        for server_dm, waits in results:
+            if waits is None:
+                # Keep the server dirty so the records are retried next round
+                self.failures += 1
+                self._dirty.add(server_dm)
+                continue
+            for wait in waits:
+                self.wait_stats.add(wait)
+        self.flushes += 1
+        
+        if time.monotonic() - self._last_stats_log >= 60:
+            self._last_stats_log = time.monotonic()
+            log(f"💾 Join flush wait: {self.wait_stats.format()}")
+    
+    def _flush_servers(self, servers):
+        """Runs on the worker thread: flush each server's pending records."""
+        return [(server_dm, server_dm.flush_pending(fsync=self.fsync)) for server_dm in servers]
+    
+    def get_stats(self):
+        """
+        Get flusher statistics.
+        
+        Returns:
+            Dictionary with mode, flush counts and join wait latency summary
+        """
+        return {
+            "mode": self.mode,
+            "flushes": self.flushes,
+            "failures": self.failures,
+            "dirty_servers": len(self._dirty),
+            "wait": self.wait_stats.summary()
+        }
+    
+    async def stop(self):
+        """Cancel the background task, flush what is left and stop the worker."""
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        await self.flush_now()
+        self._executor.shutdown(wait=True)
+        log(f"💾 Write-behind flusher stopped | join flush wait: {self.wait_stats.format()}")
 
 
 class ServerDataManager:
-    """Manages member join data for a single server."""
+    """
+    Manages member join data for a single server.
+    
+    Nothing is read from disk when the manager is created. The user_id index
+    and join count are loaded the first time a join is recorded (in journal
+    mode from the small sidecar file plus the journal tail), and the active
+    history only when something actually reads it, such as a report. Sealed
+    segments are read only by queries that cover their time range.
     
-    def __init__(self, filename, server_name, server_id):
+    With a hot window the history is never loaded: the last hot_window
+    joins stay in a ring buffer for get_recent_joins, and queries, exports
+    and rewrites stream the older joins from disk. The user_id index is a
+    UserIndex backed by <stem>.users.db instead of a dict.
+    """
+    
+    def __init__(self, filename, server_name, server_id, storage_mode="json", compact_every=10000,
+                 segment_period=None, hot_window=0):
         """
         Initialize the server data manager.
         
         Args:
-            filename: Path to the JSON file for this server
+            filename: Path to the JSON file for this server (gzip-compressed if it ends in .gz)
             server_name: Name of the Discord server
             server_id: Discord server ID
+            storage_mode: "json" (rewrite file per join) or "journal" (append-only)
+            compact_every: Journal records after which the journal is compacted
+            segment_period: "day" or "month" to seal past joins into segment files
+            hot_window: Recent joins kept in memory instead of the whole history (0 = off)
         """
         self.filename = filename
         self.server_name = server_name
         self.server_id = str(server_id)
+        self.storage_mode = storage_mode
+        self.compressed = filename.endswith(".gz")
+        self._stem = os.path.splitext(filename[:-3] if self.compressed else filename)[0]
+        # The same file in the other format, read if this one does not exist yet
+        self._other_filename = filename[:-3] if self.compressed else filename + ".gz"
+        self._read_from = None  # Snapshot file the history was last read from
+        self._layout = None  # How the json mode file was last written, for appending to it
+        self.journal_filename = self._stem + ".jsonl"
+        self.meta_filename = self._stem + ".meta.json"
+        # user_id -> number of times seen joining; on disk with a hot window
+        self.user_counts = UserIndex(self._stem + ".users.db") if hot_window else {}
+        self.stats = JoinStats()  # Rolling aggregates, saved with user_counts
+        self.compact_every = compact_every
+        self.segment_period = segment_period
+        self.segments = []  # Manifest of sealed segments, oldest first
+        self.sealed_files = []  # Segment files sealed by this process (for uploads)
+        self._segment_cache = {}  # period -> JoinRecords of recently read segments
+        self._late_joins = {}  # period boundary -> old joins kept active since their segment is sealed
+        self.hot_window = hot_window
+        self.recent = deque(maxlen=hot_window or RECENT_WINDOW)  # Latest joins, oldest first
+        self._recent_ready = False  # recent holds the tail of the history
+        self._snapshot_path = None  # Snapshot file last opened for streaming
+        self.loaded = False  # Active history is in self.data
+        self._index_ready = False  # user_counts and _total are current
+        self._total = 0  # Join count while the history is not loaded
+        self._journal = None  # Open append handle, created on first write
+        self._seq = 0  # Sequence number of the last journal record
+        self._journal_records = 0  # Records in the journal since the last snapshot
+        self.write_behind = None  # Set by MultiServerDataManager when enabled
+        self.persist_latency = None  # Shared LatencyStats, set by MultiServerDataManager
+        self.joins_recorded = 0  # Joins added since the process started
+        self._pending = []  # (record, enqueued_at) not yet written to disk
+        self._pending_lock = threading.Lock()  # Guards _pending and data appends
+        self._io_lock = threading.Lock()  # Serializes file I/O across threads
         self.data = {
             "server_name": server_name,
             "server_id": str(server_id),
-            "tracked_joins": []
+            "tracked_joins": JoinRecords()  # Columnar; dicts are rebuilt on read
         }
-        self.load_data()
+    
+    def ensure_loaded(self):
+        """Load the full history into memory if it is not loaded yet."""
+        if self.loaded:
+            return
+        with self._io_lock:
+            if not self.loaded:
+                self.load_data()
+    
+    def ensure_index(self):
+        """
+        Make the user_id index and join count available.
+        
+        In journal mode this reads only the sidecar file and the journal
+        tail, so recording joins never requires the full history. json mode
+        rewrites the whole file on every save, so it loads everything, unless
+        a hot window is set: then the history is streamed once instead.
+        The recent joins window is filled here too when the sidecar lacks it.
+        """
+        if self.loaded or self._index_ready:
+            return
+        with self._io_lock:
+            if self.loaded or self._index_ready:
+                return
+            if self.storage_mode == "journal" and self._load_index_only():
+                if not self._recent_ready:
+                    # Streamed here, off the event loop, rather than by the first report
+                    self._fill_recent()
+                return
+            if self.hot_window:
+                self._scan_history()
+            else:
+                self.load_data()
     
     def load_data(self):
-        """Load existing data from file if it exists."""
-        if os.path.exists(self.filename):
+        """
+        Load existing data from disk if it exists. Caller holds _io_lock.
+        
+        The JSON file is read as the last good snapshot (falling back to its
+        .bak copy). In journal mode only journal records newer than the
+        snapshot are replayed on top of it. Joins recorded before the load
+        are still pending and are kept at the end of the history.
+        """
+        records, legacy = self._load_history()
+        
+        with self._pending_lock:
+            if not self._index_ready:
+                self._load_user_index(records)
+            records.extend(record for record, _ in self._pending)
+            self.data["tracked_joins"] = records
+            self.loaded = True
+            self._index_ready = True
+        
+        if legacy:
+            # Stamp a legacy file with a journal_seq so it is trusted from now on
+            self._compact_locked(fsync=True)
+    
+    def _load_history(self):
+        """
+        Read join records from the snapshot (and journal in journal mode).
+        
+        Returns:
+            Tuple of (JoinRecords, whether a legacy file was loaded in
+            journal mode and needs compacting)
+        """
+        snapshot = self._read_snapshot()
+        self.segments = snapshot.get("segments", []) if snapshot is not None else []
+        
+        if self.storage_mode == "journal":
+            return self._recover_journal(snapshot)
+        
+        if snapshot is not None:
+            log(f"   [{self.server_name}] Loaded existing data: {len(snapshot['tracked_joins'])} members already tracked")
+            return snapshot["tracked_joins"], False
+        
+        if not os.path.exists(self.filename):
+            log(f"   [{self.server_name}] No existing data file, starting fresh")
+        else:
+            log(f"   [{self.server_name}] Starting with fresh data for this server")
+        return JoinRecords(), False
+    
+    def _load_user_index(self, joins):
+        """
+        Load the persisted user_id index and stats and apply records they have not seen.
+        
+        The sidecar stores how many records it covers (sealed segments
+        included), so normally only the few joins recorded after the last
+        save are applied. If it is missing or does not match the loaded
+        history (e.g. after a crash), the index is rebuilt from scratch.
+        
+        Args:
+            joins: JoinRecords of the active history loaded from disk
+        """
+        meta = self._read_meta()
+        sealed = self._sealed_total()
+        counts, covered, stats = {}, 0, None
+        if (meta is not None and "user_counts" in meta
+                and sealed <= meta.get("records", 0) <= sealed + len(joins)):
+            counts, covered = meta["user_counts"], meta.get("records", 0)
+            if "stats" in meta:
+                stats = JoinStats.from_dict(meta["stats"])
+        
+        if stats is None:
+            # Sidecars written before stats existed only carry the index
+            stats = JoinStats()
+            history = chain(self._iter_sealed(), joins)
+            stats.extend(islice(history, covered))
+            tail = history
+        else:
+            tail = joins.iter_range(covered - sealed, len(joins))
+        
+        applied = 0
+        for record in tail:
+            user_id = record["user_id"]
+            counts[user_id] = counts.get(user_id, 0) + 1
+            stats.add(record)
+            applied += 1
+        self.user_counts = counts
+        self.stats = stats
+        
+        if applied > 1000:
+            log(f"   Indexed {len(counts)} unique users ({applied} records applied)")
+    
+    def _load_index_only(self):
+        """
+        Load the user_id index from the sidecar plus the journal tail.
+        
+        The sidecar is written together with the snapshot, so its
+        journal_seq tells which journal records it has not seen yet. It
+        also carries the snapshot's last joins, which with the tail fill
+        the recent joins window. Caller holds _io_lock.
+        
+        Returns:
+            True if the index was loaded, False if the full history is needed
+        """
+        meta = self._read_meta()
+        if meta is None or "journal_seq" not in meta or "stats" not in meta:
+            return False
+        if self.hot_window:
+            # The counts are in the user index file, which must cover the same records
+            counts = self.user_counts
+            if counts.stamp() != (meta.get("records", 0), meta["journal_seq"]):
+                return False
+            counts.revert()
+        elif "user_counts" in meta:
+            counts = meta["user_counts"]
+        else:
+            return False  # Written with a hot window: the counts are in the user index file
+        stats = JoinStats.from_dict(meta["stats"])
+        self._seq = meta["journal_seq"]
+        tail = []
+        if os.path.exists(self.journal_filename):
+            tail = self._replay_journal(meta["journal_seq"])
+        for record in tail:
+            user_id = record["user_id"]
+            counts[user_id] = counts.get(user_id, 0) + 1
+            stats.add(record)
+        total = meta.get("records", 0) + len(tail)
+        recent = deque(chain(meta.get("recent", []), tail), maxlen=self.recent.maxlen)
+        
+        with self._pending_lock:
+            self.user_counts = counts
+            self.stats = stats
+            self._total = total
+            if len(recent) >= min(recent.maxlen, total):
+                recent.extend(record for record, _ in self._pending)
+                self.recent = recent
+                self._recent_ready = True
+            self._index_ready = True
+        return True
+    
+    def _scan_history(self):
+        """
+        Build the user_id index, join count and recent joins in one streaming pass.
+        
+        Used instead of load_data with a hot window: only the last
+        hot_window records are kept while the history is read. The user
+        index file is reused if its stamp matches the sidecar, so normally
+        only the joins recorded after the last save are applied; otherwise
+        it is rebuilt in batches and the sidecar rewritten to match. A
+        snapshot that turns out to be unreadable is moved aside and its .bak
+        copy read instead. Caller holds _io_lock.
+        """
+        meta = self._read_meta()
+        counts = self.user_counts
+        while True:
+            covered, stats = 0, JoinStats()
+            if (meta is not None and "stats" in meta
+                    and counts.stamp() == (meta.get("records", 0), meta.get("journal_seq", 0))):
+                covered = meta.get("records", 0)
+                stats = JoinStats.from_dict(meta["stats"])
+                counts.revert()
+            else:
+                counts.clear()
+            rebuilt = []  # user_ids not written to the rebuilt index yet
+            recent = deque(maxlen=self.recent.maxlen)
+            total = 0
+            active, legacy = self._open_active(replay=True)
             try:
-                with open(self.filename, 'r', encoding='utf-8') as f:
-                    self.data = json.load(f)
-                log(f"   Loaded existing data: {len(self.data['tracked_joins'])} members already tracked")
+                for record in chain(self._iter_sealed(), active):
+                    if total >= covered:
+                        user_id = record["user_id"]
+                        if covered:
+                            counts[user_id] = counts.get(user_id, 0) + 1
+                        else:
+                            rebuilt.append(user_id)
+                            if len(rebuilt) >= REBUILD_BATCH:
+                                counts.add_stored(rebuilt)
+                                rebuilt = []
+                        stats.add(record)
+                    recent.append(record)
+                    total += 1
+            except ValueError as e:
+                if self._snapshot_path is None:
+                    raise
+                log_error(f"Failed to load existing data from {self._snapshot_path}: {e}")
+                self._move_aside(self._snapshot_path)
+                continue
+            if covered <= total:
+                break
+            meta = None  # The sidecar describes more joins than there are; rebuild
+        
+        if not covered:
+            counts.add_stored(rebuilt)
+            # Stamp the rebuilt index and write a sidecar that matches it
+            self._write_meta({"records": total, "journal_seq": self._seq,
+                              "stats": stats.to_dict(), "recent": list(recent)})
+        with self._pending_lock:
+            self.stats = stats
+            self._total = total
+            recent.extend(record for record, _ in self._pending)
+            self.recent = recent
+            self._recent_ready = True
+            self._index_ready = True
+        log(f"   [{self.server_name}] Indexed {total} members ({len(counts)} unique), "
+            f"keeping the last {len(recent)} in memory")
+        
+        if legacy:
+            # Stamp a legacy file with a journal_seq so it is trusted from now on
+            self._compact_locked(fsync=True)
+    
+    def _ensure_recent(self):
+        """
+        Fill the recent joins window from disk if it is not filled yet.
+        
+        Normally the sidecar or ensure_index already provided it; otherwise
+        (an index loaded only for a compaction) the history is streamed once,
+        keeping only the window in memory.
+        """
+        self.ensure_index()
+        if self._recent_ready or self.loaded:
+            return
+        with self._io_lock:
+            if self._recent_ready or self.loaded:
+                return
+            self._fill_recent()
+    
+    def _fill_recent(self):
+        """Stream the history into the recent joins window. Caller holds _io_lock."""
+        active, _ = self._open_active()
+        recent = deque(chain(self._iter_sealed(), active), maxlen=self.recent.maxlen)
+        with self._pending_lock:
+            # Flushes wait for _io_lock, so pending joins are exactly the ones not on disk
+            recent.extend(record for record, _ in self._pending)
+            self.recent = recent
+            self._recent_ready = True
+    
+    def _open_active(self, replay=False):
+        """
+        Open the flushed active history for streaming: the snapshot, then the journal tail.
+        
+        The snapshot is opened and the journal tail read before this
+        returns, so files rewritten afterwards do not change what the
+        iterator yields. Also refreshes the segment manifest from the
+        snapshot. Caller holds _io_lock.
+        
+        Args:
+            replay: Recover the journal as on startup (cut a torn final line
+                and take the sequence number from it)
+        
+        Returns:
+            Tuple of (iterator of join record dicts, whether a legacy
+            snapshot was opened in journal mode and needs compacting)
+        """
+        f, reader = self._open_snapshot()
+        has_journal = self.storage_mode == "journal" and os.path.exists(self.journal_filename)
+        if reader is not None and has_journal and "journal_seq" not in reader.header:
+            # A plain export is only used as the base when there is no journal
+            f.close()
+            f, reader = None, None
+        header = reader.header if reader is not None else {}
+        self.segments = header.get("segments", [])
+        base_seq = header.get("journal_seq", 0)
+        
+        tail = []
+        if has_journal and replay:
+            self._seq = base_seq
+            tail = self._replay_journal(base_seq)
+        elif has_journal:
+            tail = self._read_journal(base_seq)
+        legacy = (reader is not None and self.storage_mode == "journal"
+                  and "journal_seq" not in header and not has_journal)
+        return chain(self._stream_snapshot(f, reader), tail), legacy
+    
+    def _open_snapshot(self):
+        """
+        Open the newest snapshot whose header can be parsed, for streaming.
+        
+        If the JSON file is unreadable it is moved aside, so the next save
+        cannot overwrite the .bak copy that is read instead.
+        
+        Returns:
+            Tuple of (open file, JoinFileReader), or (None, None) if there is no usable snapshot
+        """
+        self._snapshot_path = None
+        for path, compress in self._snapshot_candidates():
+            if not os.path.exists(path):
+                continue
+            f = open_join_file(path, 'r', compress)
+            try:
+                reader = JoinFileReader(f)
+            except ValueError as e:
+                f.close()
+                log_error(f"Failed to load existing data from {path}: {e}")
+                self._move_aside(path)
+                continue
+            self._note_read(path)
+            self._snapshot_path = path
+            return f, reader
+        return None, None
+    
+    def _stream_snapshot(self, f, reader):
+        """Yield the records of an opened snapshot and close it."""
+        if reader is None:
+            return
+        with f:
+            yield from reader
+    
+    def _move_aside(self, path):
+        """Rename an unreadable data file so it is kept but no longer read."""
+        if path is None or not os.path.exists(path):
+            return
+        corrupt = f"{path}.corrupt-{datetime.now().strftime('%Y%m%d%H%M%S')}"
+        os.replace(path, corrupt)
+        log_warning(f"Moved unreadable data file aside to {corrupt}")
+    
+    def _read_journal(self, base_seq):
+        """
+        Read journal records newer than the snapshot without changing anything.
+        
+        Args:
+            base_seq: Sequence number already covered by the snapshot
+        
+        Returns:
+            List of join records with a sequence number above base_seq
+        """
+        records = []
+        seq = 0
+        with open(self.journal_filename, 'rb') as f:
+            for raw in f:
+                try:
+                    entry = json.loads(raw)
+                except ValueError:
+                    break
+                seq = entry.pop("seq", seq + 1)
+                if seq > base_seq:
+                    records.append(entry)
+        return records
+    
+    def _read_meta(self):
+        """
+        Read the sidecar file holding the persisted user_id index.
+        
+        Returns:
+            Sidecar dictionary, or None if it is missing or unreadable
+        """
+        if not os.path.exists(self.meta_filename):
+            return None
+        try:
+            with open(self.meta_filename, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except Exception as e:
+            log_warning(f"Rebuilding user index, could not read {self.meta_filename}: {e}")
+            return None
+    
+    def _read_snapshot(self):
+        """
+        Read the newest readable snapshot of this server's data.
+        
+        The records are decoded one at a time straight into columns, so the
+        file is never held in memory as a list of dicts. A file that cannot
+        be parsed is moved aside, so the next save cannot turn it into the
+        .bak copy in place of the one that was read instead.
+        
+        Returns:
+            Snapshot dictionary with tracked_joins as JoinRecords, or None if
+            there is no usable snapshot
+        """
+        for path, compress in self._snapshot_candidates():
+            if not os.path.exists(path):
+                continue
+            try:
+                with open_join_file(path, 'r', compress) as f:
+                    reader = JoinFileReader(f)
+                    joins = JoinRecords(reader)
+                snapshot = dict(reader.header, tracked_joins=joins)
+                self._note_read(path)
+                return snapshot
             except Exception as e:
-                log_error(f"Failed to load existing data from {self.filename}: {e}")
-                log("   Starting with fresh data for this server")
-        else:
-            log(f"   No existing data file, starting fresh")
-            # Save initial file
-            self.save_data()
+                log_error(f"Failed to load existing data from {path}: {e}")
+                self._move_aside(path)
+        return None
     
-    def save_data(self):
-        """Save current data to JSON file."""
+    def _snapshot_candidates(self):
+        """
+        List the snapshot files to try, newest first.
+        
+        Returns:
+            List of (path, whether it is gzip-compressed): the data file and
+            its .bak copy, then the same pair in the other format
+        """
+        other = not self.compressed
+        return [(self.filename, self.compressed), (self.filename + ".bak", self.compressed),
+                (self._other_filename, other), (self._other_filename + ".bak", other)]
+    
+    def _note_read(self, path):
+        """Remember which snapshot file the history came from and log fallbacks."""
+        self._read_from = path
+        if path == self._other_filename:
+            log(f"   [{self.server_name}] Reading {path}; it is converted to {self.filename} on the next save")
+        elif path != self.filename:
+            log_warning(f"Recovered {self.server_name} from backup snapshot {path}")
+    
+    def _retire_other_format(self):
+        """Delete the other-format copy once the data file rewritten from it is in place."""
+        if self._read_from != self._other_filename:
+            return  # Never read (or unreadable and left for inspection)
+        self._read_from = self.filename
+        for path in (self._other_filename, self._other_filename + ".bak"):
+            if os.path.exists(path):
+                os.remove(path)
+        log(f"   [{self.server_name}] Converted {self._other_filename} to {self.filename}")
+    
+    def _recover_journal(self, snapshot):
+        """
+        Rebuild the history from the snapshot plus the journal tail.
+        
+        A snapshot without a journal_seq is a plain export (or a legacy json
+        mode file). It is only used as the base when there is no journal.
+        
+        Args:
+            snapshot: Snapshot dictionary from _read_snapshot, or None
+        
+        Returns:
+            Tuple of (JoinRecords, whether a legacy file was loaded)
+        """
+        has_journal = os.path.exists(self.journal_filename)
+        joins = JoinRecords()
+        base_seq = 0
+        if snapshot is not None and ("journal_seq" in snapshot or not has_journal):
+            joins = snapshot["tracked_joins"]
+            base_seq = snapshot.get("journal_seq", 0)
+        self._seq = base_seq
+        
+        tail = []
+        if has_journal:
+            tail = self._replay_journal(base_seq)
+            joins.extend(tail)
+        
+        log(f"   [{self.server_name}] Recovered {len(joins)} members "
+            f"(snapshot + {len(tail)} journal record(s))")
+        legacy = snapshot is not None and "journal_seq" not in snapshot and not has_journal
+        return joins, legacy
+    
+    def _replay_journal(self, base_seq):
+        """
+        Read journal records newer than the snapshot.
+        
+        A torn final line left by an interrupted write is cut off, so new
+        appends start on a clean line.
+        
+        Args:
+            base_seq: Sequence number already covered by the snapshot
+        
+        Returns:
+            List of join records with a sequence number above base_seq
+        """
+        records = []
+        good_offset = 0
+        with open(self.journal_filename, 'rb') as f:
+            for raw in f:
+                try:
+                    entry = json.loads(raw)
+                except ValueError:
+                    break
+                good_offset += len(raw)
+                # Journals written before sequence numbers existed count up from the base
+                seq = entry.pop("seq", self._seq + 1)
+                self._seq = max(self._seq, seq)
+                if seq > base_seq:
+                    records.append(entry)
+            size = f.seek(0, os.SEEK_END)
+        
+        if size > good_offset:
+            log_warning(f"Truncating {size - good_offset} unreadable byte(s) from {self.journal_filename}")
+            with open(self.journal_filename, 'r+b') as f:
+                f.truncate(good_offset)
+        
+        self._journal_records = len(records)
+        return records
+    
+    def _write_journal(self, records, fsync=False):
+        """
+        Append join records to the journal file in a single write.
+        
+        Each line carries a sequence number so recovery can tell which
+        records are already covered by the snapshot.
+        
+        Args:
+            records: Join record dictionaries
+            fsync: Whether to force the data to disk
+        
+        Returns:
+            True if the records were written
+        """
+        try:
+            if self._journal is None:
+                self._journal = open(self.journal_filename, 'a', encoding='utf-8')
+            lines = []
+            for record in records:
+                self._seq += 1
+                lines.append(json.dumps({"seq": self._seq, **record}, ensure_ascii=False) + "\n")
+            self._journal.write("".join(lines))
+            self._journal.flush()
+            if fsync:
+                os.fsync(self._journal.fileno())
+            self._journal_records += len(records)
+            return True
+        except Exception as e:
+            log_error(f"Failed to append to journal {self.journal_filename}: {e}")
+            return False
+    
+    def flush_pending(self, fsync=False):
+        """
+        Write joins recorded since the last flush to disk.
+        
+        Safe to call from a worker thread. Journal mode appends only the
+        pending records and compacts the journal into a snapshot once it
+        grows past compact_every records; json mode rewrites the whole file
+        once for the batch (see _write_active).
+        
+        Args:
+            fsync: Whether to force the data to disk
+        
+        Returns:
+            List of seconds each flushed join waited, or None if the write failed
+        """
+        with self._io_lock:
+            with self._pending_lock:
+                batch, self._pending = self._pending, []
+            if not batch:
+                return []
+            
+            try:
+                if self.storage_mode == "journal":
+                    saved = self._write_journal([record for record, _ in batch], fsync)
+                else:
+                    saved = self._seal_segments() and self._write_active(self._snapshot(batch)[0], fsync)
+            except Exception as e:
+                # Reading the history for the snapshot can fail too; the batch must not be lost
+                log_error(f"Failed to flush joins for {self.server_name}: {e}")
+                saved = False
+            
+            if not saved:
+                with self._pending_lock:
+                    self._pending = batch + self._pending
+                return None
+            
+            if self.storage_mode == "journal" and self._journal_records >= self.compact_every:
+                try:
+                    self._compact_locked(fsync)
+                except Exception as e:
+                    # The batch is already in the journal; compaction is retried on the next flush
+                    log_error(f"Failed to compact journal {self.journal_filename}: {e}")
+        
+        now = time.monotonic()
+        return [now - enqueued_at for _, enqueued_at in batch]
+    
+    def compact(self, fsync=True):
+        """
+        Fold the journal into a fresh snapshot and truncate the journal.
+        
+        Pending joins are appended to the journal first, so the snapshot's
+        journal_seq always matches the last record it contains.
+        
+        Args:
+            fsync: Whether to force the snapshot to disk before truncating
+        
+        Returns:
+            True if the snapshot was written
+        """
+        with self._io_lock:
+            with self._pending_lock:
+                batch, self._pending = self._pending, []
+            if batch and not self._write_journal([record for record, _ in batch], fsync):
+                with self._pending_lock:
+                    self._pending = batch + self._pending
+                return False
+            try:
+                return self._compact_locked(fsync)
+            except Exception as e:
+                log_error(f"Failed to compact journal {self.journal_filename}: {e}")
+                return False
+    
+    def checkpoint(self):
+        """
+        Write pending joins and, in journal mode, compact a non-empty journal.
+        
+        A server whose history is not loaded only gets its journal appended:
+        compacting it would pull the whole history into memory. With a hot
+        window compaction streams the history, so it always runs.
+        
+        Returns:
+            True if nothing failed
+        """
+        compactable = self.loaded or self.hot_window
+        if self.storage_mode == "journal" and compactable and self._journal_records + len(self._pending):
+            return self.compact()
+        return not self._pending or self.flush_pending() is not None
+    
+    def _compact_locked(self, fsync):
+        """Write the snapshot and truncate the journal. Caller holds _io_lock."""
+        if self.hot_window:
+            # The sidecar is written from the index, so it must be current
+            if not self._index_ready and not self._load_index_only():
+                self._scan_history()
+        elif not self.loaded:
+            self.load_data()
+        if not self._seal_segments():
+            return False
+        snapshot, meta = self._snapshot()
+        if not self._write_json(snapshot, self.filename, fsync):
+            return False
+        self._write_meta(meta, fsync)
+        
+        # A crash before this point is harmless: replay skips seq <= journal_seq
+        if self._journal is not None:
+            self._journal.close()
+        self._journal = open(self.journal_filename, 'w', encoding='utf-8')
+        self._journal_records = 0
+        return True
+    
+    def _snapshot(self, batch=()):
+        """
+        Copy the flushed data and matching index, safe to serialize off the loop.
+        
+        Joins still pending are left out of both, so the copies describe
+        exactly what is on disk up to journal_seq. With a hot window the
+        joins are streamed from the current files instead; the old snapshot
+        stays readable until the new one is renamed over it.
+        
+        Args:
+            batch: (record, enqueued_at) pairs taken from pending for this
+                write; with a hot window they are appended to the streamed
+                history (otherwise they are already in memory)
+        
+        Returns:
+            Tuple of (data dictionary with journal_seq, sidecar dictionary)
+        """
+        if self.hot_window:
+            active, _ = self._open_active()
+        with self._pending_lock:
+            if self.hot_window:
+                tracked = chain(active, (record for record, _ in batch))
+                records = self._total - len(self._pending)
+                # The window ends with the pending joins, which are not on disk yet
+                recent = list(self.recent)[:len(self.recent) - len(self._pending)] if self._recent_ready else []
+            else:
+                joins = self.data["tracked_joins"]
+                flushed = len(joins) - len(self._pending)
+                # Records are append-only, so this view stays valid off the loop
+                tracked = joins.iter_range(0, flushed)
+                # The index covers the whole history, so the sidecar counts sealed joins too
+                records = self._sealed_total() + flushed
+                recent = joins[max(0, flushed - self.recent.maxlen):flushed]
+            # With a hot window the counts are saved to the user index file by _write_meta
+            counts = None if self.hot_window else dict(self.user_counts)
+            stats = self.stats.copy()
+            for record, _ in self._pending:
+                if counts is not None:
+                    counts[record["user_id"]] -= 1
+                    if not counts[record["user_id"]]:
+                        del counts[record["user_id"]]
+                stats.remove(record)
+            snapshot = dict(self.data)
+            snapshot["tracked_joins"] = tracked
+        
+        if self.storage_mode == "journal":
+            snapshot["journal_seq"] = self._seq
+        if self.segments or self.segment_period:
+            snapshot["segments"] = list(self.segments)
+        meta = {"records": records, "journal_seq": self._seq, "stats": stats.to_dict(), "recent": recent}
+        if counts is not None:
+            meta["user_counts"] = counts
+        return snapshot, meta
+    
+    def _write_meta(self, meta, fsync=False):
+        """
+        Write the sidecar. With a hot window the user index file is saved
+        first, stamped with the same records and journal_seq. Caller holds
+        _io_lock.
+        
+        Args:
+            meta: Sidecar dictionary from _snapshot
+            fsync: Whether to force the data to disk
+        
+        Returns:
+            True if the sidecar was written
+        """
+        if self.hot_window:
+            with self._pending_lock:
+                # Joins recorded since the snapshot are still pending, so they are left out too
+                changes = self.user_counts.changes(record["user_id"] for record, _ in self._pending)
+            self.user_counts.save(changes, meta["records"], meta["journal_seq"])
+        return self._write_json(meta, self.meta_filename, fsync, indent=None)
+    
+    def _sealed_total(self):
+        """Get the number of joins in sealed segments."""
+        return sum(entry["records"] for entry in self.segments)
+    
+    def _seal_segments(self):
+        """
+        Move flushed joins from past periods into sealed segment files.
+        
+        Runs before the active file is rewritten. Each segment is written
+        once (and synced) before the manifest that lists it, so a crash in
+        between leaves the joins in the active file and the orphaned
+        segment is simply written again next time. Sealed segments are never
+        rewritten: joins that arrive late for an already sealed period stay
+        in the active file, and queries merge them back in. Caller holds
+        _io_lock and the history is loaded.
+        
+        Returns:
+            False if a segment could not be written
+        """
+        if not self.segment_period or not self.loaded:
+            return True
+        boundary = to_micros(period_start(self.segment_period))
+        with self._pending_lock:
+            joins = self.data["tracked_joins"]
+            flushed = len(joins) - len(self._pending)
+        old = joins.time_range(None, boundary)[1]
+        if old <= self._late_joins.get(boundary, 0):
+            return True  # Every old join is a late one already known to stay active
+        
+        manifest = {entry["period"]: entry for entry in self.segments}
+        groups, kept, late = {}, [], 0
+        for index in range(flushed):
+            joined = joins.joined_at[index]
+            if joined >= boundary:
+                kept.append(index)
+                continue
+            period = period_key(self.segment_period, joined)
+            if period in manifest:
+                kept.append(index)
+                late += 1
+            else:
+                groups.setdefault(period, []).append(index)
+        self._late_joins = {boundary: late}
+        if not groups:
+            return True  # Only late or pending joins are old; pending ones are sealed on a later flush
+        
+        for period, positions in sorted(groups.items()):
+            path = f"{self._stem}.{period}.json" + (".gz" if self.compressed else "")
+            data = {
+                "server_name": self.server_name,
+                "server_id": self.server_id,
+                "segment": period,
+                "tracked_joins": (joins.record(i) for i in positions)
+            }
+            if not self._write_json(data, path, fsync=True, backup=False):
+                return False
+            
+            times = [joins.joined_at[i] for i in positions]
+            manifest[period] = {
+                "period": period,
+                "file": os.path.basename(path),
+                "records": len(positions),
+                "first": micros_to_iso(min(times), naive=True),
+                "last": micros_to_iso(max(times), naive=True)
+            }
+            if path not in self.sealed_files:
+                self.sealed_files.append(path)
+        
+        active = JoinRecords(joins.record(i) for i in kept)
+        with self._pending_lock:
+            # Joins recorded meanwhile are still pending and stay in the active history
+            active.extend(joins.iter_range(flushed, len(joins)))
+            self.data["tracked_joins"] = active
+            self.segments = [manifest[period] for period in sorted(manifest)]
+        sealed_count = sum(len(positions) for positions in groups.values())
+        log(f"   [{self.server_name}] Sealed {sealed_count} join(s) into {len(groups)} segment(s)")
+        return True
+    
+    def _segment_bounds(self, entry):
+        """Get a manifest entry's first and last joined_at in epoch microseconds."""
+        return (to_micros(datetime.fromisoformat(entry["first"])),
+                to_micros(datetime.fromisoformat(entry["last"])))
+    
+    def _segment_overlaps(self, entry, start, end):
+        """Whether a segment may hold joins in [start, end) (epoch microseconds or None)."""
+        first, last = self._segment_bounds(entry)
+        return (start is None or last >= start) and (end is None or first < end)
+    
+    def _segment_within(self, entry, start, end):
+        """Whether every join of a segment lies in [start, end)."""
+        first, last = self._segment_bounds(entry)
+        return (start is None or first >= start) and (end is None or last < end)
+    
+    def _load_segment(self, entry):
+        """
+        Read a sealed segment, keeping the two most recently used in memory.
+        
+        Segments are written once, so the file holds exactly the records the
+        manifest entry lists; only that many are read in any case.
+        
+        Args:
+            entry: Manifest entry
+        
+        Returns:
+            JoinRecords of the segment (empty if the file cannot be read)
+        """
+        key = (entry["period"], entry["records"])
+        records = self._segment_cache.get(key)
+        if records is not None:
+            return records
+        path = os.path.join(os.path.dirname(self.filename), entry["file"])
+        try:
+            with open_join_file(path) as f:
+                records = JoinRecords(islice(JoinFileReader(f), entry["records"]))
+        except Exception as e:
+            log_error(f"Failed to read segment {path}: {e}")
+            return JoinRecords()
+        if len(self._segment_cache) >= 2:
+            self._segment_cache.pop(next(iter(self._segment_cache)), None)
+        self._segment_cache[key] = records
+        return records
+    
+    def _iter_sealed(self, segments=None):
+        """Yield the joins of sealed segments in storage order, one segment in memory at a time."""
+        for entry in self.segments if segments is None else segments:
+            yield from self._load_segment(entry)
+    
+    def iter_history(self):
+        """
+        Stream the whole history (sealed segments, then the active joins) in storage order.
+        
+        Returns:
+            Iterator of join record dicts
+        """
+        if self.hot_window:
+            segments, active = self._open_history()
+            return chain(self._iter_sealed(segments), active)
+        self.ensure_loaded()
+        with self._pending_lock:
+            segments = list(self.segments)
+            joins = self.data["tracked_joins"]
+            active = joins.iter_range(0, len(joins))
+        return chain(self._iter_sealed(segments), active)
+    
+    def _open_history(self, index=True):
+        """
+        Open the on-disk history plus pending joins, as of now.
+        
+        Args:
+            index: Load the index first (hot window); exports of a history
+                that is not loaded skip it, since nothing can be pending
+                without it
+        
+        Returns:
+            Tuple of (segment manifest, iterator of the active join record dicts)
+        """
+        if index:
+            self.ensure_index()
+        with self._io_lock:
+            active, _ = self._open_active()
+            with self._pending_lock:
+                segments = list(self.segments)
+                pending = [record for record, _ in self._pending]
+        return segments, chain(active, pending)
+    
+    def upload_files(self):
+        """
+        Get the files to send with a data upload.
+        
+        Returns:
+            The active JSON file followed by the segments sealed since the last upload
+        """
+        return [self.filename] + self.sealed_files
+    
+    def _write_json(self, data, path, fsync=False, indent=2, backup=True):
+        """
+        Atomically write data as pretty-printed JSON.
+        
+        The data goes to a temporary file that is renamed over the target, so
+        a crash mid-write never truncates the existing file. The previous
+        version is kept as <path>.bak (linked before the rename, so the
+        target never goes missing). tracked_joins may be any iterable of
+        records; they are streamed rather than built into one big list.
+        A path ending in .gz is written gzip-compressed, one record per line.
+        
+        Args:
+            data: Dictionary to serialize
+            path: Output path
+            fsync: Whether to force the data to disk before the rename
+            indent: JSON indentation (None for compact output)
+            backup: Keep the previous version as <path>.bak
+        
+        Returns:
+            True if the file was written
+        """
+        tmp_path = path + ".tmp"
+        compress = path.endswith(".gz")
         try:
-            with open(self.filename, 'w', encoding='utf-8') as f:
-                json.dump(self.data, f, indent=2, ensure_ascii=False)
+            with open_join_file(tmp_path, 'w', compress) as f:
+                if "tracked_joins" in data:
+                    # Join records are streamed one at a time from the columns
+                    header = {k: v for k, v in data.items() if k != "tracked_joins"}
+                    write_join_file(f, header, data["tracked_joins"], indent=None if compress else 2)
+                else:
+                    json.dump(data, f, indent=indent, ensure_ascii=False)
+            self._replace_file(tmp_path, path, fsync, backup)
             return True
         except Exception as e:
-            log_error(f"Failed to save data to {self.filename}: {e}")
+            log_error(f"Failed to save data to {path}: {e}")
             return False
     
+    def _replace_file(self, tmp_path, path, fsync, backup=True):
+        """
+        Move a fully written temporary file over path, keeping the old one as .bak.
+        
+        Args:
+            tmp_path: Closed temporary file
+            path: Target path
+            fsync: Whether to force the data to disk before the rename
+            backup: Keep the previous version as <path>.bak
+        """
+        if fsync:
+            # Synced after closing, so a gzip trailer is on disk too
+            fd = os.open(tmp_path, os.O_RDWR)
+            try:
+                os.fsync(fd)
+            finally:
+                os.close(fd)
+        if backup and os.path.exists(path):
+            self._keep_backup(path)
+        os.replace(tmp_path, path)
+        if path == self.filename:
+            self._retire_other_format()
+    
+    def _write_active(self, snapshot, fsync=False):
+        """
+        Write the json mode data file, reusing the bytes of its previous version.
+        
+        Flushed joins never change in place, so when the file on disk is the
+        one this manager wrote last (same header, same records, same size and
+        mtime) everything before its closing brackets is copied as raw bytes
+        and only the joins flushed since then are serialized. Anything else,
+        such as a segment being sealed, falls back to a full rewrite. The new
+        file is still written next to the old one and renamed over it.
+        Caller holds _io_lock.
+        
+        Args:
+            snapshot: Data dictionary from _snapshot
+            fsync: Whether to force the data to disk before the rename
+        
+        Returns:
+            True if the file was written
+        """
+        layout, self._layout = self._layout, None
+        if self.hot_window or self.compressed or not self.loaded:
+            return self._write_json(snapshot, self.filename, fsync)
+        
+        joins = self.data["tracked_joins"]
+        with self._pending_lock:
+            flushed = len(joins) - len(self._pending)
+        header = {key: value for key, value in snapshot.items() if key != "tracked_joins"}
+        try:
+            reusable = (layout is not None and layout["joins"] is joins and layout["header"] == header
+                        and layout["records"] <= flushed and layout["stat"] == self._file_stat())
+        except OSError:
+            reusable = False
+        
+        if not reusable:
+            if not self._write_json(snapshot, self.filename, fsync):
+                return False
+        else:
+            tmp_path = self.filename + ".tmp"
+            try:
+                with open(self.filename, 'rb') as src, open(tmp_path, 'w', encoding='utf-8') as dst:
+                    remaining = layout["body_end"]
+                    while remaining:
+                        chunk = src.read(min(remaining, 1 << 20))
+                        if not chunk:
+                            raise ValueError("data file is shorter than when it was written")
+                        dst.buffer.write(chunk)
+                        remaining -= len(chunk)
+                    write_join_records(dst, joins.iter_range(layout["records"], flushed),
+                                       first=not layout["records"])
+                self._replace_file(tmp_path, self.filename, fsync)
+            except Exception as e:
+                log_error(f"Failed to save data to {self.filename}: {e}")
+                return False
+        
+        stat = self._file_stat()
+        self._layout = {"joins": joins, "header": header, "records": flushed, "stat": stat,
+                        "body_end": stat[1] - len(join_file_trailer(not flushed))}
+        return True
+    
+    def _file_stat(self):
+        """Identify the current version of the data file (inode, size, mtime)."""
+        stat = os.stat(self.filename)
+        return stat.st_ino, stat.st_size, stat.st_mtime_ns
+    
+    @staticmethod
+    def _keep_backup(path):
+        """
+        Make <path>.bak a copy of the current file without moving it.
+        
+        A hard link is used where the filesystem allows it, a full copy
+        otherwise. The link is made under a temporary name and renamed, so
+        both the file and its previous .bak stay readable throughout.
+        
+        Args:
+            path: File about to be replaced
+        """
+        backup = path + ".bak"
+        tmp_backup = backup + ".tmp"
+        if os.path.exists(tmp_backup):
+            os.remove(tmp_backup)
+        try:
+            os.link(path, tmp_backup)
+        except OSError:
+            shutil.copy2(path, tmp_backup)
+        os.replace(tmp_backup, backup)
+    
+    def export_json(self, path=None):
+        """
+        Write the classic per-server JSON file from the in-memory data.
+        
+        Args:
+            path: Output path (defaults to this server's JSON filename)
+        
+        Returns:
+            True if the export was written
+        """
+        if path is None and self.storage_mode == "journal":
+            # The JSON file doubles as the snapshot, so refresh it via compaction
+            return self.compact()
+        if path is None and (self.segments or self.hot_window):
+            # The JSON file holds the segment manifest, so rewrite it the normal way
+            return self.save_data()
+        if not self.hot_window:
+            self.ensure_loaded()
+        # Sealed segments are folded back in, so the export is one self-contained file
+        data = dict(self.data, tracked_joins=self.iter_history())
+        return self._write_json(data, path or self.filename)
+    
+    def export_csv(self, path, start=None, end=None, compress=None):
+        """
+        Stream this server's joins into a CSV file (see _iter_export).
+        
+        Args:
+            path: Output path
+            start: Only joins at or after this datetime (naive = UTC)
+            end: Only joins before this datetime (naive = UTC)
+            compress: gzip the output (default: when path ends in .gz)
+        
+        Returns:
+            Number of joins exported, or None if the export failed
+        """
+        return export_joins(self._iter_export(start, end), path, "csv", compress=compress)
+    
+    def export_columnar(self, path, start=None, end=None, compress=None):
+        """
+        Stream this server's joins into the compact columnar format (see export.py).
+        
+        Args:
+            path: Output path
+            start: Only joins at or after this datetime (naive = UTC)
+            end: Only joins before this datetime (naive = UTC)
+            compress: gzip the output (default: when path ends in .gz)
+        
+        Returns:
+            Number of joins exported, or None if the export failed
+        """
+        header = {
+            "server_name": self.server_name,
+            "server_id": self.server_id,
+            "start": start.isoformat() if start else None,
+            "end": end.isoformat() if end else None
+        }
+        return export_joins(self._iter_export(start, end), path, "columnar",
+                            header=header, compress=compress)
+    
+    def _iter_export(self, start, end):
+        """
+        Get the joins for an export in joined_at order without loading the history.
+        
+        A loaded history (or a hot window) is served by iter_joins_between.
+        Otherwise the files are streamed: joins are nearly always stored in
+        joined_at order, which a first pass over the active history checks,
+        and a second pass then yields them straight from disk, merged with
+        the sealed segments one at a time. Only if the active history is out
+        of order are its joins in range collected first, as compact columns.
+        
+        Args:
+            start: datetime (naive = UTC), or None for no lower bound
+            end: datetime (naive = UTC), or None for no upper bound
+        
+        Returns:
+            Iterator of join record dicts
+        """
+        if self.loaded or self.hot_window:
+            return self.iter_joins_between(start, end)
+        start, end = to_micros(start), to_micros(end)
+        
+        _, history = self._open_history(index=False)
+        last = None
+        for record in history:
+            joined = joined_micros(record)
+            if last is not None and joined < last:
+                ordered = False
+                break
+            last = joined
+        else:
+            ordered = True
+        
+        segments, history = self._open_history(index=False)
+        if ordered:
+            active = self._check_order(record for record in history if self._in_range(record, start, end))
+        else:
+            active = JoinRecords(record for record in history if self._in_range(record, start, end))
+            active = active.iter_time_range(start, end)
+        segments = [entry for entry in segments if self._segment_overlaps(entry, start, end)]
+        sealed = chain.from_iterable(self._load_segment(entry).iter_time_range(start, end)
+                                     for entry in segments)
+        return heapq.merge(sealed, active, key=joined_micros)
+    
+    def _check_order(self, records):
+        """Pass records through, failing if one is older than the one before it."""
+        last = None
+        for record in records:
+            joined = joined_micros(record)
+            if last is not None and joined < last:
+                raise ValueError("joins were added out of order during the export; run it again")
+            last = joined
+            yield record
+    
+    def close(self):
+        """Close the journal file handle (and the user index file) if open."""
+        with self._io_lock:
+            if self._journal is not None:
+                self._journal.close()
+                self._journal = None
+            if self.hot_window:
+                self.user_counts.close()
+    
+    def _has_unsaved_changes(self):
+        """Whether anything was recorded that the JSON file (or its sidecar) does not contain yet."""
+        if self._pending or self.loaded:
+            return True
+        if not os.path.exists(self.filename) and any(
+                os.path.exists(path) for path, _ in self._snapshot_candidates()[1:]):
+            return True  # Only a .bak or the other format is left; restore the file from it
+        if self.storage_mode == "json":
+            # With a hot window flushes rewrite only the JSON file, not the sidecar
+            return self.joins_recorded > 0
+        return self._index_ready and self._journal_records > 0
+    
+    def save_data(self):
+        """
+        Save current data to JSON file.
+        
+        In journal mode this compacts the journal into a new snapshot, which
+        is also the JSON export used for reports and uploads. A server whose
+        history was never touched is not loaded just to be rewritten.
+        """
+        if not self._has_unsaved_changes():
+            if os.path.exists(self.filename) or os.path.exists(self.journal_filename):
+                return True
+            # No file, .bak or other-format copy exists, so this server is new
+            return self._write_json(dict(self.data, tracked_joins=[]), self.filename)
+        
+        if self.storage_mode == "journal":
+            return self.compact()
+        
+        if self.hot_window:
+            self.ensure_index()
+        else:
+            self.ensure_loaded()
+        with self._io_lock:
+            with self._pending_lock:
+                batch, self._pending = self._pending, []  # The full rewrite below covers them
+            saved = self._seal_segments()
+            if saved:
+                snapshot, meta = self._snapshot(batch)
+                saved = self._write_active(snapshot, fsync=True)
+            if not saved:
+                with self._pending_lock:
+                    self._pending = batch + self._pending
+                return False
+            return self._write_meta(meta)
+    
     def add_member(self, member):
         """
         Add a new member join to the tracking data.
@@ -136,35 +1742,284 @@ class ServerDataManager:
         Args:
             member: Discord Member object
         """
-        member_data = {
-            "username": member.name,
-            "user_id": str(member.id),
-            "discriminator": member.discriminator,
-            "joined_at": member.joined_at.isoformat() if member.joined_at else datetime.utcnow().isoformat(),
-            "account_created": member.created_at.isoformat(),
-            "has_avatar": member.avatar is not None
-        }
+        self.add_members([member])
+    
+    def add_members(self, members):
+        """
+        Add several member joins, in order, and persist them together.
         
-        self.data["tracked_joins"].append(member_data)
+        Without write-behind this is one journal append or one file rewrite
+        for the whole batch instead of one per join.
         
-        # Save to file immediately
-        if self.save_data():
-            log(f"[{self.server_name}] New member: {member.name}#{member.discriminator} (ID: {member.id})")
+        Args:
+            members: Discord Member objects, oldest join first
+        """
+        records = [build_join_record(member) for member in members]
+        for member_data in records:
+            self._record_join(member_data)
+        self.joins_recorded += len(records)
+        
+        # With write-behind enabled the flusher persists the joins off the loop
+        if self.write_behind is not None:
+            self.write_behind.mark_dirty(self)
+            self._log_joins(members, records)
+            return
+        
+        # Journal mode appends the records; json mode rewrites the whole file
+        waits = self.flush_pending()
+        if waits is not None:
+            if self.persist_latency is not None:
+                for wait in waits:
+                    self.persist_latency.add(wait)
+            self._log_joins(members, records)
         else:
             log_error(f"[{self.server_name}] Data saved to memory but file write failed")
     
+    def _log_joins(self, members, records):
+        """Log one line per recorded join."""
+        for member, member_data in zip(members, records):
+            if member_data["is_rejoin"]:
+                label = f"Rejoined member (join #{member_data['join_count']})"
+            else:
+                label = "New member"
+            log(f"[{self.server_name}] {label}: {member.name}#{member.discriminator} (ID: {member.id})")
+    
+    def _record_join(self, member_data):
+        """
+        Queue a join for the next flush (and keep it in memory if loaded,
+        or in the recent joins window with a hot window).
+        
+        The user_id index is consulted in O(1) to stamp the record with how
+        many times this user has joined and whether it is a rejoin.
+        
+        Args:
+            member_data: Join record dictionary
+        """
+        self.ensure_index()
+        with self._pending_lock:
+            user_id = member_data["user_id"]
+            count = self.user_counts.get(user_id, 0) + 1
+            self.user_counts[user_id] = count
+            member_data["join_count"] = count
+            member_data["is_rejoin"] = count > 1
+            self.stats.add(member_data)
+            if self.loaded:
+                self.data["tracked_joins"].append(member_data)
+            else:
+                self._total += 1
+                if self._recent_ready:
+                    self.recent.append(member_data)
+            self._pending.append((member_data, time.monotonic()))
+    
+    def get_join_count(self, user_id):
+        """
+        Get how many times a user has been seen joining this server.
+        
+        Args:
+            user_id: Discord user ID
+        
+        Returns:
+            Number of recorded joins (0 if the user was never seen)
+        """
+        self.ensure_index()
+        return self.user_counts.get(str(user_id), 0)
+    
+    def get_rejoin_summary(self):
+        """
+        Split this server's joins into first-time joins and rejoins.
+        
+        Returns:
+            Dictionary with first_time and rejoins counts
+        """
+        total = self.get_total_joins()
+        unique = len(self.user_counts)
+        return {"first_time": unique, "rejoins": total - unique}
+    
+    def is_indexed(self):
+        """Whether the counters are in memory, so get_total_joins and get_stats do no I/O."""
+        return self.loaded or self._index_ready
+    
+    def pending_count(self):
+        """Get the number of joins recorded but not yet written to disk."""
+        return len(self._pending)
+    
+    def get_stats(self):
+        """
+        Get the rolling join statistics for this server without scanning history.
+        
+        Returns:
+            JoinStats instance (shared; treat as read-only)
+        """
+        self.ensure_index()
+        return self.stats
+    
     def get_total_joins(self):
         """Get the total number of tracked joins for this server."""
-        return len(self.data["tracked_joins"])
+        self.ensure_index()
+        if self.loaded:
+            return self._sealed_total() + len(self.data["tracked_joins"])
+        return self._total
+    
+    def count_joins_between(self, start=None, end=None):
+        """
+        Count joins with start <= joined_at < end in O(log n).
+        
+        Sealed segments entirely inside the range are counted from the
+        manifest; only segments the range cuts through are read. With a hot
+        window the active history is streamed from disk and counted (O(n)).
+        
+        Args:
+            start: datetime (naive = UTC), or None for no lower bound
+            end: datetime (naive = UTC), or None for no upper bound
+        
+        Returns:
+            Number of joins
+        """
+        start, end = to_micros(start), to_micros(end)
+        if self.hot_window:
+            segments, active = self._open_history()
+            total = sum(1 for record in active if self._in_range(record, start, end))
+        else:
+            self.ensure_loaded()
+            with self._pending_lock:
+                first, stop = self.data["tracked_joins"].time_range(start, end)
+                segments = list(self.segments)
+            total = stop - first
+        for entry in segments:
+            if self._segment_within(entry, start, end):
+                total += entry["records"]
+            elif self._segment_overlaps(entry, start, end):
+                first, stop = self._load_segment(entry).time_range(start, end)
+                total += stop - first
+        return total
+    
+    def count_joins_since(self, since):
+        """
+        Count joins at or after a time.
+        
+        Args:
+            since: datetime (naive = UTC)
+        
+        Returns:
+            Number of joins
+        """
+        return self.count_joins_between(since)
+    
+    def iter_joins_between(self, start=None, end=None, newest_first=False, offset=0):
+        """
+        Stream joins with start <= joined_at < end in joined_at order.
+        
+        Records are rebuilt one at a time, so nothing is copied up front.
+        Only sealed segments the range covers are opened, and only when the
+        iteration reaches them; segments skipped whole by the offset are
+        never read.
+        
+        With a hot window the active history is streamed from disk first and
+        only the joins in range are held, as compact columns, while the
+        result is read.
+        
+        Args:
+            start: datetime (naive = UTC), or None for no lower bound
+            end: datetime (naive = UTC), or None for no upper bound
+            newest_first: Yield the latest joins first
+            offset: Joins to skip
+        
+        Returns:
+            Iterator of join record dicts
+        """
+        start, end = to_micros(start), to_micros(end)
+        if self.hot_window:
+            segments, history = self._open_history()
+            active = JoinRecords(record for record in history if self._in_range(record, start, end))
+            segments = [entry for entry in segments if self._segment_overlaps(entry, start, end)]
+        else:
+            self.ensure_loaded()
+            with self._pending_lock:
+                active = self.data["tracked_joins"]
+                segments = [entry for entry in self.segments if self._segment_overlaps(entry, start, end)]
+        if not segments:
+            return active.iter_time_range(start, end, offset=offset, newest_first=newest_first)
+        
+        # Late joins for a sealed period stay in the active history
+        cut = self._segment_bounds(segments[-1])[1] + 1
+        first, stop = active.time_range(start, cut if end is None else min(cut, end))
+        if stop > first:
+            parts = segments[::-1] if newest_first else segments
+            sealed = chain.from_iterable(
+                self._load_segment(entry).iter_time_range(start, end, newest_first=newest_first)
+                for entry in parts
+            )
+            merged = heapq.merge(sealed, active.iter_time_range(start, end, newest_first=newest_first),
+                                 key=joined_micros, reverse=newest_first)
+            return islice(merged, offset, None)
+        return self._iter_segments(segments, active, start, end, newest_first, offset)
+    
+    def _in_range(self, record, start, end):
+        """Whether a record's joined_at lies in [start, end) (epoch microseconds or None)."""
+        joined = joined_micros(record)
+        return (start is None or joined >= start) and (end is None or joined < end)
+    
+    def _iter_segments(self, segments, active, start, end, newest_first, offset):
+        """
+        Yield joins from sealed segments and then the active history.
+        
+        Segments hold disjoint, older periods, so chaining them keeps the
+        joined_at order. A segment the offset skips entirely is never read.
+        """
+        parts = segments + [None]  # None stands for the active history
+        if newest_first:
+            parts.reverse()
+        for entry in parts:
+            if entry is not None and offset >= entry["records"] and self._segment_within(entry, start, end):
+                offset -= entry["records"]
+                continue
+            records = active if entry is None else self._load_segment(entry)
+            first, stop = records.time_range(start, end)
+            if offset >= stop - first:
+                offset -= stop - first
+                continue
+            yield from records.iter_time_range(start, end, offset=offset, newest_first=newest_first)
+            offset = 0
+    
+    def get_joins_between(self, start=None, end=None, limit=100, offset=0, newest_first=False):
+        """
+        Get one page of joins with start <= joined_at < end.
+        
+        Example: the last hour, newest first, 50 per page:
+            get_joins_between(datetime.utcnow() - timedelta(hours=1), limit=50,
+                              offset=page * 50, newest_first=True)
+        
+        Args:
+            start: datetime (naive = UTC), or None for no lower bound
+            end: datetime (naive = UTC), or None for no upper bound
+            limit: Maximum joins returned
+            offset: Joins to skip (page number times limit)
+            newest_first: Return the latest joins first
+        
+        Returns:
+            List of join record dicts
+        """
+        return list(islice(self.iter_joins_between(start, end, newest_first, offset), limit))
     
     def get_recent_joins(self, count=5):
         """
         Get the most recent member joins for this server.
         
+        Unless the history is loaded anyway, these come from the in-memory
+        window of the latest joins (in the order they were recorded), which
+        is filled from the sidecar and the journal tail without reading the
+        history.
+        
         Args:
             count: Number of recent joins to return
         
         Returns:
-            List of recent member join data
+            List of recent member join data, oldest first
         """
-        return self.data["tracked_joins"][-count:]
+        if not self.loaded and count <= self.recent.maxlen:
+            self._ensure_recent()
+            if not self.loaded:
+                with self._pending_lock:
+                    recent = list(self.recent)
+                return recent[max(0, len(recent) - count):]
+        return self.get_joins_between(limit=count, newest_first=True)[::-1]
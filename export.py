@@ -0,0 +1,215 @@
+"""
+Streaming export of join history for Discord Member Tracking Bot.
+Writes a server's joins to CSV or to a compact columnar file, optionally
+limited to a joined_at range and gzip-compressed. Records are streamed
+from the server's files (or the SQLite database) in joined_at order by
+ServerDataManager.export_csv/export_columnar and written as they arrive,
+so memory use stays constant however large the history is.
+
+The columnar format is JSON Lines: a header object, then one object per
+block of up to block_size joins holding one array per field. Repeated
+values sit next to each other, so it compresses far better than the
+per-record JSON file.
+
+To export from the command line (storage settings come from .env, as for
+the bot; --storage and --base override STORAGE_MODE and OUTPUT_FILE):
+    python export.py csv|columnar <server_id> <output> [--since ISO] [--until ISO]
+        [--storage json|journal|sqlite] [--base join_logs] [--gzip]
+"""
+
+import argparse
+import csv
+import glob
+import gzip
+import json
+import os
+import sys
+from datetime import datetime
+from types import SimpleNamespace
+from join_records import FIELDS
+from logger import log_error, log_success
+
+COLUMNAR_FORMAT = "member-tracker-columnar"
+COLUMNAR_VERSION = 1
+BLOCK_SIZE = 10000
+
+def _open_text(path, mode, compress):
+    """Open a text file, gzip-compressed if requested."""
+    if compress:
+        return gzip.open(path, mode + "t", encoding='utf-8', newline='', compresslevel=6)
+    return open(path, mode, encoding='utf-8', newline='')
+
+def write_csv(f, records):
+    """
+    Write join records as CSV with a header row.
+    
+    Args:
+        f: Text file opened with newline=''
+        records: Iterable of join record dicts
+    
+    Returns:
+        Number of records written
+    """
+    writer = csv.DictWriter(f, fieldnames=FIELDS, extrasaction='ignore')
+    writer.writeheader()
+    count = 0
+    for record in records:
+        writer.writerow(record)
+        count += 1
+    return count
+
+def write_columnar(f, header, records, block_size=BLOCK_SIZE):
+    """
+    Write join records in the columnar block format.
+    
+    Args:
+        f: Text file opened for writing
+        header: Extra header keys (e.g. server_name, server_id)
+        records: Iterable of join record dicts
+        block_size: Joins per block (bounds memory use)
+    
+    Returns:
+        Number of records written
+    """
+    head = {"format": COLUMNAR_FORMAT, "version": COLUMNAR_VERSION, "fields": list(FIELDS)}
+    f.write(json.dumps(dict(head, **header), ensure_ascii=False) + "\n")
+    
+    count = 0
+    columns = {field: [] for field in FIELDS}
+    for record in records:
+        for field in FIELDS:
+            columns[field].append(record.get(field))
+        count += 1
+        if count % block_size == 0:
+            _write_block(f, columns)
+    if count % block_size:
+        _write_block(f, columns)
+    return count
+
+def _write_block(f, columns):
+    """Write one block and empty the column buffers."""
+    rows = len(columns[FIELDS[0]])
+    f.write(json.dumps({"rows": rows, "columns": columns}, ensure_ascii=False, separators=(",", ":")) + "\n")
+    for values in columns.values():
+        values.clear()
+
+def read_columnar(path):
+    """
+    Read a columnar export back one record at a time.
+    
+    Args:
+        path: File written by write_columnar (.gz files are decompressed)
+    
+    Yields:
+        Join record dicts (fields that were missing are left out)
+    """
+    with _open_text(path, 'r', path.endswith(".gz")) as f:
+        head = json.loads(f.readline())
+        if head.get("format") != COLUMNAR_FORMAT:
+            raise ValueError(f"{path} is not a columnar join export")
+        fields = head["fields"]
+        for line in f:
+            columns = json.loads(line)["columns"]
+            for values in zip(*(columns[field] for field in fields)):
+                yield {field: value for field, value in zip(fields, values) if value is not None}
+
+def export_joins(records, path, fmt="csv", header=None, compress=None):
+    """
+    Stream join records into an export file.
+    
+    The file is written to a temporary name and renamed when complete, so
+    a failed export never leaves a truncated file behind.
+    
+    Args:
+        records: Iterable of join record dicts
+        path: Output path
+        fmt: "csv" or "columnar"
+        header: Header keys for the columnar format
+        compress: gzip the output (default: when path ends in .gz)
+    
+    Returns:
+        Number of records exported, or None if the export failed
+    """
+    if fmt not in ("csv", "columnar"):
+        raise ValueError(f"Unknown export format: {fmt}")
+    if compress is None:
+        compress = path.endswith(".gz")
+    tmp_path = path + ".tmp"
+    try:
+        with _open_text(tmp_path, 'w', compress) as f:
+            if fmt == "csv":
+                count = write_csv(f, records)
+            else:
+                count = write_columnar(f, header or {}, records)
+        os.replace(tmp_path, path)
+        return count
+    except Exception as e:
+        log_error(f"Failed to export joins to {path}: {e}")
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        return None
+
+def _open_server(server_id, base=None, storage=None):
+    """
+    Open one server's stored history for the command line export.
+    
+    The data manager is built from Config exactly as the bot builds it, so
+    the export reads the same database, segments and compressed files.
+    
+    Args:
+        server_id: Discord server ID
+        base: Base name of the data files (default: OUTPUT_FILE)
+        storage: Storage mode (default: STORAGE_MODE)
+    
+    Returns:
+        Tuple of (MultiServerDataManager, server data manager)
+    """
+    from config import Config
+    from data_manager import MultiServerDataManager
+    if base is None:
+        base = Config.OUTPUT_FILE.replace('.json', '') if Config.OUTPUT_FILE else 'join_logs'
+    data_manager = MultiServerDataManager(
+        base,
+        storage_mode=storage or Config.STORAGE_MODE,
+        compact_every=Config.JOURNAL_COMPACT_EVERY,
+        sqlite_path=Config.SQLITE_PATH,
+        segment_period=None if Config.SEGMENT_PERIOD == 'none' else Config.SEGMENT_PERIOD,
+        hot_window=Config.HOT_WINDOW_JOINS,
+        compression=None if Config.DATA_COMPRESSION == 'none' else Config.DATA_COMPRESSION
+    )
+    
+    # The (sanitized) name is part of the file names (.json, .json.gz, .jsonl, ...);
+    # no need to parse a file for it
+    suffix = f"_{server_id}.json"
+    matches = sorted(glob.glob(f"{glob.escape(base)}_*{suffix}*"))
+    server_name = matches[0][len(base) + 1:matches[0].rindex(suffix)] if matches else server_id
+    guild = SimpleNamespace(id=server_id, name=server_name)
+    return data_manager, data_manager.get_or_create_server(guild)
+
+def main():
+    parser = argparse.ArgumentParser(description="Export a server's join history.")
+    parser.add_argument("format", choices=("csv", "columnar"))
+    parser.add_argument("server_id")
+    parser.add_argument("output", help="Output file (.gz is compressed)")
+    parser.add_argument("--since", type=datetime.fromisoformat, help="First joined_at (UTC), inclusive")
+    parser.add_argument("--until", type=datetime.fromisoformat, help="Last joined_at (UTC), exclusive")
+    parser.add_argument("--storage", choices=("json", "journal", "sqlite"), help="Default: STORAGE_MODE")
+    parser.add_argument("--base", help="Base name of the data files (default: OUTPUT_FILE)")
+    parser.add_argument("--gzip", action="store_true", help="Compress even without a .gz name")
+    args = parser.parse_args()
+    
+    data_manager, server_dm = _open_server(args.server_id, args.base, args.storage)
+    try:
+        if args.format == "csv":
+            count = server_dm.export_csv(args.output, args.since, args.until, compress=args.gzip or None)
+        else:
+            count = server_dm.export_columnar(args.output, args.since, args.until, compress=args.gzip or None)
+    finally:
+        data_manager.close_all()
+    if count is None:
+        return 1
+    log_success(f"Exported {count} joins to {args.output}")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,6 +1,7 @@
 """
 Simple HTTP server for keeping the bot alive on Render free tier.
-Responds to health checks from UptimeRobot.
+Responds to health checks from UptimeRobot and serves Prometheus
+metrics on /metrics.
 """
 
 from aiohttp import web
@@ -10,23 +11,35 @@ from logger import log
 class HealthServer:
     """Simple HTTP server for health checks."""
     
-    def __init__(self, port=8080):
+    def __init__(self, port=8080, metrics=None):
         """
         Initialize health server.
         
         Args:
             port: Port to run the server on (default: 8080)
+            metrics: Optional BotMetrics served on /metrics
         """
         self.port = port
+        self.metrics = metrics
         self.app = web.Application()
         self.app.router.add_get('/', self.health_check)
         self.app.router.add_get('/health', self.health_check)
+        self.app.router.add_get('/metrics', self.metrics_handler)
         self.runner = None
     
     async def health_check(self, request):
         """Handle health check requests."""
         return web.Response(text="Bot is running! 🤖", status=200)
     
+    async def metrics_handler(self, request):
+        """Serve metrics in the Prometheus text format."""
+        if self.metrics is None:
+            return web.Response(text="Metrics are not enabled\n", status=404)
+        return web.Response(
+            body=self.metrics.render().encode('utf-8'),
+            headers={"Content-Type": "text/plain; version=0.0.4; charset=utf-8"}
+        )
+    
     async def start(self):
         """Start the HTTP server."""
         self.runner = web.AppRunner(self.app)
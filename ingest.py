@@ -0,0 +1,229 @@
+"""
+Join ingest pipeline for Discord Member Tracking Bot.
+The gateway handler only puts a small event on a bounded queue; worker
+tasks take the events off in batches, persist each server's joins with one
+write, then queue the Telegram notification and count the join for reports.
+
+Events are sharded by server id, and each shard has exactly one worker, so
+joins of the same server are always processed in arrival order. When a
+shard's queue is full the overflow policy decides what happens:
+    block    - the handler waits for room (backpressure, nothing is lost)
+    drop_new - the new join is dropped
+    drop_old - the oldest queued join of that shard is dropped
+"""
+
+import asyncio
+import time
+from collections import deque
+from logger import log, log_error, log_warning
+from stats import LatencyStats
+
+OVERFLOW_POLICIES = ("block", "drop_new", "drop_old")
+
+class JoinPipeline:
+    """Bounded, sharded queue between on_member_join and the storage/notification work."""
+    
+    def __init__(self, data_manager, workers=4, queue_size=10000, batch_size=100, overflow="block"):
+        """
+        Initialize the pipeline.
+        
+        Args:
+            data_manager: MultiServerDataManager the joins are recorded in
+            workers: Number of shards (one worker task each)
+            queue_size: Maximum queued joins across all shards
+            batch_size: Maximum joins a worker takes off its queue at once
+            overflow: "block", "drop_new" or "drop_old" (see module docstring)
+        """
+        if overflow not in OVERFLOW_POLICIES:
+            raise ValueError(f"Unknown overflow policy: {overflow}")
+        self.data_manager = data_manager
+        self.reporter = None  # Reporter, set by bot.py when configured
+        self.telegram_outbox = None  # TelegramOutbox, set by bot.py when configured
+        self.workers = max(1, workers)
+        self.shard_size = max(1, queue_size // self.workers)
+        self.batch_size = max(1, batch_size)
+        self.overflow = overflow
+        self.latency = LatencyStats()  # Enqueued -> persisted
+        self.accepted = 0
+        self.processed = 0
+        self.dropped = 0
+        self.blocked = 0  # Handlers that had to wait for room
+        self.batches = 0
+        self._queues = []
+        self._backlogs = []  # Per shard: (event, future) of handlers waiting for room, in order
+        self._tasks = []
+    
+    def start(self):
+        """Start the worker tasks on the running loop."""
+        if self._tasks:
+            return
+        self._queues = [asyncio.Queue(maxsize=self.shard_size) for _ in range(self.workers)]
+        self._backlogs = [deque() for _ in range(self.workers)]
+        self._tasks = [
+            asyncio.get_running_loop().create_task(self._run(shard))
+            for shard in range(self.workers)
+        ]
+        log(f"📥 Join pipeline started: {self.workers} worker(s), "
+            f"{self.shard_size * self.workers} queued joins max, overflow={self.overflow}")
+    
+    async def submit(self, member):
+        """
+        Queue a member join.
+        
+        Returns as soon as the event is queued. With the "block" policy it
+        waits while the server's shard is full. Once the pipeline has been
+        stopped the join is processed right away.
+        
+        Args:
+            member: Discord Member object
+        
+        Returns:
+            True if the join was accepted, False if it was dropped
+        """
+        event = (member, time.monotonic())
+        if not self._tasks:
+            self._process([event])
+            return True
+        shard = member.guild.id % self.workers
+        queue, backlog = self._queues[shard], self._backlogs[shard]
+        
+        if not backlog and not queue.full():
+            queue.put_nowait(event)
+        elif self.overflow == "block":
+            # Wait behind earlier handlers; the worker moves the event into the queue
+            self.blocked += 1
+            admitted = asyncio.get_running_loop().create_future()
+            backlog.append((event, admitted))
+            await asyncio.shield(admitted)
+        elif self.overflow == "drop_new":
+            self._drop(member)
+            return False
+        else:
+            oldest, _ = queue.get_nowait()
+            queue.task_done()
+            self._drop(oldest)
+            queue.put_nowait(event)
+        
+        self.accepted += 1
+        return True
+    
+    def _drop(self, member):
+        """Count a dropped join, logging the first and then every 100th."""
+        self.dropped += 1
+        if self.dropped == 1 or self.dropped % 100 == 0:
+            log_warning(f"Join queue full, dropped {member.name}#{member.discriminator} "
+                        f"in {member.guild.name} ({self.dropped} dropped so far)")
+    
+    async def _run(self, shard):
+        """Worker: take batches off one shard and process them in order."""
+        queue, backlog = self._queues[shard], self._backlogs[shard]
+        while True:
+            batch = [await queue.get()]
+            while len(batch) < self.batch_size and not queue.empty():
+                batch.append(queue.get_nowait())
+            
+            # Admit waiting handlers into the freed slots, oldest first
+            while backlog and not queue.full():
+                event, admitted = backlog.popleft()
+                queue.put_nowait(event)
+                if not admitted.done():
+                    admitted.set_result(None)
+            
+            # A server's first join needs its index; read it without blocking the loop
+            guilds = {member.guild.id: member.guild for member, _ in batch}
+            await self.data_manager.index_servers(
+                [self.data_manager.get_or_create_server(guild) for guild in guilds.values()])
+            
+            try:
+                self._process(batch)
+            except Exception as e:
+                log_error(f"Join pipeline failed to process {len(batch)} join(s): {e}")
+            finally:
+                for _ in batch:
+                    queue.task_done()
+            # Let handlers and other shards run between batches
+            await asyncio.sleep(0)
+    
+    def _process(self, batch):
+        """
+        Persist, notify and count one batch of joins.
+        
+        Args:
+            batch: (member, enqueued_at) tuples in arrival order
+        """
+        by_server = {}  # guild id -> (guild, members); dicts keep arrival order
+        for member, _ in batch:
+            by_server.setdefault(member.guild.id, (member.guild, []))[1].append(member)
+        
+        for guild, members in by_server.values():
+            server_dm = self.data_manager.get_or_create_server(guild)
+            server_dm.add_members(members)
+            
+            # Queue the Telegram notifications (sent in the background, rate limited)
+            if self.telegram_outbox:
+                for member in members:
+                    try:
+                        self.telegram_outbox.notify_join(member, guild.name)
+                    except Exception as e:
+                        log_warning(f"Failed to queue Telegram notification: {e}")
+            
+            # Count the joins towards the next periodic report (sent in the background)
+            if self.reporter:
+                for _ in members:
+                    self.reporter.record_join(guild.id)
+        
+        now = time.monotonic()
+        for _, enqueued_at in batch:
+            self.latency.add(now - enqueued_at)
+        self.processed += len(batch)
+        self.batches += 1
+    
+    def queue_depth(self):
+        """Get the number of joins waiting in all shards."""
+        if not self._tasks:
+            return 0
+        return sum(queue.qsize() for queue in self._queues) + sum(len(b) for b in self._backlogs)
+    
+    def get_stats(self):
+        """
+        Get pipeline counters.
+        
+        Returns:
+            Dictionary with queue_depth, accepted, processed, dropped,
+            blocked, batches and the enqueue-to-persist latency summary
+        """
+        return {
+            "queue_depth": self.queue_depth(),
+            "accepted": self.accepted,
+            "processed": self.processed,
+            "dropped": self.dropped,
+            "blocked": self.blocked,
+            "batches": self.batches,
+            "latency": self.latency.summary()
+        }
+    
+    async def stop(self, timeout=30):
+        """
+        Process every queued join, then stop the workers.
+        
+        Args:
+            timeout: Maximum seconds to wait for the queues to drain
+        """
+        if not self._tasks:
+            return
+        try:
+            await asyncio.wait_for(
+                asyncio.gather(*(queue.join() for queue in self._queues)), timeout
+            )
+        except asyncio.TimeoutError:
+            log_warning(f"Join pipeline stopped with {self.queue_depth()} join(s) still queued")
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        # Release handlers still waiting for room; their joins were not saved
+        for backlog in self._backlogs:
+            for _, admitted in backlog:
+                if not admitted.done():
+                    admitted.set_result(None)
+            backlog.clear()
@@ -0,0 +1,526 @@
+"""
+Compact in-memory storage for member join records.
+Keeps joins in columns (64-bit ints for IDs and timestamps, a flag byte,
+and packed UTF-8 usernames) instead of one dict of strings per join.
+Records are converted back to the JSON dict shape only when read.
+
+Measured with tracemalloc on CPython 3.11 for 100,000 joins loaded from JSON:
+    list of dicts (previous format) - about 565 bytes per record
+    JoinRecords columns             - about 50 bytes per record
+
+Records can also be looked up by joined_at in O(log n). Joins arrive in
+time order almost always, so the joined_at column itself is searched; only
+after an out-of-order append is a separate sorted index kept.
+"""
+
+import gzip
+import json
+import re
+from array import array
+from bisect import bisect_left, bisect_right
+from datetime import datetime, timedelta, timezone
+
+EPOCH = datetime(1970, 1, 1, tzinfo=timezone.utc)
+EPOCH_NAIVE = datetime(1970, 1, 1)
+
+# Bits of the per-record flag byte
+HAS_AVATAR = 1
+JOINED_NAIVE = 2  # joined_at was stored without a UTC offset
+CREATED_NAIVE = 4  # account_created was stored without a UTC offset
+
+WHITESPACE = re.compile(r"[ \t\r\n]*")
+
+FIELDS = ("username", "user_id", "discriminator", "joined_at",
+          "account_created", "has_avatar", "join_count", "is_rejoin")
+
+def iso_to_micros(value):
+    """
+    Convert an ISO timestamp to epoch microseconds.
+    
+    Args:
+        value: ISO 8601 timestamp string
+    
+    Returns:
+        Tuple of (microseconds since the epoch, whether it had no UTC offset)
+    """
+    dt = datetime.fromisoformat(value)
+    naive = dt.tzinfo is None
+    delta = dt - (EPOCH_NAIVE if naive else EPOCH)
+    return (delta.days * 86400 + delta.seconds) * 1000000 + delta.microseconds, naive
+
+def micros_to_iso(micros, naive=False):
+    """
+    Convert epoch microseconds back to the ISO format datetime.isoformat() produces.
+    
+    Args:
+        micros: Microseconds since the epoch
+        naive: Whether to omit the UTC offset
+    
+    Returns:
+        ISO 8601 timestamp string
+    """
+    return ((EPOCH_NAIVE if naive else EPOCH) + timedelta(microseconds=micros)).isoformat()
+
+def to_micros(value):
+    """
+    Convert a datetime to epoch microseconds for joined_at lookups.
+    
+    Args:
+        value: datetime (naive values are taken as UTC, like Discord's), or None
+    
+    Returns:
+        Microseconds since the epoch, or None if value is None
+    """
+    if value is None:
+        return None
+    if value.tzinfo is not None:
+        value = value.astimezone(timezone.utc).replace(tzinfo=None)
+    delta = value - EPOCH_NAIVE
+    return (delta.days * 86400 + delta.seconds) * 1000000 + delta.microseconds
+
+def joined_micros(record):
+    """
+    Get a record's joined_at as epoch microseconds (UTC).
+    
+    Args:
+        record: Join record dict
+    
+    Returns:
+        Microseconds since the epoch, or 0 if joined_at is missing or invalid
+    """
+    try:
+        return to_micros(datetime.fromisoformat(record["joined_at"]))
+    except (KeyError, TypeError, ValueError):
+        return 0
+
+
+class JoinRecords:
+    """
+    Append-only columnar list of join records.
+    
+    Behaves like a read-only list of dicts (len, indexing, slicing,
+    iteration) plus append/extend. Records that do not fit the columns
+    (unknown keys or unparseable values) are kept as-is in a side table so
+    nothing is lost on export.
+    """
+    
+    def __init__(self, records=()):
+        """
+        Initialize the columns.
+        
+        Args:
+            records: Optional iterable of join record dicts to start with
+        """
+        self.user_ids = array('q')
+        self.joined_at = array('q')  # Epoch microseconds
+        self.account_created = array('q')  # Epoch microseconds
+        self.join_counts = array('I')  # 0 when the record has no join_count
+        self.flags = bytearray()
+        self._names = bytearray()  # Concatenated UTF-8 usernames
+        self._name_ends = array('I')  # End offset of each username in _names
+        self._discriminators = array('H')  # Index into _discriminator_values
+        self._discriminator_values = []
+        self._discriminator_codes = {}
+        self._extras = {}  # index -> original dict for records that do not fit
+        self._order = None  # Positions sorted by joined_at, once appends were out of order
+        self._order_keys = None  # joined_at of each position in _order
+        self.extend(records)
+    
+    def __len__(self):
+        return len(self.user_ids)
+    
+    def append(self, record):
+        """
+        Append one join record.
+        
+        Args:
+            record: Join record dict in the per-server JSON format
+        """
+        try:
+            columns = self._encode(record)
+        except (KeyError, TypeError, ValueError):
+            columns = None
+        
+        if columns is None:
+            # Keep a placeholder row so indexes stay aligned (joined_at still feeds the time index)
+            self._extras[len(self.user_ids)] = dict(record)
+            columns = (0, joined_micros(record), 0, 0, 0, b"", 0)
+        
+        user_id, joined, created, join_count, flags, name, discriminator = columns
+        self.user_ids.append(user_id)
+        self.joined_at.append(joined)
+        self.account_created.append(created)
+        self.join_counts.append(join_count)
+        self.flags.append(flags)
+        self._names += name
+        self._name_ends.append(len(self._names))
+        self._discriminators.append(discriminator)
+        self._index_time(joined)
+    
+    def _index_time(self, joined):
+        """Keep the joined_at lookup valid for the row just appended."""
+        position = len(self.joined_at) - 1
+        if self._order is None:
+            if not position or joined >= self.joined_at[position - 1]:
+                return  # The column is still sorted and is searched directly
+            # First out-of-order join: keep an explicit sorted index from now on
+            self._order = array('I', sorted(range(position + 1), key=self.joined_at.__getitem__))
+            self._order_keys = array('q', (self.joined_at[i] for i in self._order))
+            return
+        rank = bisect_right(self._order_keys, joined)
+        self._order.insert(rank, position)
+        self._order_keys.insert(rank, joined)
+    
+    def extend(self, records):
+        """
+        Append several join records.
+        
+        Args:
+            records: Iterable of join record dicts
+        """
+        for record in records:
+            self.append(record)
+    
+    def _encode(self, record):
+        """Convert a record dict to column values, or None if it does not fit."""
+        if set(record) - set(FIELDS):
+            return None
+        join_count = record.get("join_count", 0)
+        if record.get("is_rejoin", join_count > 1) != (join_count > 1):
+            return None
+        
+        joined, joined_naive = iso_to_micros(record["joined_at"])
+        created, created_naive = iso_to_micros(record["account_created"])
+        flags = ((HAS_AVATAR if record["has_avatar"] else 0)
+                 | (JOINED_NAIVE if joined_naive else 0)
+                 | (CREATED_NAIVE if created_naive else 0))
+        
+        discriminator = record["discriminator"]
+        code = self._discriminator_codes.get(discriminator)
+        if code is None:
+            if len(self._discriminator_values) >= 65535:
+                return None
+            code = len(self._discriminator_values)
+            self._discriminator_values.append(discriminator)
+            self._discriminator_codes[discriminator] = code
+        
+        user_id = int(record["user_id"])
+        if str(user_id) != record["user_id"] or not isinstance(record["has_avatar"], bool):
+            return None
+        # Anything that would not export byte-for-byte (other UTC offsets, "Z") stays as-is
+        if (micros_to_iso(joined, joined_naive) != record["joined_at"]
+                or micros_to_iso(created, created_naive) != record["account_created"]):
+            return None
+        return (user_id, joined, created, join_count, flags,
+                record["username"].encode('utf-8'), code)
+    
+    def record(self, index):
+        """
+        Rebuild the JSON dict for one record.
+        
+        Args:
+            index: Record position (negative indexes count from the end)
+        
+        Returns:
+            Join record dict
+        """
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError("join record index out of range")
+        if index in self._extras:
+            return dict(self._extras[index])
+        
+        flags = self.flags[index]
+        start = self._name_ends[index - 1] if index else 0
+        record = {
+            "username": self._names[start:self._name_ends[index]].decode('utf-8'),
+            "user_id": str(self.user_ids[index]),
+            "discriminator": self._discriminator_values[self._discriminators[index]],
+            "joined_at": micros_to_iso(self.joined_at[index], flags & JOINED_NAIVE),
+            "account_created": micros_to_iso(self.account_created[index], flags & CREATED_NAIVE),
+            "has_avatar": bool(flags & HAS_AVATAR)
+        }
+        join_count = self.join_counts[index]
+        if join_count:
+            record["join_count"] = join_count
+            record["is_rejoin"] = join_count > 1
+        return record
+    
+    def __getitem__(self, key):
+        if isinstance(key, slice):
+            return [self.record(i) for i in range(*key.indices(len(self)))]
+        return self.record(key)
+    
+    def __iter__(self):
+        return self.iter_range(0, len(self))
+    
+    def iter_range(self, start, stop):
+        """
+        Iterate record dicts between two positions without copying.
+        
+        Records appended while iterating are not included, which makes
+        this safe to use for snapshots taken on another thread.
+        
+        Args:
+            start: First position
+            stop: Position to stop before
+        
+        Yields:
+            Join record dicts
+        """
+        for index in range(start, stop):
+            yield self.record(index)
+    
+    def time_range(self, start=None, end=None):
+        """
+        Find the records joined in [start, end) in O(log n).
+        
+        Args:
+            start: Epoch microseconds (inclusive), or None for no lower bound
+            end: Epoch microseconds (exclusive), or None for no upper bound
+        
+        Returns:
+            Tuple of (first, stop) ranks in joined_at order
+        """
+        keys = self.joined_at if self._order is None else self._order_keys
+        first = 0 if start is None else bisect_left(keys, start)
+        stop = len(keys) if end is None else bisect_left(keys, end)
+        return first, max(first, stop)
+    
+    def iter_time_range(self, start=None, end=None, offset=0, limit=None, newest_first=False):
+        """
+        Iterate the records joined in [start, end) in joined_at order.
+        
+        Skipping offset records costs nothing, so pages can be fetched
+        directly. Records appended while iterating are not included.
+        
+        Args:
+            start: Epoch microseconds (inclusive), or None
+            end: Epoch microseconds (exclusive), or None
+            offset: Records to skip
+            limit: Maximum records to yield (None = all)
+            newest_first: Yield the latest joins first
+        
+        Yields:
+            Join record dicts
+        """
+        first, stop = self.time_range(start, end)
+        ranks = range(stop - 1, first - 1, -1) if newest_first else range(first, stop)
+        ranks = ranks[offset:] if limit is None else ranks[offset:offset + limit]
+        # Copy the index slice, since out-of-order appends shift later ranks
+        positions = ranks if self._order is None else array('I', (self._order[r] for r in ranks))
+        for index in positions:
+            yield self.record(index)
+    
+    def user_id_str(self, index):
+        """Get the user ID of a record as a string without rebuilding the dict."""
+        if index in self._extras:
+            return self._extras[index]["user_id"]
+        return str(self.user_ids[index])
+    
+    def memory_bytes(self):
+        """Approximate bytes held by the column buffers."""
+        columns = (self.user_ids, self.joined_at, self.account_created,
+                   self.join_counts, self._name_ends, self._discriminators)
+        if self._order is not None:
+            columns += (self._order, self._order_keys)
+        return (sum(c.buffer_info()[1] * c.itemsize for c in columns)
+                + len(self.flags) + len(self._names))
+
+
+def open_join_file(path, mode='r', compress=None):
+    """
+    Open a per-server JSON file as text, gzip-compressed if requested.
+    
+    Args:
+        path: File path
+        mode: 'r' or 'w'
+        compress: Whether the file is gzip-compressed (default: when path ends in .gz)
+    
+    Returns:
+        Text file object
+    """
+    if compress is None:
+        compress = path.endswith(".gz")
+    if compress:
+        return gzip.open(path, mode + 't', encoding='utf-8', compresslevel=6)
+    return open(path, mode, encoding='utf-8')
+
+def write_join_file(f, header, records, indent=2):
+    """
+    Stream a per-server JSON file in the same layout json.dump(indent=2) produces.
+    
+    Records are serialized one at a time, so memory use does not grow
+    with the number of joins.
+    
+    Args:
+        f: Text file opened for writing
+        header: Top-level keys written before tracked_joins
+        records: Iterable of join record dicts
+        indent: 2 for the pretty-printed layout, None for one compact record per line
+    
+    Returns:
+        Number of records written
+    """
+    if indent is None:
+        compact = {"ensure_ascii": False, "separators": (",", ":")}
+        f.write("{" + "".join(f"{json.dumps(key)}:{json.dumps(value, **compact)}," for key, value in header.items()))
+        f.write('"tracked_joins":[')
+    else:
+        f.write("{\n")
+        for key, value in header.items():
+            f.write(f"  {json.dumps(key)}: {json.dumps(value, ensure_ascii=False)},\n")
+        f.write('  "tracked_joins": [')
+    return write_join_records(f, records, indent)
+
+def write_join_records(f, records, indent=2, first=True):
+    """
+    Write records into an open tracked_joins list, then close the list and the file.
+    
+    Finishes write_join_file, and also lets new records be added after the
+    body of an earlier file copied byte for byte (everything before its
+    join_file_trailer).
+    
+    Args:
+        f: Text file positioned inside tracked_joins
+        records: Iterable of join record dicts
+        indent: 2 for the pretty-printed layout, None for one compact record per line
+        first: Whether the list has no records yet
+    
+    Returns:
+        Number of records written
+    """
+    compact = {"ensure_ascii": False, "separators": (",", ":")}
+    written = 0
+    for record in records:
+        if indent is None:
+            text = json.dumps(record, **compact)
+        else:
+            text = "    " + json.dumps(record, indent=2, ensure_ascii=False).replace("\n", "\n    ")
+        f.write(("\n" if first else ",\n") + text)
+        first = False
+        written += 1
+    f.write(join_file_trailer(first, indent))
+    return written
+
+def join_file_trailer(empty, indent=2):
+    """
+    Get the text write_join_file ends a file with.
+    
+    Args:
+        empty: Whether tracked_joins has no records
+        indent: 2 for the pretty-printed layout, None for the compact one
+    
+    Returns:
+        The closing text (ASCII, so its length is also its size in bytes)
+    """
+    if indent is None:
+        return "]}\n" if empty else "\n]}\n"
+    return "]\n}" if empty else "\n  ]\n}"
+
+
+class JoinFileReader:
+    """
+    Stream the records of a per-server JSON file without loading it whole.
+    
+    The top-level keys before tracked_joins (server_name, journal_seq,
+    segments, ...) are parsed when the reader is created; iterating it
+    then decodes one record at a time from a small read buffer, so memory
+    use does not grow with the size of the file. Any JSON layout is
+    accepted, not only the one write_join_file produces.
+    """
+    
+    CHUNK_SIZE = 1 << 16
+    
+    def __init__(self, f):
+        """
+        Open the reader and parse the header.
+        
+        Args:
+            f: Text file opened for reading (left open; the caller closes it)
+        
+        Raises:
+            ValueError: If the file is not a JSON object
+        """
+        self._f = f
+        self._decoder = json.JSONDecoder()
+        self._buf = ""
+        self._pos = 0
+        self._eof = False
+        self.header = {}
+        self._has_joins = False
+        
+        self._expect("{")
+        if self._peek() == "}":
+            return
+        while True:
+            key = self._value()
+            self._expect(":")
+            if key == "tracked_joins":
+                self._expect("[")
+                self._has_joins = True
+                return
+            self.header[key] = self._value()
+            if self._expect(",}") == "}":
+                return
+    
+    def __iter__(self):
+        """
+        Yield the join record dicts in file order.
+        
+        Top-level keys that follow tracked_joins are added to header once
+        the last record was read.
+        """
+        if not self._has_joins:
+            return
+        self._has_joins = False
+        if self._peek() == "]":
+            self._pos += 1
+        else:
+            while True:
+                yield self._value()
+                if self._expect(",]") == "]":
+                    break
+        while self._expect(",}") == ",":
+            key = self._value()
+            self._expect(":")
+            self.header[key] = self._value()
+    
+    def _fill(self):
+        """Read the next chunk, dropping what was consumed. Returns False at the end of the file."""
+        chunk = self._f.read(self.CHUNK_SIZE)
+        self._buf = self._buf[self._pos:] + chunk
+        self._pos = 0
+        self._eof = not chunk
+        return bool(chunk)
+    
+    def _peek(self):
+        """Skip whitespace and return the next character ("" at the end of the file)."""
+        while True:
+            self._pos = WHITESPACE.match(self._buf, self._pos).end()
+            if self._pos < len(self._buf) or not self._fill():
+                return self._buf[self._pos:self._pos + 1]
+    
+    def _expect(self, chars):
+        """Consume one of chars as the next token and return it."""
+        char = self._peek()
+        if not char or char not in chars:
+            raise ValueError(f"Expected one of {chars!r} in join file, found {char!r}")
+        self._pos += 1
+        return char
+    
+    def _value(self):
+        """Decode the next JSON value, reading more of the file until it is complete."""
+        self._peek()
+        while True:
+            try:
+                value, end = self._decoder.raw_decode(self._buf, self._pos)
+                # A number at the end of the buffer may continue in the next chunk
+                if end < len(self._buf) or self._eof:
+                    self._pos = end
+                    return value
+            except ValueError:
+                if self._eof:
+                    raise
+            self._fill()
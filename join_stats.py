@@ -0,0 +1,217 @@
+"""
+Rolling per-server join statistics for Discord Member Tracking Bot.
+Updated once per join and saved next to the user_id index, so reports can
+show joins per hour/day, account ages and avatar ratios without scanning
+the join history.
+"""
+
+import heapq
+from datetime import datetime, timedelta, timezone
+
+HOURLY_KEEP = 168  # Hour buckets kept (one week)
+DAILY_KEEP = 400  # Day buckets kept
+
+# Account age at join time: (upper bound in days, label); None = no bound
+AGE_BUCKETS = (
+    (1, "<1 day"),
+    (7, "1-7 days"),
+    (30, "1-4 weeks"),
+    (90, "1-3 months"),
+    (365, "3-12 months"),
+    (3 * 365, "1-3 years"),
+    (None, "3+ years")
+)
+AGE_UNKNOWN = "unknown"
+
+def _parse_utc(value):
+    """Parse an ISO timestamp as UTC (naive values are assumed to be UTC), or None."""
+    try:
+        dt = datetime.fromisoformat(value)
+    except (TypeError, ValueError):
+        return None
+    if dt.tzinfo is None:
+        return dt.replace(tzinfo=timezone.utc)
+    return dt.astimezone(timezone.utc)
+
+def _age_label(joined, created):
+    """Get the AGE_BUCKETS label for an account's age when it joined."""
+    if joined is None or created is None:
+        return AGE_UNKNOWN
+    days = (joined - created).total_seconds() / 86400
+    for limit, label in AGE_BUCKETS:
+        if limit is None or days < limit:
+            return label
+    return AGE_UNKNOWN
+
+
+class JoinStats:
+    """Counters for one server's joins, maintained incrementally."""
+    
+    def __init__(self):
+        """Initialize empty counters."""
+        self.total = 0
+        self.with_avatar = 0
+        self.hourly = {}  # "YYYY-MM-DDTHH" (UTC) -> joins
+        self.daily = {}  # "YYYY-MM-DD" (UTC) -> joins
+        self.account_age = {}  # AGE_BUCKETS label -> joins
+        # Heaps of the hourly and daily keys, oldest first, so eviction does
+        # not scan the buckets; keys dropped from the buckets are skipped
+        self._hour_order = []
+        self._day_order = []
+    
+    def add(self, record, sign=1):
+        """
+        Count one join record.
+        
+        Args:
+            record: Join record dict in the per-server JSON format
+            sign: 1 to add the record, -1 to take it back out
+        """
+        joined = _parse_utc(record.get("joined_at"))
+        created = _parse_utc(record.get("account_created"))
+        
+        self.total += sign
+        if record.get("has_avatar"):
+            self.with_avatar += sign
+        
+        label = _age_label(joined, created)
+        self._bump(self.account_age, label, sign)
+        if joined is not None:
+            hour = joined.strftime("%Y-%m-%dT%H")
+            self._bump(self.hourly, hour, sign, HOURLY_KEEP, self._hour_order)
+            self._bump(self.daily, hour[:10], sign, DAILY_KEEP, self._day_order)
+    
+    def remove(self, record):
+        """
+        Take a previously added join record back out.
+        
+        Args:
+            record: Join record dict passed to add() earlier
+        """
+        self.add(record, -1)
+    
+    def extend(self, records):
+        """
+        Count several join records.
+        
+        Args:
+            records: Iterable of join record dicts
+        """
+        for record in records:
+            self.add(record)
+    
+    @staticmethod
+    def _bump(buckets, key, sign, keep=None, order=None):
+        """
+        Adjust one bucket, dropping empty ones and the oldest beyond keep.
+        
+        Args:
+            buckets: Bucket dictionary to change
+            key: Bucket key
+            sign: 1 to count a join, -1 to take one out
+            keep: Maximum number of buckets, or None for no limit
+            order: Heap of the bucket keys (required with keep)
+        """
+        if sign < 0 and key not in buckets:
+            return  # Taken out of a bucket that was already evicted
+        count = buckets.get(key, 0) + sign
+        if count <= 0:
+            buckets.pop(key, None)
+            return
+        if key not in buckets and order is not None:
+            heapq.heappush(order, key)
+            if len(order) > 2 * len(buckets) + 2:
+                # Mostly keys of emptied buckets; a sorted list is a valid heap
+                order[:] = sorted(set(buckets) | {key})
+        buckets[key] = count
+        if keep is not None and len(buckets) > keep:
+            # Keys are ISO prefixes, so the smallest is the oldest
+            oldest = heapq.heappop(order)
+            while oldest not in buckets:
+                oldest = heapq.heappop(order)
+            del buckets[oldest]
+    
+    def copy(self):
+        """Get an independent copy of the counters."""
+        return JoinStats.from_dict(self.to_dict())
+    
+    def to_dict(self):
+        """
+        Get the counters in a JSON-serializable form.
+        
+        Returns:
+            Dictionary for the sidecar file
+        """
+        return {
+            "total": self.total,
+            "with_avatar": self.with_avatar,
+            "hourly": dict(self.hourly),
+            "daily": dict(self.daily),
+            "account_age": dict(self.account_age)
+        }
+    
+    @classmethod
+    def from_dict(cls, data):
+        """
+        Restore counters saved with to_dict().
+        
+        Args:
+            data: Dictionary from the sidecar file
+        
+        Returns:
+            JoinStats instance
+        """
+        stats = cls()
+        stats.total = data.get("total", 0)
+        stats.with_avatar = data.get("with_avatar", 0)
+        stats.hourly = dict(data.get("hourly", {}))
+        stats.daily = dict(data.get("daily", {}))
+        stats._hour_order = sorted(stats.hourly)
+        stats._day_order = sorted(stats.daily)
+        stats.account_age = dict(data.get("account_age", {}))
+        return stats
+    
+    def joins_in_last_hours(self, hours, now=None):
+        """
+        Count joins in the current hour and the hours before it.
+        
+        Args:
+            hours: Number of hour buckets to include (1 = current hour only)
+            now: Reference time (default: current UTC time)
+        
+        Returns:
+            Number of joins
+        """
+        now = now or datetime.now(timezone.utc)
+        first = (now - timedelta(hours=hours - 1)).strftime("%Y-%m-%dT%H")
+        return sum(count for hour, count in self.hourly.items() if hour >= first)
+    
+    def joins_today(self, now=None):
+        """Count joins since midnight UTC."""
+        now = now or datetime.now(timezone.utc)
+        return self.daily.get(now.strftime("%Y-%m-%d"), 0)
+    
+    def avatar_ratio(self):
+        """Share of joins with a custom avatar (0.0 when there are no joins)."""
+        return self.with_avatar / self.total if self.total else 0.0
+    
+    def account_age_histogram(self):
+        """
+        Get account-age counts in bucket order.
+        
+        Returns:
+            List of (label, joins) tuples, skipping empty buckets
+        """
+        labels = [label for _, label in AGE_BUCKETS] + [AGE_UNKNOWN]
+        return [(label, self.account_age[label]) for label in labels if self.account_age.get(label)]
+    
+    def peak_hour(self):
+        """
+        Get the busiest hour bucket still kept.
+        
+        Returns:
+            Tuple of ("YYYY-MM-DDTHH", joins), or None if there are no joins
+        """
+        if not self.hourly:
+            return None
+        return max(self.hourly.items(), key=lambda item: item[1])
@@ -1,20 +1,77 @@
 """
 Logging utility for Discord Member Tracking Bot.
 Provides consistent timestamp formatting for all console output.
+
+Calls only put the message on a queue; a background thread formats the
+lines and writes them in batches, so logging never does console or file
+I/O on the event loop. Output goes to stdout and, optionally, to a log
+file rotated by size and/or age. Lines are plain text by default or JSON
+objects (one per line) with configure(json_format=True).
 """
 
+import atexit
+import json
+import os
+import queue
+import sys
+import threading
+import time
 from datetime import datetime
 
+LEVELS = {"DEBUG": 10, "INFO": 20, "WARN": 30, "ERROR": 40}
+
+_queue = queue.SimpleQueue()
+_writer = None
+_writer_lock = threading.Lock()
+_STOP = object()
+
+# Settings, changed with configure()
+_threshold = LEVELS["INFO"]
+_json_format = False
+_file = None  # RotatingFile when file logging is enabled
+_console = True
+
+def configure(level="INFO", json_format=False, filename=None, max_bytes=0,
+              rotate_hours=0, backups=5, console=True):
+    """
+    Configure logging. Safe to call at any time; applies to later messages.
+    
+    Args:
+        level: Lowest level written (DEBUG, INFO, WARN or ERROR)
+        json_format: Write JSON lines instead of plain text
+        filename: Optional log file path
+        max_bytes: Rotate the log file once it reaches this size (0 = never)
+        rotate_hours: Rotate the log file after this many hours (0 = never)
+        backups: Rotated files kept (name.1 ... name.N)
+        console: Whether to also write to stdout
+    """
+    global _threshold, _json_format, _file, _console
+    _threshold = LEVELS.get(str(level).upper(), LEVELS["INFO"])
+    _json_format = json_format
+    _console = console
+    old, _file = _file, None
+    if old is not None:
+        _queue.put(("close", old))
+    if filename:
+        _file = RotatingFile(filename, max_bytes, rotate_hours * 3600, backups)
+
 def log(message, level="INFO"):
     """
     Log a message with timestamp and level.
     
     Args:
         message: The message to log
-        level: Log level (INFO, WARN, ERROR)
+        level: Log level (DEBUG, INFO, WARN, ERROR)
     """
-    timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-    print(f"[{timestamp}] {message}")
+    if LEVELS.get(level, LEVELS["INFO"]) < _threshold:
+        return
+    if _writer is None:
+        _start_writer()
+    _queue.put((time.time(), level, message, _file))
+
+def log_debug(message):
+    """Log a debug message (hidden unless the level is DEBUG)."""
+    log(message, "DEBUG")
 
 def log_error(message):
     """Log an error message."""
@@ -27,3 +84,173 @@ def log_warning(message):
 def log_success(message):
     """Log a success message."""
     log(f"✅ {message}", "INFO")
+
+def flush(timeout=5):
+    """
+    Wait until every queued message has been written.
+    
+    Args:
+        timeout: Maximum seconds to wait
+    """
+    if _writer is None:
+        return
+    done = threading.Event()
+    _queue.put(("flush", done))
+    done.wait(timeout)
+
+def _format(created, level, message):
+    """Format one record as a text or JSON line."""
+    if _json_format:
+        return json.dumps({
+            "time": datetime.fromtimestamp(created).isoformat(timespec="milliseconds"),
+            "level": level,
+            "message": str(message)
+        }, ensure_ascii=False) + "\n"
+    timestamp = datetime.fromtimestamp(created).strftime("%Y-%m-%d %H:%M:%S")
+    return f"[{timestamp}] {message}\n"
+
+def _start_writer():
+    """Start the background writer thread once."""
+    global _writer
+    with _writer_lock:
+        if _writer is None:
+            thread = threading.Thread(target=_write_loop, name="log-writer", daemon=True)
+            thread.start()
+            _writer = thread
+
+def _write_loop():
+    """Writer thread: drain the queue in batches and write each batch at once."""
+    while True:
+        batch = [_queue.get()]
+        while len(batch) < 500:
+            try:
+                batch.append(_queue.get_nowait())
+            except queue.Empty:
+                break
+        
+        console, files, events, stop = [], {}, [], False
+        for item in batch:
+            if item is _STOP:
+                stop = True
+            elif item[0] == "flush":
+                events.append(item[1])
+            elif item[0] == "close":
+                files.setdefault(item[1], [])
+            else:
+                created, level, message, target = item
+                line = _format(created, level, message)
+                if _console:
+                    console.append(line)
+                if target is not None:
+                    files.setdefault(target, []).append(line)
+        
+        if console:
+            _write_console("".join(console))
+        for target, lines in files.items():
+            if lines:
+                target.write(lines)
+            if target is not _file:
+                target.close()  # Replaced by configure()
+        for event in events:
+            event.set()
+        if stop:
+            return
+
+def _write_console(text):
+    """Write to stdout, replacing characters the console cannot encode."""
+    try:
+        sys.stdout.write(text)
+        sys.stdout.flush()
+    except UnicodeEncodeError:
+        encoding = sys.stdout.encoding or "ascii"
+        sys.stdout.write(text.encode(encoding, "replace").decode(encoding))
+        sys.stdout.flush()
+    except Exception:
+        pass  # Never let a broken stdout kill the writer
+
+def _shutdown():
+    """Write everything still queued before the interpreter exits."""
+    if _writer is not None and _writer.is_alive():
+        _queue.put(_STOP)
+        _writer.join(timeout=5)
+    if _file is not None:
+        _file.close()
+
+atexit.register(_shutdown)
+
+
+class RotatingFile:
+    """Append-only log file rotated by size and/or age. Used by the writer thread only."""
+    
+    def __init__(self, path, max_bytes=0, max_age=0, backups=5):
+        """
+        Initialize the log file.
+        
+        Args:
+            path: Log file path
+            max_bytes: Rotate once the file reaches this size (0 = never)
+            max_age: Rotate after this many seconds (0 = never)
+            backups: Rotated files kept
+        """
+        self.path = path
+        self.max_bytes = max_bytes
+        self.max_age = max_age
+        self.backups = backups
+        self._f = None
+        self._opened_at = 0.0
+        self._size = 0  # Bytes in the current file
+    
+    def _open(self):
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._f = open(self.path, 'a', encoding='utf-8')
+        self._opened_at = time.time()
+        self._size = self._f.tell()
+    
+    def _should_rotate(self):
+        if self.max_bytes and self._size >= self.max_bytes:
+            return True
+        return bool(self.max_age) and time.time() - self._opened_at >= self.max_age
+    
+    def _rotate(self):
+        """Shift name.N-1 -> name.N ... name -> name.1 and start a new file."""
+        self._f.close()
+        self._f = None
+        if self.backups > 0:
+            for i in range(self.backups - 1, 0, -1):
+                if os.path.exists(f"{self.path}.{i}"):
+                    os.replace(f"{self.path}.{i}", f"{self.path}.{i + 1}")
+            os.replace(self.path, f"{self.path}.1")
+        else:
+            os.remove(self.path)
+        self._open()
+    
+    def write(self, lines):
+        """
+        Append lines, rotating whenever the file is due.
+        
+        Args:
+            lines: Formatted lines (each ending in a newline)
+        """
+        try:
+            if self._f is None:
+                self._open()
+            chunk = []
+            for line in lines:
+                if self._should_rotate():
+                    self._f.write("".join(chunk))
+                    chunk = []
+                    self._rotate()
+                chunk.append(line)
+                self._size += len(line.encode('utf-8'))
+            self._f.write("".join(chunk))
+            self._f.flush()
+        except Exception as e:
+            sys.stderr.write(f"Log file write failed ({self.path}): {e}\n")
+    
+    def close(self):
+        """Close the file."""
+        if self._f is not None:
+            self._f.close()
+            self._f = None
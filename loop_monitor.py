@@ -0,0 +1,158 @@
+"""
+Event loop lag monitor for Discord Member Tracking Bot.
+The gateway, health server, Telegram sends and data writes all share one
+asyncio loop, so anything that blocks it delays Discord heartbeats.
+
+A heartbeat task measures how late the loop wakes it (the loop lag). A
+watchdog thread notices when the heartbeat goes stale and takes a snapshot
+of the loop thread's stack, so the slow callback can be named once the
+loop recovers, or logged right away if the loop stays stuck.
+"""
+
+import asyncio
+import os
+import sys
+import threading
+import time
+import traceback
+from collections import deque
+from logger import log_warning
+from stats import LatencyStats
+
+PROJECT_DIR = os.path.dirname(os.path.abspath(__file__))
+
+class LoopMonitor:
+    """Measures event loop lag and names the code that blocked the loop."""
+    
+    def __init__(self, interval=0.25, slow_threshold=0.25, stuck_threshold=5.0):
+        """
+        Initialize the monitor.
+        
+        Args:
+            interval: Seconds between heartbeats
+            slow_threshold: Lag in seconds reported as a slow callback
+            stuck_threshold: Seconds without a heartbeat before the stack is
+                logged while the loop is still blocked
+        """
+        self.interval = interval
+        self.slow_threshold = slow_threshold
+        self.stuck_threshold = stuck_threshold
+        self.lag = LatencyStats()  # Heartbeat lateness
+        self.slow_callbacks = 0
+        self.max_lag = 0.0
+        self.recent = deque(maxlen=20)  # (time, seconds blocked, culprit)
+        self._beat = time.monotonic()  # Last heartbeat, read by the watchdog thread
+        self._blocked = None  # Culprit captured during the current stall
+        self._stuck_logged = False
+        self._loop = None
+        self._loop_thread_id = None
+        self._task = None
+        self._stop = threading.Event()
+        self._watchdog = None
+    
+    def start(self):
+        """Start the heartbeat task and watchdog thread on the running loop."""
+        if self._task is not None:
+            return
+        self._loop = asyncio.get_running_loop()
+        self._loop_thread_id = threading.get_ident()
+        self._beat = time.monotonic()
+        self._task = self._loop.create_task(self._heartbeat())
+        self._stop.clear()
+        self._watchdog = threading.Thread(target=self._watch, name="loop-watchdog", daemon=True)
+        self._watchdog.start()
+    
+    async def stop(self):
+        """Stop the heartbeat task and watchdog thread."""
+        self._stop.set()
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+    
+    async def _heartbeat(self):
+        """Sleep for interval and record how late the loop woke us."""
+        while True:
+            expected = time.monotonic() + self.interval
+            await asyncio.sleep(self.interval)
+            now = time.monotonic()
+            lag = max(0.0, now - expected)
+            self._beat = now
+            self.lag.add(lag)
+            self.max_lag = max(self.max_lag, lag)
+            
+            culprit, self._blocked = self._blocked, None
+            self._stuck_logged = False
+            if lag >= self.slow_threshold:
+                self.slow_callbacks += 1
+                culprit = culprit or "unknown (finished before the watchdog looked)"
+                self.recent.append((time.time(), lag, culprit))
+                log_warning(f"Event loop blocked for at least {lag * 1000:.0f}ms by {culprit}")
+    
+    def _watch(self):
+        """Watchdog thread: snapshot the loop thread while the heartbeat is late."""
+        check = min(self.interval, self.slow_threshold) / 2
+        while not self._stop.wait(check):
+            stale = time.monotonic() - self._beat - self.interval
+            if stale < self.slow_threshold / 2:
+                continue
+            if self._blocked is None:
+                self._blocked = self._describe_loop_thread()
+            if stale >= self.stuck_threshold and not self._stuck_logged:
+                self._stuck_logged = True
+                log_warning(f"Event loop stuck for {stale:.1f}s in {self._blocked}\n"
+                            + "".join(self._loop_stack()))
+    
+    def _loop_stack(self):
+        """Format the loop thread's current stack."""
+        frame = sys._current_frames().get(self._loop_thread_id)
+        return traceback.format_stack(frame) if frame is not None else []
+    
+    def _describe_loop_thread(self):
+        """
+        Name what the loop thread is running right now.
+        
+        Returns:
+            "<task or handler> at <file>:<line> in <function>", preferring
+            the innermost frame from this project
+        """
+        frame = sys._current_frames().get(self._loop_thread_id)
+        if frame is None:
+            return "unknown"
+        stack = traceback.extract_stack(frame)
+        own = [f for f in stack
+               if f.filename.startswith(PROJECT_DIR) and not f.filename.endswith("loop_monitor.py")]
+        where = (own or stack)[-1]
+        location = f"{os.path.basename(where.filename)}:{where.lineno} in {where.name}()"
+        
+        try:
+            task = asyncio.current_task(self._loop)
+        except RuntimeError:
+            task = None
+        if task is not None:
+            coro = task.get_coro()
+            name = getattr(coro, "__qualname__", None) or task.get_name()
+            # discord.py wraps handlers in _run_event; the outer project frame names the handler
+            handler = next((f.name for f in own if f.name.startswith("on_")), None)
+            return f"{handler or name} at {location}"
+        return location
+    
+    def get_stats(self):
+        """
+        Get lag statistics.
+        
+        Returns:
+            Dictionary with lag summary, slow callback count, max lag and recent stalls
+        """
+        return {
+            "lag": self.lag.summary(),
+            "slow_callbacks": self.slow_callbacks,
+            "max_lag_ms": round(self.max_lag * 1000, 2),
+            "recent": [
+                {"at": at, "blocked_ms": round(lag * 1000, 2), "culprit": culprit}
+                for at, lag, culprit in self.recent
+            ]
+        }
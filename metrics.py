@@ -0,0 +1,252 @@
+"""
+Prometheus metrics for Discord Member Tracking Bot.
+Renders counters, gauges and histograms in the Prometheus text format
+for the /metrics endpoint of the health server.
+
+Every value is read from counters the bot already keeps, so a scrape is
+O(number of servers) and never touches the join history. Rates are rolled
+up by a scheduler job (BotMetrics.rollup) rather than computed per scrape.
+"""
+
+import math
+import os
+import time
+
+PREFIX = "member_tracker_"
+ROLLUP_SECONDS = 60  # How often BotMetrics.rollup should run
+
+def _escape(value):
+    """Escape a label value for the text format."""
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+def _format_labels(labels):
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{key}="{_escape(value)}"' for key, value in labels.items()) + "}"
+
+def _format_value(value):
+    if isinstance(value, float) and math.isinf(value):
+        return "+Inf" if value > 0 else "-Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+def process_rss_bytes():
+    """
+    Get the resident memory of this process.
+    
+    Reads /proc on Linux; elsewhere falls back to the peak RSS reported by
+    getrusage.
+    
+    Returns:
+        Resident set size in bytes, or None if it is not available
+    """
+    try:
+        with open("/proc/self/statm", "r") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError, AttributeError):
+        pass
+    try:
+        import resource
+        import sys
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak if sys.platform == "darwin" else peak * 1024
+    except (ImportError, OSError):
+        return None
+
+
+class MetricsWriter:
+    """Collects samples grouped by metric name and renders the exposition text."""
+    
+    def __init__(self):
+        """Initialize an empty set of metric families."""
+        self._families = {}  # name -> [type, help, sample lines]
+    
+    def _family(self, name, kind, help_text):
+        name = PREFIX + name
+        if name not in self._families:
+            self._families[name] = [kind, help_text, []]
+        return name, self._families[name][2]
+    
+    def gauge(self, name, help_text, value, labels=None):
+        """Add a gauge sample (skipped when value is None or NaN)."""
+        if value is None or (isinstance(value, float) and math.isnan(value)):
+            return
+        name, lines = self._family(name, "gauge", help_text)
+        lines.append(f"{name}{_format_labels(labels)} {_format_value(value)}")
+    
+    def counter(self, name, help_text, value, labels=None):
+        """Add a counter sample (name should end in _total)."""
+        name, lines = self._family(name, "counter", help_text)
+        lines.append(f"{name}{_format_labels(labels)} {_format_value(value)}")
+    
+    def histogram(self, name, help_text, histogram, labels=None):
+        """
+        Add a histogram from a stats.Histogram.
+        
+        Args:
+            name: Metric name without the prefix
+            help_text: HELP line text
+            histogram: stats.Histogram instance
+            labels: Optional label dictionary
+        """
+        name, lines = self._family(name, "histogram", help_text)
+        labels = labels or {}
+        for bound, count in histogram.cumulative():
+            bucket_labels = dict(labels, le=bound if isinstance(bound, str) else repr(float(bound)))
+            lines.append(f"{name}_bucket{_format_labels(bucket_labels)} {count}")
+        lines.append(f"{name}_sum{_format_labels(labels)} {_format_value(histogram.sum)}")
+        lines.append(f"{name}_count{_format_labels(labels)} {histogram.count}")
+    
+    def render(self):
+        """Get the metrics in the Prometheus text exposition format."""
+        out = []
+        for name, (kind, help_text, lines) in self._families.items():
+            out.append(f"# HELP {name} {help_text}")
+            out.append(f"# TYPE {name} {kind}")
+            out.extend(lines)
+        return "\n".join(out) + "\n"
+
+
+class BotMetrics:
+    """
+    Live view of the bot's components for /metrics.
+    
+    bot.py fills in the attributes as components are created; anything
+    left as None is simply not reported.
+    """
+    
+    def __init__(self, bot=None):
+        """
+        Initialize the metrics view.
+        
+        Args:
+            bot: Discord bot instance (for gateway latency and guild count)
+        """
+        self.bot = bot
+        self.data_manager = None  # MultiServerDataManager
+        self.telegram_sender = None  # TelegramSender
+        self.telegram_outbox = None  # TelegramOutbox
+        self.loop_monitor = None  # LoopMonitor
+        self.join_pipeline = None  # JoinPipeline
+        self.scheduler = None  # Scheduler
+        self.started = time.time()
+        self.join_rate = None  # Joins per minute over the last rollup interval
+        self._last_rollup = None  # (monotonic time, joins recorded) at the last rollup
+    
+    def render(self):
+        """
+        Collect every metric.
+        
+        Returns:
+            Prometheus text exposition format string
+        """
+        w = MetricsWriter()
+        w.gauge("start_time_seconds", "Unix time the process started.", self.started)
+        w.gauge("process_resident_memory_bytes", "Resident memory of the bot process.",
+                process_rss_bytes())
+        
+        if self.bot is not None:
+            latency = getattr(self.bot, "latency", None)
+            if latency is not None and math.isfinite(latency):
+                w.gauge("gateway_latency_seconds", "Discord gateway heartbeat latency.", latency)
+            w.gauge("guilds", "Servers the account is in.", len(self.bot.guilds or []))
+        
+        monitor = self.loop_monitor
+        if monitor is not None:
+            w.histogram("event_loop_lag_seconds", "How late the event loop ran its heartbeat.",
+                        monitor.lag.histogram)
+            w.gauge("event_loop_max_lag_seconds", "Largest event loop lag seen.", monitor.max_lag)
+            w.counter("event_loop_slow_callbacks_total",
+                      "Times a callback blocked the event loop past the warning threshold.",
+                      monitor.slow_callbacks)
+        
+        self._collect_storage(w)
+        self._collect_ingest(w)
+        self._collect_telegram(w)
+        self._collect_scheduler(w)
+        return w.render()
+    
+    def rollup(self):
+        """Turn the join counters into a joins-per-minute rate. Run every ROLLUP_SECONDS."""
+        dm = self.data_manager
+        now = time.monotonic()
+        joins = sum(server.joins_recorded for server in list(dm.get_all_servers())) if dm else 0
+        if self._last_rollup is not None:
+            last_time, last_joins = self._last_rollup
+            self.join_rate = (joins - last_joins) * 60 / max(now - last_time, 1e-9)
+        self._last_rollup = (now, joins)
+    
+    def _collect_storage(self, w):
+        """Per-server join counters and persistence latency."""
+        dm = self.data_manager
+        if dm is None:
+            return
+        w.gauge("tracked_servers", "Servers with a data manager.", len(dm.servers))
+        for server in list(dm.get_all_servers()):
+            labels = {"server_id": server.server_id, "server": server.server_name}
+            w.counter("joins_total", "Member joins processed since the process started.",
+                      server.joins_recorded, labels)
+            w.gauge("pending_joins", "Joins recorded but not yet written to disk.",
+                    server.pending_count(), labels)
+        
+        w.histogram("persist_latency_seconds",
+                    "Time from a join being recorded to it being written to disk.",
+                    dm.persist_latency.histogram)
+        
+        flusher = dm.write_behind
+        if flusher is not None:
+            stats = flusher.get_stats()
+            w.counter("flushes_total", "Write-behind flush rounds.", stats["flushes"])
+            w.counter("flush_failures_total", "Failed server flushes.", stats["failures"])
+            w.gauge("flush_dirty_servers", "Servers waiting for the next flush.", stats["dirty_servers"])
+    
+    def _collect_ingest(self, w):
+        """Join pipeline queue depth, backpressure and drops."""
+        pipeline = self.join_pipeline
+        if pipeline is None:
+            return
+        w.gauge("ingest_queue_depth", "Joins waiting in the ingest pipeline.", pipeline.queue_depth())
+        w.counter("ingest_joins_total", "Joins processed by the ingest pipeline.", pipeline.processed)
+        w.counter("ingest_batches_total", "Batches processed by the ingest pipeline.", pipeline.batches)
+        w.counter("ingest_blocked_total", "Join handlers that waited for room in a full queue.",
+                  pipeline.blocked)
+        w.counter("ingest_dropped_total", "Joins dropped because the ingest queue was full.",
+                  pipeline.dropped)
+        w.histogram("ingest_latency_seconds", "Time from a join being queued to it being saved.",
+                    pipeline.latency.histogram)
+    
+    def _collect_telegram(self, w):
+        """Telegram request latency, failures and outbound queue state."""
+        sender = self.telegram_sender
+        if sender is not None:
+            w.histogram("telegram_request_latency_seconds",
+                        "Latency of successful Telegram API requests.", sender.latency.histogram)
+            w.counter("telegram_failures_total", "Failed Telegram API requests.", sender.failures)
+        
+        outbox = self.telegram_outbox
+        if outbox is not None:
+            stats = outbox.get_stats()
+            w.gauge("telegram_queue_depth", "Messages waiting in the Telegram outbound queue.",
+                    stats["queue_depth"])
+            w.gauge("telegram_pending_joins", "Join notifications waiting to be sent or merged.",
+                    stats["pending_joins"])
+            w.counter("telegram_messages_sent_total", "Messages sent by the outbound queue.", stats["sent"])
+            w.counter("telegram_joins_merged_total", "Join notifications merged into digests.", stats["merged"])
+            w.counter("telegram_dropped_total", "Notifications dropped because the queue was full.",
+                      stats["dropped"])
+            w.counter("telegram_rate_limited_total", "Telegram 429 responses.", stats["rate_limited"])
+    
+    def _collect_scheduler(self, w):
+        """Scheduled job runs, skips and start lateness, plus the rolled-up join rate."""
+        if self.join_rate is not None:
+            w.gauge("join_rate_per_minute", "Joins per minute over the last rollup interval.", self.join_rate)
+        scheduler = self.scheduler
+        if scheduler is None:
+            return
+        w.histogram("scheduler_lateness_seconds", "How late scheduled jobs started.",
+                    scheduler.lateness.histogram)
+        for name, stats in scheduler.get_stats().items():
+            labels = {"job": name}
+            w.counter("scheduler_runs_total", "Runs of a scheduled job.", stats["runs"], labels)
+            w.counter("scheduler_skipped_total",
+                      "Runs of a scheduled job skipped because it was late or still busy.",
+                      stats["skipped"], labels)
@@ -2,16 +2,26 @@
 Reporter for Discord Member Tracking Bot.
 Sends periodic and final reports to a configured Discord channel.
 Supports multi-server tracking.
+
+Periodic reports are sent by a scheduler job (see Reporter.start), so join
+handling never waits on Discord. A server is due after a number of new
+joins or, if it has any new joins, after a time interval; servers due at
+the same time share one message. The job is scheduled for exactly the
+moment the next server becomes due, so nothing polls for due reports.
 """
 
 import discord
+import time
 from datetime import datetime
 from logger import log, log_error
 
 class Reporter:
     """Handles sending reports to Discord channels."""
     
-    def __init__(self, bot, channel_id, data_manager, start_time):
+    EMBED_SERVER_LIMIT = 10  # Servers per combined report embed
+    
+    def __init__(self, bot, channel_id, data_manager, start_time,
+                 every_joins=50, interval_seconds=3600, retry_seconds=5):
         """
         Initialize the reporter.
         
@@ -20,21 +30,52 @@ class Reporter:
             channel_id: Discord channel ID for reports
             data_manager: MultiServerDataManager instance
             start_time: Bot start time for calculating duration
+            every_joins: New joins in a server that make a report due
+            interval_seconds: Seconds after which a server with new joins is due
+            retry_seconds: Seconds before retrying after a report failed to send
         """
         self.bot = bot
         self.channel_id = channel_id
         self.data_manager = data_manager
         self.start_time = start_time
+        self.every_joins = every_joins
+        self.interval_seconds = interval_seconds
+        self.retry_seconds = retry_seconds
         self.last_report_counts = {}  # server_id -> last reported count
+        self._channel = None  # Resolved once, dropped on delete or send failure
+        self._new_joins = {}  # server_id -> joins since the last report
+        self._last_report_times = {}  # server_id -> monotonic time of the last report
+        self.scheduler = None  # Scheduler running the report job, set by start()
     
     async def get_channel(self):
-        """Get the Discord channel object."""
-        try:
-            channel = await self.bot.fetch_channel(self.channel_id)
-            return channel
-        except Exception as e:
-            log_error(f"Failed to fetch report channel: {e}")
-            return None
+        """
+        Get the Discord channel object.
+        
+        The channel is resolved once and reused. The gateway cache is tried
+        first; the REST API is only used when the channel is not cached.
+        """
+        if self._channel is not None:
+            return self._channel
+        
+        channel = self.bot.get_channel(self.channel_id)
+        if channel is None:
+            try:
+                channel = await self.bot.fetch_channel(self.channel_id)
+            except Exception as e:
+                log_error(f"Failed to fetch report channel: {e}")
+                return None
+        self._channel = channel
+        return channel
+    
+    def invalidate_channel(self, channel_id=None):
+        """
+        Forget the cached report channel so the next report resolves it again.
+        
+        Args:
+            channel_id: Only invalidate if this is the report channel (default: always)
+        """
+        if channel_id is None or channel_id == self.channel_id:
+            self._channel = None
     
     async def send_periodic_report(self, guild_id):
         """
@@ -42,18 +83,24 @@ class Reporter:
         
         Args:
             guild_id: Discord guild ID
+        
+        Returns:
+            True if the report was sent
         """
         channel = await self.get_channel()
         if not channel:
-            return
+            return False
         
         # Get server data manager
         server_dm = self.data_manager.servers.get(str(guild_id))
         if not server_dm:
-            return
+            return False
         
+        await self.data_manager.index_servers([server_dm])
         total_joins = server_dm.get_total_joins()
         recent_joins = server_dm.get_recent_joins(5)
+        rejoin_summary = server_dm.get_rejoin_summary()
+        stats = server_dm.get_stats()
         
         # Create embed
         embed = discord.Embed(
@@ -78,10 +125,45 @@ class Reporter:
             inline=True
         )
         
+        embed.add_field(
+            name="First-time / Rejoins",
+            value=f"{rejoin_summary['first_time']} / {rejoin_summary['rejoins']}",
+            inline=True
+        )
+        
+        # Rolling stats are kept up to date per join, so no history scan here
+        embed.add_field(
+            name="Joins (1h / 24h / today)",
+            value=f"{stats.joins_in_last_hours(1)} / {stats.joins_in_last_hours(24)} / {stats.joins_today()}",
+            inline=True
+        )
+        
+        embed.add_field(
+            name="Without Avatar",
+            value=f"{(1 - stats.avatar_ratio()) * 100:.0f}%" if stats.total else "-",
+            inline=True
+        )
+        
+        peak = stats.peak_hour()
+        embed.add_field(
+            name="Busiest Hour (7d)",
+            value=f"{peak[0].replace('T', ' ')}:00 UTC ({peak[1]})" if peak else "-",
+            inline=True
+        )
+        
+        histogram = stats.account_age_histogram()
+        if histogram:
+            embed.add_field(
+                name="Account Age at Join",
+                value="\n".join(f"{label}: {count}" for label, count in histogram),
+                inline=False
+            )
+        
         # Recent joins
         if recent_joins:
             recent_text = "\n".join([
                 f"• {m['username']}#{m['discriminator']}"
+                + (f" (rejoin #{m['join_count']})" if m.get("is_rejoin") else "")
                 for m in recent_joins
             ])
             embed.add_field(
@@ -94,8 +176,11 @@ class Reporter:
             await channel.send(embed=embed)
             log(f"Sent periodic report for {server_dm.server_name} to channel {self.channel_id}")
             self.last_report_counts[str(guild_id)] = total_joins
+            return True
         except Exception as e:
+            self.invalidate_channel()
             log_error(f"Failed to send periodic report: {e}")
+            return False
     
     async def send_final_report(self, shutdown_reason):
         """
@@ -108,7 +193,9 @@ class Reporter:
         if not channel:
             return
         
-        total_joins_all = self.data_manager.get_total_joins_all_servers()
+        # Sent during shutdown: servers never read this run are not loaded just for the report
+        total_joins_all = self.data_manager.get_total_joins_all_servers(indexed_only=True)
+        unindexed = self.data_manager.count_unindexed()
         
         # Create embed
         embed = discord.Embed(
@@ -137,9 +224,16 @@ class Reporter:
         if self.data_manager.servers:
             server_stats = []
             for server_dm in self.data_manager.get_all_servers():
+                if not server_dm.is_indexed():
+                    continue
                 joins = server_dm.get_total_joins()
-                server_stats.append(f"• **{server_dm.server_name}**: {joins} joins")
+                rejoins = server_dm.get_rejoin_summary()["rejoins"]
+                no_avatar = (1 - server_dm.get_stats().avatar_ratio()) * 100 if joins else 0
+                server_stats.append(f"• **{server_dm.server_name}**: {joins} joins ({rejoins} rejoins, "
+                                    f"{no_avatar:.0f}% without avatar)")
                 server_stats.append(f"  └ File: `{server_dm.filename}`")
+            if unindexed:
+                server_stats.append(f"• {unindexed} server(s) not loaded yet (not counted)")
             
             embed.add_field(
                 name="Per-Server Statistics",
@@ -151,12 +245,29 @@ class Reporter:
             await channel.send(embed=embed)
             log(f"Sent final report to channel {self.channel_id}")
         except Exception as e:
+            self.invalidate_channel()
             log_error(f"Failed to send final report: {e}")
     
+    def record_join(self, guild_id):
+        """
+        Count a join towards the next periodic report. Never blocks.
+        
+        Args:
+            guild_id: Discord guild ID
+        """
+        server_id = str(guild_id)
+        count = self._new_joins.get(server_id, 0) + 1
+        self._new_joins[server_id] = count
+        self._last_report_times.setdefault(server_id, time.monotonic())
+        # Only the first join (interval deadline) and the every_joins-th can move the due time
+        if count == 1 or count == self.every_joins:
+            self._schedule_next()
+    
     def should_send_periodic_report(self, guild_id):
         """
-        Check if a periodic report should be sent for a specific server.
-        Sends every 50 joins OR every hour (handled by timer).
+        Check if a periodic report is due for a specific server.
+        Due after every_joins new joins, or after interval_seconds if the
+        server has had any new joins since its last report.
         
         Args:
             guild_id: Discord guild ID
@@ -164,11 +275,147 @@ class Reporter:
         Returns:
             True if report should be sent
         """
-        server_dm = self.data_manager.servers.get(str(guild_id))
-        if not server_dm:
+        server_id = str(guild_id)
+        new_joins = self._new_joins.get(server_id, 0)
+        if new_joins >= self.every_joins:
+            return True
+        elapsed = time.monotonic() - self._last_report_times.get(server_id, time.monotonic())
+        return new_joins > 0 and elapsed >= self.interval_seconds
+    
+    def start(self, scheduler):
+        """
+        Send periodic reports from a scheduler job.
+        
+        Args:
+            scheduler: Running Scheduler
+        """
+        self.scheduler = scheduler
+        self._schedule_next()
+    
+    async def stop(self):
+        """Stop sending periodic reports."""
+        if self.scheduler is not None:
+            self.scheduler.cancel("periodic-report")
+            self.scheduler = None
+    
+    def _schedule_next(self, min_delay=0.0):
+        """
+        Schedule the report job for when the next server becomes due.
+        
+        Args:
+            min_delay: Seconds to wait at least (used to back off after a failure)
+        """
+        if self.scheduler is None:
+            return
+        if not self._new_joins:
+            self.scheduler.cancel("periodic-report")
+            return
+        now = time.monotonic()
+        due = min(
+            now if count >= self.every_joins
+            else self._last_report_times.get(server_id, now) + self.interval_seconds
+            for server_id, count in self._new_joins.items()
+        )
+        self.scheduler.call_at(max(due, now + min_delay), "periodic-report", self._send_scheduled)
+    
+    async def _send_scheduled(self):
+        """Scheduler job: send the due reports, then schedule the next run."""
+        failed = False
+        try:
+            await self.send_due_reports()
+        except Exception as e:
+            failed = True
+            log_error(f"Error sending periodic reports: {e}")
+        # Anything still due now failed to send (or belongs to an untracked server)
+        still_due = failed or any(self.should_send_periodic_report(server_id) for server_id in self._new_joins)
+        self._schedule_next(self.retry_seconds if still_due else 0.0)
+    
+    async def send_due_reports(self):
+        """
+        Send one report covering every server that is due.
+        
+        Returns:
+            Number of servers reported
+        """
+        due = [server_id for server_id in list(self._new_joins)
+               if self.should_send_periodic_report(server_id)]
+        due = [server_id for server_id in due if server_id in self.data_manager.servers]
+        if not due:
+            return 0
+        
+        # Joins arriving while the report is sent count towards the next one
+        counts = {server_id: self._new_joins[server_id] for server_id in due}
+        if len(due) == 1:
+            sent = await self.send_periodic_report(due[0])
+        else:
+            sent = await self.send_combined_report(due, counts)
+        if not sent:
+            return 0
+        
+        now = time.monotonic()
+        for server_id, count in counts.items():
+            remaining = self._new_joins.get(server_id, 0) - count
+            if remaining > 0:
+                self._new_joins[server_id] = remaining
+            else:
+                self._new_joins.pop(server_id, None)
+            self._last_report_times[server_id] = now
+        return len(due)
+    
+    async def send_combined_report(self, server_ids, new_joins):
+        """
+        Send one message summarising several servers.
+        
+        Args:
+            server_ids: Server IDs (as strings) to include
+            new_joins: Dictionary of server_id -> joins since the last report
+        
+        Returns:
+            True if every part of the report was sent
+        """
+        channel = await self.get_channel()
+        if not channel:
             return False
         
-        total_joins = server_dm.get_total_joins()
-        last_count = self.last_report_counts.get(str(guild_id), 0)
+        duration = datetime.now() - self.start_time
+        hours = int(duration.total_seconds() // 3600)
+        minutes = int((duration.total_seconds() % 3600) // 60)
+        
+        await self.data_manager.index_servers([self.data_manager.servers[server_id] for server_id in server_ids])
+        fields = []
+        for server_id in server_ids:
+            server_dm = self.data_manager.servers[server_id]
+            total_joins = server_dm.get_total_joins()
+            rejoin_summary = server_dm.get_rejoin_summary()
+            stats = server_dm.get_stats()
+            recent = ", ".join(
+                f"{m['username']}#{m['discriminator']}" for m in server_dm.get_recent_joins(3))
+            value = (f"**{total_joins}** joins (+{new_joins[server_id]} new)\n"
+                     f"First-time / Rejoins: {rejoin_summary['first_time']} / {rejoin_summary['rejoins']}\n"
+                     f"Last 24h: {stats.joins_in_last_hours(24)} • "
+                     f"Without avatar: {(1 - stats.avatar_ratio()) * 100:.0f}%")
+            if recent:
+                value += f"\nRecent: {recent}"
+            fields.append((server_dm.server_name[:256], value[:1024], server_id, total_joins))
+        
+        for start in range(0, len(fields), self.EMBED_SERVER_LIMIT):
+            chunk = fields[start:start + self.EMBED_SERVER_LIMIT]
+            embed = discord.Embed(
+                title=f"📊 Member Join Report - {len(server_ids)} Servers",
+                description=f"Periodic update on member tracking • running {hours}h {minutes}m",
+                color=0x3498db,  # Blue
+                timestamp=datetime.utcnow()
+            )
+            for name, value, _, _ in chunk:
+                embed.add_field(name=name, value=value, inline=False)
+            try:
+                await channel.send(embed=embed)
+            except Exception as e:
+                self.invalidate_channel()
+                log_error(f"Failed to send periodic report: {e}")
+                return False
+            for _, _, server_id, total_joins in chunk:
+                self.last_report_counts[server_id] = total_joins
         
-        return (total_joins - last_count) >= 50
+        log(f"Sent combined periodic report for {len(server_ids)} servers to channel {self.channel_id}")
+        return True
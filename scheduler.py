@@ -0,0 +1,239 @@
+"""
+Task scheduler for Discord Member Tracking Bot.
+All timed work (the auto-disable timer, status logs, periodic reports,
+snapshots and metric rollups) runs from one task that keeps the jobs in a
+heap ordered by due time and sleeps until the earliest one is due, so
+nothing polls and every job runs at its exact time.
+
+Periodic jobs run at a fixed rate from their first due time, so they do
+not drift. Slots missed while the event loop was blocked are skipped
+rather than run back to back, and a run that is still busy when its job
+comes due again is skipped, so a job never overlaps itself. Coroutine
+jobs run as their own task, so a slow job does not delay the others.
+"""
+
+import asyncio
+import heapq
+import itertools
+import time
+from logger import log_debug, log_error
+from stats import LatencyStats
+
+class Job:
+    """One scheduled callback."""
+    
+    def __init__(self, name, callback, due, interval=None):
+        """
+        Initialize the job.
+        
+        Args:
+            name: Unique job name
+            callback: Function or coroutine function taking no arguments
+            due: Monotonic time of the next run (None once a one-shot job ran)
+            interval: Seconds between runs, or None for a one-shot job
+        """
+        self.name = name
+        self.callback = callback
+        self.due = due
+        self.interval = interval
+        self.runs = 0
+        self.skipped = 0  # Slots skipped because the loop was late or the last run was busy
+        self.task = None  # Task of the current run for coroutine jobs
+        self.seq = None  # Heap entry that is current; older entries are stale
+
+
+class Scheduler:
+    """Deadline-ordered queue of jobs served by one background task."""
+    
+    def __init__(self):
+        """Initialize an empty scheduler."""
+        self.jobs = {}  # name -> Job
+        self.lateness = LatencyStats()  # How late jobs started
+        self._heap = []  # (due, seq, job); stale entries are dropped when they surface
+        self._counter = itertools.count()
+        self._wake = asyncio.Event()  # Set when a job becomes the earliest
+        self._task = None
+        self._runs = set()  # Coroutine job runs in progress
+    
+    def start(self):
+        """Start the scheduler task on the running loop."""
+        if self._task is None or self._task.done():
+            self._task = asyncio.get_running_loop().create_task(self._run())
+    
+    def call_at(self, when, name, callback, interval=None):
+        """
+        Schedule a job at a monotonic time, replacing a job with the same name.
+        
+        Args:
+            when: time.monotonic() value of the (first) run
+            name: Job name
+            callback: Function or coroutine function taking no arguments
+            interval: Seconds between runs, or None to run once
+        
+        Returns:
+            The Job
+        """
+        job = self.jobs.get(name)
+        if job is None:
+            job = self.jobs[name] = Job(name, callback, when, interval)
+        else:
+            # Keep the Job so a run still in progress is not overlapped
+            job.callback, job.due, job.interval = callback, when, interval
+        self._push(job)
+        return job
+    
+    def call_later(self, delay, name, callback):
+        """
+        Run a job once after a delay.
+        
+        Args:
+            delay: Seconds from now
+            name: Job name
+            callback: Function or coroutine function taking no arguments
+        
+        Returns:
+            The Job
+        """
+        return self.call_at(time.monotonic() + max(0.0, delay), name, callback)
+    
+    def every(self, interval, name, callback, first_delay=None):
+        """
+        Run a job every interval seconds.
+        
+        Args:
+            interval: Seconds between runs
+            name: Job name
+            callback: Function or coroutine function taking no arguments
+            first_delay: Seconds until the first run (default: interval)
+        
+        Returns:
+            The Job
+        """
+        delay = interval if first_delay is None else first_delay
+        return self.call_at(time.monotonic() + delay, name, callback, interval)
+    
+    def cancel(self, name):
+        """
+        Remove a job. A run already in progress is not interrupted.
+        
+        Args:
+            name: Job name
+        """
+        self.jobs.pop(name, None)
+    
+    def _push(self, job):
+        """Queue the job's next run and wake the task if it is now the earliest."""
+        job.seq = next(self._counter)
+        heapq.heappush(self._heap, (job.due, job.seq, job))
+        if self._heap[0][2] is job:
+            self._wake.set()
+    
+    def _pop_stale(self):
+        """Drop heap entries of cancelled or rescheduled jobs."""
+        while self._heap:
+            _, seq, job = self._heap[0]
+            if self.jobs.get(job.name) is job and job.seq == seq:
+                return
+            heapq.heappop(self._heap)
+    
+    async def _run(self):
+        """Sleep until the earliest job is due, run it, repeat."""
+        while True:
+            self._wake.clear()
+            self._pop_stale()
+            timeout = self._heap[0][0] - time.monotonic() if self._heap else None
+            if timeout is None or timeout > 0:
+                try:
+                    await asyncio.wait_for(self._wake.wait(), timeout)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+            due, _, job = heapq.heappop(self._heap)
+            self._fire(job, due)
+    
+    def _fire(self, job, due):
+        """Reschedule a periodic job and start one run; a one-shot job is forgotten once its run ends."""
+        now = time.monotonic()
+        self.lateness.add(now - due)
+        busy = job.task is not None and not job.task.done()
+        if job.interval is None:
+            if busy:
+                # Re-armed while its last run is still going: run it when that run ends
+                log_debug(f"Deferred scheduled job {job.name}: previous run still busy")
+                return
+            job.due = None
+        else:
+            # Next slot on the fixed-rate grid; slots already missed are skipped
+            missed = int((now - due) // job.interval)
+            job.skipped += missed
+            job.due = due + (missed + 1) * job.interval
+            self._push(job)
+        
+        if busy:
+            job.skipped += 1
+            log_debug(f"Skipped scheduled job {job.name}: previous run still busy")
+            return
+        job.runs += 1
+        try:
+            result = job.callback()
+            if asyncio.iscoroutine(result):
+                job.task = asyncio.get_running_loop().create_task(self._guard(job, result))
+                self._runs.add(job.task)
+                job.task.add_done_callback(lambda task: self._finished(job, task))
+                return
+        except Exception as e:
+            log_error(f"Scheduled job {job.name} failed: {e}")
+        self._finished(job, None)
+    
+    def _finished(self, job, task):
+        """
+        Settle a one-shot job after its run. It stays in jobs while the run is
+        busy so call_at with its name reuses it instead of starting a second run.
+        
+        Args:
+            job: The Job that ran
+            task: Task of the run, or None for a plain function
+        """
+        self._runs.discard(task)
+        if job.interval is not None or self.jobs.get(job.name) is not job:
+            return
+        if job.due is None:
+            del self.jobs[job.name]
+        elif task is not None:
+            # Re-armed during the run; its due time may already have passed
+            self._push(job)
+    
+    async def _guard(self, job, coro):
+        """Await a coroutine job, logging instead of raising its errors."""
+        try:
+            await coro
+        except Exception as e:
+            log_error(f"Scheduled job {job.name} failed: {e}")
+    
+    def get_stats(self):
+        """
+        Get per-job counters.
+        
+        Returns:
+            Dictionary mapping job name to runs, skipped and seconds until the next run
+        """
+        now = time.monotonic()
+        return {
+            name: {
+                "runs": job.runs,
+                "skipped": job.skipped,
+                "next_in": None if job.due is None else max(0.0, job.due - now)
+            }
+            for name, job in self.jobs.items()
+        }
+    
+    async def stop(self):
+        """Stop the scheduler task and cancel job runs still in progress."""
+        if self._task is not None:
+            self._task.cancel()
+        current = asyncio.current_task()
+        tasks = [task for task in self._runs if not task.done() and task is not current]
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*(t for t in [self._task] + tasks if t is not None), return_exceptions=True)
+        self._task = None
@@ -0,0 +1,228 @@
+"""
+Shutdown coordinator for Discord Member Tracking Bot.
+One shutdown sequence shared by !stopbot, the auto-disable timer and
+SIGTERM/SIGINT (Render sends SIGTERM on every redeploy), bounded by a
+hard deadline.
+
+The steps run in priority order:
+    essential - drain the join pipeline, flush write-behind, save every
+                server in parallel on worker threads and close the files
+    optional  - upload the data files and send the final report, at the
+                same time
+    cleanup   - drain the Telegram outbox, stop background services and
+                disconnect from Discord
+
+When time runs short the optional steps are dropped first: a step is
+skipped if less than its minimum time is left, and steps still running
+when their budget is used up are cancelled, so the cleanup always runs
+before the deadline.
+"""
+
+import asyncio
+import signal
+import time
+from concurrent.futures import ThreadPoolExecutor
+from logger import log, log_error, log_success, log_warning
+
+SAVE_WORKERS = 8  # Servers saved at the same time
+CLEANUP_RESERVE = 3.0  # Seconds kept for the cleanup after the optional steps
+UPLOAD_MIN_SECONDS = 5.0  # Data file uploads are skipped with less time left
+REPORT_MIN_SECONDS = 2.0  # The final report is skipped with less time left
+
+class ShutdownCoordinator:
+    """Runs the shutdown sequence once, whatever triggered it."""
+    
+    def __init__(self, bot, data_manager, deadline=25.0):
+        """
+        Initialize the coordinator.
+        
+        Args:
+            bot: Discord bot instance
+            data_manager: MultiServerDataManager instance
+            deadline: Seconds the whole shutdown may take
+        """
+        self.bot = bot
+        self.data_manager = data_manager
+        self.deadline = deadline
+        self.reporter = None  # Reporter, set by bot.py when configured
+        self.join_pipeline = None  # JoinPipeline, set by bot.py when enabled
+        self.telegram_sender = None  # TelegramSender for the uploads, set by bot.py when configured
+        self.scheduler = None  # Scheduler, stopped first so no timed job runs during the save
+        self.services = []  # Objects with an async stop() (health server, loop monitor), stopped last
+        self._task = None
+        self._started = 0.0
+    
+    def install_signal_handlers(self, loop=None):
+        """
+        Start the shutdown on SIGTERM and SIGINT.
+        
+        Args:
+            loop: Event loop (default: the running loop)
+        """
+        loop = loop or asyncio.get_running_loop()
+        for sig in (signal.SIGTERM, signal.SIGINT):
+            try:
+                loop.add_signal_handler(sig, self.request, f"Received {sig.name}")
+            except (NotImplementedError, RuntimeError):
+                # Windows event loops have no add_signal_handler
+                signal.signal(sig, lambda signum, frame, name=sig.name:
+                              loop.call_soon_threadsafe(self.request, f"Received {name}"))
+    
+    def request(self, reason):
+        """
+        Start the shutdown in the background (safe to call repeatedly).
+        
+        Args:
+            reason: Reason for shutdown
+        
+        Returns:
+            The shutdown task
+        """
+        if self._task is None:
+            self._task = asyncio.get_running_loop().create_task(self._run(reason))
+        else:
+            log_warning(f"{reason}: shutdown already in progress")
+        return self._task
+    
+    async def shutdown(self, reason="Manual shutdown"):
+        """
+        Run the shutdown and wait for it to finish.
+        
+        The sequence is shielded, so it completes even if the caller (e.g.
+        the !stopbot command) is cancelled when the bot disconnects.
+        
+        Args:
+            reason: Reason for shutdown
+        """
+        await asyncio.shield(self.request(reason))
+    
+    def remaining(self):
+        """Get the seconds left before the deadline."""
+        return max(0.0, self._started + self.deadline - time.monotonic())
+    
+    async def _run(self, reason):
+        """Execute the shutdown sequence."""
+        self._started = time.monotonic()
+        log("="*60)
+        log(f"SHUTDOWN INITIATED: {reason} (deadline {self.deadline:.0f}s)")
+        log("="*60)
+        
+        try:
+            await self._save_all()
+            self._log_final_stats()
+            await self._run_optional(reason)
+        except Exception as e:
+            log_error(f"Shutdown step failed: {e}")
+        finally:
+            await self._cleanup()
+        log_success(f"Shutdown finished in {time.monotonic() - self._started:.1f}s")
+        log("="*60)
+    
+    def _log_final_stats(self):
+        """Log the join total from counters already in memory; nothing is loaded for it."""
+        total_joins = self.data_manager.get_total_joins_all_servers(indexed_only=True)
+        unindexed = self.data_manager.count_unindexed()
+        scope = f"({unindexed} untouched server(s) not counted)" if unindexed else "across all servers"
+        log(f"Final stats: {total_joins} members tracked {scope}")
+    
+    async def _save_all(self):
+        """Essential: get every recorded join onto disk."""
+        # No periodic reports, snapshots or status logs from here on
+        if self.scheduler:
+            await self.scheduler.stop()
+        
+        # Process joins still queued in the pipeline before anything is saved
+        if self.join_pipeline:
+            await self.join_pipeline.stop(timeout=self.remaining() / 2)
+        
+        # Drop the periodic report state; the final report is sent later
+        if self.reporter:
+            await self.reporter.stop()
+        
+        try:
+            await asyncio.wait_for(self._save_servers(), self.remaining())
+        except asyncio.TimeoutError:
+            log_error(f"Saving did not finish within the {self.deadline:.0f}s shutdown deadline")
+    
+    async def _save_servers(self):
+        """Flush write-behind, then save all servers in parallel off the event loop."""
+        await self.data_manager.stop_write_behind()
+        servers = self.data_manager.get_all_servers()
+        loop = asyncio.get_running_loop()
+        executor = ThreadPoolExecutor(max_workers=max(1, min(SAVE_WORKERS, len(servers))),
+                                      thread_name_prefix="shutdown-save")
+        try:
+            results = await asyncio.gather(
+                *(loop.run_in_executor(executor, server_dm.save_data) for server_dm in servers),
+                return_exceptions=True
+            )
+            for server_dm, saved in zip(servers, results):
+                if saved is True:
+                    log_success(f"[{server_dm.server_name}] Data saved to: {server_dm.filename}")
+                elif isinstance(saved, Exception):
+                    log_warning(f"[{server_dm.server_name}] Failed to save data to file: {saved}")
+                else:
+                    log_warning(f"[{server_dm.server_name}] Failed to save data to file")
+            await loop.run_in_executor(executor, self.data_manager.close_all)
+        finally:
+            executor.shutdown(wait=False)
+    
+    async def _run_optional(self, reason):
+        """
+        Optional: upload the data files and send the final report concurrently.
+        
+        A step is skipped when less than its minimum time is left, and cut
+        off when the budget (time left minus the cleanup reserve) runs out.
+        """
+        steps = []
+        if self.telegram_sender:
+            steps.append(("data file upload", UPLOAD_MIN_SECONDS, self._upload_files))
+        if self.reporter:
+            steps.append(("final report", REPORT_MIN_SECONDS, lambda: self.reporter.send_final_report(reason)))
+        
+        budget = self.remaining() - CLEANUP_RESERVE
+        tasks = {}
+        for name, minimum, start in steps:
+            if budget < minimum:
+                log_warning(f"Skipping {name}: only {max(budget, 0):.1f}s left before the shutdown deadline")
+                continue
+            tasks[asyncio.ensure_future(start())] = name
+        if not tasks:
+            return
+        
+        done, pending = await asyncio.wait(tasks, timeout=budget)
+        for task in pending:
+            task.cancel()
+            log_warning(f"Cut off {tasks[task]} at the shutdown deadline")
+        await asyncio.gather(*pending, return_exceptions=True)
+        for task in done:
+            if task.exception() is not None:
+                log_warning(f"Failed to send {tasks[task]}: {task.exception()}")
+    
+    async def _upload_files(self):
+        """Send every server's data file to Telegram."""
+        log("📱 Sending data files to Telegram...")
+        if await self.telegram_sender.send_all_data_files(self.data_manager):
+            log_success("All files sent to Telegram successfully!")
+        else:
+            log_warning("Some data files could not be sent to Telegram")
+    
+    async def _cleanup(self):
+        """Drain the Telegram outbox, stop background services and disconnect."""
+        if self.telegram_sender:
+            # Close the pooled Telegram session once nothing else will be sent
+            from telegram_sender import close_telegram_senders
+            await close_telegram_senders(timeout=max(1.0, self.remaining() - 1))
+        
+        for service in self.services:
+            try:
+                await asyncio.wait_for(service.stop(), max(0.5, self.remaining()))
+            except Exception as e:
+                log_warning(f"Failed to stop {type(service).__name__}: {e}")
+        
+        log("Disconnecting from Discord...")
+        try:
+            await asyncio.wait_for(self.bot.close(), max(1.0, self.remaining()))
+            log_success("Bot disconnected successfully")
+        except asyncio.TimeoutError:
+            log_warning("Discord did not disconnect before the shutdown deadline")
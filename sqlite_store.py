@@ -0,0 +1,578 @@
+"""
+SQLite storage backend for Discord Member Tracking Bot.
+Keeps every server's joins in one WAL-mode database with indexes on
+user_id and joined_at, behind the same interface as ServerDataManager.
+
+Existing join_logs_*.json (and .json.gz) files are imported once on startup. To run the
+migration by hand:
+    python sqlite_store.py migrate [base_filename] [database_path]
+"""
+
+import glob
+import heapq
+import json
+import os
+import re
+import sqlite3
+import sys
+import threading
+import time
+from datetime import timezone
+from itertools import chain, islice
+from data_manager import ServerDataManager
+from join_records import JoinFileReader, joined_micros, open_join_file, to_micros, write_join_file
+from join_stats import JoinStats
+from logger import log, log_error, log_success
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS joins (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    server_id TEXT NOT NULL,
+    user_id TEXT NOT NULL,
+    username TEXT NOT NULL,
+    discriminator TEXT,
+    joined_at TEXT NOT NULL,
+    account_created TEXT,
+    has_avatar INTEGER NOT NULL,
+    join_count INTEGER
+);
+CREATE INDEX IF NOT EXISTS idx_joins_server_user ON joins (server_id, user_id);
+CREATE INDEX IF NOT EXISTS idx_joins_server_joined ON joins (server_id, joined_at);
+CREATE TABLE IF NOT EXISTS server_stats (
+    server_id TEXT PRIMARY KEY,
+    records INTEGER NOT NULL,
+    stats TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS migrations (
+    filename TEXT PRIMARY KEY,
+    server_id TEXT NOT NULL,
+    records INTEGER NOT NULL,
+    migrated_at TEXT NOT NULL
+);
+"""
+
+JOIN_COLUMNS = "username, user_id, discriminator, joined_at, account_created, has_avatar, join_count"
+
+MIGRATE_BATCH = 1000  # Legacy records inserted per executemany during migration
+
+INSERT_JOIN = ("INSERT INTO joins (server_id, user_id, username, discriminator, "
+               "joined_at, account_created, has_avatar, join_count) VALUES (?, ?, ?, ?, ?, ?, ?, ?)")
+
+def row_to_record(row):
+    """
+    Convert a joins table row to the per-server JSON record format.
+    
+    Args:
+        row: Tuple of JOIN_COLUMNS values
+    
+    Returns:
+        Join record dictionary
+    """
+    record = {
+        "username": row[0],
+        "user_id": row[1],
+        "discriminator": row[2],
+        "joined_at": row[3],
+        "account_created": row[4],
+        "has_avatar": bool(row[5])
+    }
+    if row[6] is not None:
+        record["join_count"] = row[6]
+        record["is_rejoin"] = row[6] > 1
+    return record
+
+def _iso_bound(value):
+    """
+    Format a time bound for comparison with the joined_at column.
+    
+    Stored timestamps are UTC isoformat() strings (naive or +00:00), which
+    sort correctly as text against a naive UTC isoformat() bound.
+    
+    Args:
+        value: datetime (naive = UTC)
+    
+    Returns:
+        ISO 8601 string
+    """
+    if value.tzinfo is not None:
+        value = value.astimezone(timezone.utc).replace(tzinfo=None)
+    return value.isoformat()
+
+
+class SqliteStore:
+    """Owns the shared SQLite connection used by every server."""
+    
+    def __init__(self, path):
+        """
+        Open (or create) the database.
+        
+        Args:
+            path: Path to the SQLite database file
+        """
+        self.path = path
+        self.lock = threading.Lock()  # The connection is shared with the flusher thread
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.executescript(SCHEMA)
+        columns = {row[1] for row in self.conn.execute("PRAGMA table_info(joins)")}
+        if "join_count" not in columns:
+            # Databases created before rejoin tracking
+            self.conn.execute("ALTER TABLE joins ADD COLUMN join_count INTEGER")
+        self.conn.commit()
+        self._synchronous_full = False
+        log(f"🗄️  SQLite storage: {path}")
+    
+    def insert_joins(self, server_id, records, fsync=False, stats=None, total=None):
+        """
+        Insert join records for a server in one transaction.
+        
+        Args:
+            server_id: Discord server ID
+            records: Join record dictionaries
+            fsync: Whether each commit must reach disk (synchronous=FULL)
+            stats: Optional JoinStats covering the server's rows after this insert
+            total: Number of rows stats covers (required with stats)
+        """
+        rows = self._join_rows(server_id, records)
+        with self.lock:
+            if fsync != self._synchronous_full:
+                self.conn.execute(f"PRAGMA synchronous={'FULL' if fsync else 'NORMAL'}")
+                self._synchronous_full = fsync
+            with self.conn:
+                self.conn.executemany(INSERT_JOIN, rows)
+                if stats is not None:
+                    self.conn.execute(
+                        "INSERT OR REPLACE INTO server_stats (server_id, records, stats) VALUES (?, ?, ?)",
+                        (server_id, total, json.dumps(stats.to_dict()))
+                    )
+    
+    def _join_rows(self, server_id, records):
+        """Convert join records to joins table parameter tuples."""
+        return [
+            (server_id, r["user_id"], r["username"], r.get("discriminator"),
+             r["joined_at"], r.get("account_created"), int(bool(r.get("has_avatar"))),
+             r.get("join_count"))
+            for r in records
+        ]
+    
+    def query(self, sql, params=()):
+        """
+        Run a read query and fetch all rows.
+        
+        Args:
+            sql: SQL statement
+            params: Statement parameters
+        
+        Returns:
+            List of row tuples
+        """
+        with self.lock:
+            return self.conn.execute(sql, params).fetchall()
+    
+    def iter_query(self, sql, params=(), batch_size=1000):
+        """
+        Stream rows of a read query in batches without loading them all.
+        
+        Uses its own connection so long exports do not hold the shared lock.
+        
+        Args:
+            sql: SQL statement
+            params: Statement parameters
+            batch_size: Rows fetched per round trip
+        
+        Yields:
+            Row tuples
+        """
+        conn = sqlite3.connect(self.path)
+        try:
+            cursor = conn.execute(sql, params)
+            while True:
+                rows = cursor.fetchmany(batch_size)
+                if not rows:
+                    break
+                yield from rows
+        finally:
+            conn.close()
+    
+    def mark_migrated(self, path, server_id):
+        """
+        Record a JSON file as already imported.
+        
+        Exports written from the database are marked this way so the next
+        startup does not import them back.
+        
+        Args:
+            path: Path of the JSON file
+            server_id: Discord server ID the file belongs to
+        """
+        with self.lock, self.conn:
+            self.conn.execute(
+                "INSERT OR IGNORE INTO migrations (filename, server_id, records, migrated_at) "
+                "VALUES (?, ?, 0, datetime('now'))",
+                (os.path.basename(path), server_id)
+            )
+    
+    def checkpoint(self):
+        """Fold the WAL back into the main database file."""
+        with self.lock:
+            self.conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+    
+    def migrate_json_files(self, base_filename):
+        """
+        Import existing per-server JSON (and journal) files once.
+        
+        Each file is recorded in the migrations table, so later startups
+        skip it and never parse it again.
+        
+        Args:
+            base_filename: Base name of the data files (e.g. join_logs)
+        
+        Returns:
+            Number of records imported
+        """
+        done = {row[0] for row in self.query("SELECT filename FROM migrations")}
+        imported = 0
+        
+        pattern = glob.escape(base_filename) + "_*.json"
+        for path in sorted(glob.glob(pattern) + glob.glob(pattern + ".gz")):
+            match = re.search(r"_(\d+)\.json(\.gz)?$", path)
+            if not match or os.path.basename(path) in done:
+                continue
+            server_id = match.group(1)
+            journal_path = path[:match.end(1)] + ".jsonl"
+            
+            try:
+                with open_join_file(path) as f:
+                    # Only the header is parsed, not the records
+                    server_name = JoinFileReader(f).header.get("server_name", server_id)
+                # Reuse the file backend's recovery so journal tails are included
+                source = ServerDataManager(
+                    path, server_name, server_id,
+                    storage_mode="journal" if os.path.exists(journal_path) else "json"
+                )
+                # Loaded into compact columns (with the usual .bak and journal recovery),
+                # then read back one segment and one chunk of rows at a time
+                records = source.iter_history()
+                count = 0
+                # Rows and the migration marker commit together, so a crash cannot duplicate them
+                with self.lock, self.conn:
+                    for chunk in iter(lambda: list(islice(records, MIGRATE_BATCH)), []):
+                        self.conn.executemany(INSERT_JOIN, self._join_rows(server_id, chunk))
+                        count += len(chunk)
+                    self.conn.execute(
+                        "INSERT INTO migrations (filename, server_id, records, migrated_at) "
+                        "VALUES (?, ?, ?, datetime('now'))",
+                        (os.path.basename(path), server_id, count)
+                    )
+                source.close()
+            except Exception as e:
+                log_error(f"Failed to migrate {path} into SQLite: {e}")
+                continue
+            
+            imported += count
+            log_success(f"Migrated {count} joins from {path} into {self.path}")
+        
+        return imported
+    
+    def close(self):
+        """Checkpoint and close the database connection."""
+        with self.lock:
+            try:
+                self.conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+            except sqlite3.Error:
+                pass
+            self.conn.close()
+
+
+class SqliteServerDataManager(ServerDataManager):
+    """
+    ServerDataManager backed by the shared SQLite database.
+    
+    Joins are not kept in memory: recent joins and reports are served by
+    indexed queries. Like the other modes it keeps one join count per
+    user_id in memory, read with a single GROUP BY when the server is
+    loaded, so recording a join never waits on the database. The
+    per-server JSON file is only written as an export by save_data.
+    """
+    
+    def __init__(self, store, filename, server_name, server_id):
+        """
+        Initialize the SQLite-backed server data manager.
+        
+        Args:
+            store: Shared SqliteStore
+            filename: Path of the JSON export for this server
+            server_name: Name of the Discord server
+            server_id: Discord server ID
+        """
+        self.store = store
+        self._total = 0
+        self._unique = 0
+        super().__init__(filename, server_name, server_id, storage_mode="sqlite")
+    
+    def load_data(self):
+        """Load this server's per-user join counts (served by idx_joins_server_user) and its stats."""
+        counts = {}
+        rows = self.store.iter_query(
+            "SELECT user_id, COUNT(*) FROM joins WHERE server_id = ? GROUP BY user_id",
+            (self.server_id,)
+        )
+        for user_id, count in rows:
+            counts[user_id] = count
+        self.user_counts = counts
+        self._total = sum(counts.values())
+        self._unique = len(counts)
+        self.stats = self._load_stats()
+        self.loaded = True
+        log(f"   [{self.server_name}] {self._total} members already tracked in {self.store.path}")
+    
+    def _load_stats(self):
+        """
+        Load the saved stats, rebuilding them from the rows if they are stale.
+        
+        Returns:
+            JoinStats covering every stored row of this server
+        """
+        saved = self.store.query(
+            "SELECT records, stats FROM server_stats WHERE server_id = ?", (self.server_id,))
+        if saved and saved[0][0] == self._total:
+            return JoinStats.from_dict(json.loads(saved[0][1]))
+        
+        # Rows imported by migration (or stats from an older version): one scan
+        stats = JoinStats()
+        rows = self.store.iter_query(
+            "SELECT joined_at, account_created, has_avatar FROM joins WHERE server_id = ? ORDER BY id",
+            (self.server_id,)
+        )
+        for joined_at, account_created, has_avatar in rows:
+            stats.add({"joined_at": joined_at, "account_created": account_created,
+                       "has_avatar": bool(has_avatar)})
+        return stats
+    
+    def _record_join(self, member_data):
+        """
+        Queue a join for the next flush without keeping history in memory.
+        
+        The in-memory user_id counts answer the rejoin lookup.
+        
+        Args:
+            member_data: Join record dictionary
+        """
+        self.ensure_loaded()
+        with self._pending_lock:
+            user_id = member_data["user_id"]
+            count = self.user_counts.get(user_id, 0) + 1
+            self.user_counts[user_id] = count
+            member_data["join_count"] = count
+            member_data["is_rejoin"] = count > 1
+            self._pending.append((member_data, time.monotonic()))
+            self.stats.add(member_data)
+            self._total += 1
+            if count == 1:
+                self._unique += 1
+    
+    def get_rejoin_summary(self):
+        """
+        Split this server's joins into first-time joins and rejoins.
+        
+        Returns:
+            Dictionary with first_time and rejoins counts
+        """
+        self.ensure_loaded()
+        return {"first_time": self._unique, "rejoins": self._total - self._unique}
+    
+    def flush_pending(self, fsync=False):
+        """
+        Insert joins recorded since the last flush in one transaction.
+        
+        Args:
+            fsync: Whether the commit must reach disk
+        
+        Returns:
+            List of seconds each flushed join waited, or None if the insert failed
+        """
+        with self._io_lock:
+            with self._pending_lock:
+                batch, self._pending = self._pending, []
+                # Every pending join is in the batch, so these match the rows after the insert
+                stats, total = self.stats.copy(), self._total
+            if not batch:
+                return []
+            try:
+                self.store.insert_joins(self.server_id, [record for record, _ in batch], fsync,
+                                        stats=stats, total=total)
+            except sqlite3.Error as e:
+                log_error(f"Failed to insert joins into {self.store.path}: {e}")
+                with self._pending_lock:
+                    self._pending = batch + self._pending
+                return None
+        
+        now = time.monotonic()
+        return [now - enqueued_at for _, enqueued_at in batch]
+    
+    def compact(self, fsync=True):
+        """Flush pending joins and checkpoint the WAL."""
+        if self.flush_pending(fsync) is None:
+            return False
+        self.store.checkpoint()
+        return True
+    
+    def export_json(self, path=None):
+        """
+        Stream this server's joins into the classic per-server JSON format.
+        
+        Rows are written as they are read, so memory use does not grow with
+        history size.
+        
+        Args:
+            path: Output path (defaults to this server's JSON filename)
+        
+        Returns:
+            True if the export was written
+        """
+        path = path or self.filename
+        tmp_path = path + ".tmp"
+        compress = path.endswith(".gz")
+        rows = self.store.iter_query(
+            f"SELECT {JOIN_COLUMNS} FROM joins WHERE server_id = ? ORDER BY id",
+            (self.server_id,)
+        )
+        try:
+            with open_join_file(tmp_path, 'w', compress) as f:
+                header = {"server_name": self.server_name, "server_id": self.server_id}
+                write_join_file(f, header, (row_to_record(row) for row in rows),
+                                indent=None if compress else 2)
+            os.replace(tmp_path, path)
+            self.store.mark_migrated(path, self.server_id)
+            return True
+        except Exception as e:
+            log_error(f"Failed to export data to {path}: {e}")
+            return False
+    
+    def save_data(self):
+        """Flush pending joins and refresh the JSON export used for uploads."""
+        if not self.compact():
+            return False
+        return self.export_json()
+    
+    def close(self):
+        """Nothing to close per server; the shared store is closed separately."""
+    
+    def get_total_joins(self):
+        """Get the total number of tracked joins for this server."""
+        self.ensure_loaded()
+        return self._total
+    
+    def _time_filter(self, start, end):
+        """
+        Build the WHERE clause for a joined_at range (served by idx_joins_server_joined).
+        
+        Returns:
+            Tuple of (SQL condition, parameter list)
+        """
+        sql, params = "server_id = ?", [self.server_id]
+        if start is not None:
+            sql += " AND joined_at >= ?"
+            params.append(_iso_bound(start))
+        if end is not None:
+            sql += " AND joined_at < ?"
+            params.append(_iso_bound(end))
+        return sql, params
+    
+    def _pending_between(self, start, end):
+        """Get pending joins with start <= joined_at < end. Caller holds _pending_lock."""
+        start, end = to_micros(start), to_micros(end)
+        return [
+            record for record, _ in self._pending
+            if (start is None or joined_micros(record) >= start)
+            and (end is None or joined_micros(record) < end)
+        ]
+    
+    def count_joins_between(self, start=None, end=None):
+        """
+        Count joins with start <= joined_at < end using the joined_at index.
+        
+        Args:
+            start: datetime (naive = UTC), or None for no lower bound
+            end: datetime (naive = UTC), or None for no upper bound
+        
+        Returns:
+            Number of joins, including ones not flushed yet
+        """
+        where, params = self._time_filter(start, end)
+        # Holding the I/O lock keeps a concurrent flush from moving rows mid-count
+        with self._io_lock:
+            stored = self.store.query(f"SELECT COUNT(*) FROM joins WHERE {where}", params)[0][0]
+            with self._pending_lock:
+                pending = len(self._pending_between(start, end))
+        return stored + pending
+    
+    def iter_history(self):
+        """
+        Stream this server's joins in insertion order (served by the rowid).
+        
+        Rows are read in batches, followed by joins that are not flushed yet.
+        
+        Returns:
+            Iterator of join record dicts
+        """
+        with self._io_lock:
+            # Rows flushed after this point are still in the pending copy, so none repeat
+            last_id = self.store.query("SELECT COALESCE(MAX(id), 0) FROM joins")[0][0]
+            with self._pending_lock:
+                pending = [record for record, _ in self._pending]
+        rows = self.store.iter_query(
+            f"SELECT {JOIN_COLUMNS} FROM joins WHERE server_id = ? AND id <= ? ORDER BY id",
+            (self.server_id, last_id)
+        )
+        return chain((row_to_record(row) for row in rows), pending)
+    
+    def _iter_export(self, start, end):
+        """Exports stream straight from the database."""
+        return self.iter_joins_between(start, end)
+    
+    def iter_joins_between(self, start=None, end=None, newest_first=False, offset=0):
+        """
+        Stream joins with start <= joined_at < end in joined_at order.
+        
+        Rows are read in batches through the joined_at index and merged
+        with joins that are not flushed yet.
+        
+        Args:
+            start: datetime (naive = UTC), or None for no lower bound
+            end: datetime (naive = UTC), or None for no upper bound
+            newest_first: Yield the latest joins first
+            offset: Joins to skip
+        
+        Returns:
+            Iterator of join record dicts
+        """
+        where, params = self._time_filter(start, end)
+        with self._io_lock:
+            # Rows flushed after this point are still in the pending copy, so none repeat
+            last_id = self.store.query("SELECT COALESCE(MAX(id), 0) FROM joins")[0][0]
+            with self._pending_lock:
+                pending = self._pending_between(start, end)
+        pending.sort(key=joined_micros, reverse=newest_first)
+        
+        direction = "DESC" if newest_first else "ASC"
+        rows = self.store.iter_query(
+            f"SELECT {JOIN_COLUMNS} FROM joins WHERE {where} AND id <= ? "
+            f"ORDER BY joined_at {direction}, id {direction}",
+            params + [last_id]
+        )
+        merged = heapq.merge((row_to_record(row) for row in rows), pending,
+                             key=joined_micros, reverse=newest_first)
+        return islice(merged, offset, None)
+
+
+if __name__ == "__main__":
+    if len(sys.argv) < 2 or sys.argv[1] != "migrate":
+        print("Usage: python sqlite_store.py migrate [base_filename] [database_path]")
+        sys.exit(1)
+    base = sys.argv[2] if len(sys.argv) > 2 else "join_logs"
+    store = SqliteStore(sys.argv[3] if len(sys.argv) > 3 else f"{base}.db")
+    count = store.migrate_json_files(base)
+    log_success(f"Migration complete: {count} joins imported")
+    store.close()
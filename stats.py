@@ -0,0 +1,118 @@
+"""
+Lightweight latency statistics for Discord Member Tracking Bot.
+Keeps a rolling window of samples so percentiles stay cheap to compute,
+plus cumulative histogram buckets for the /metrics endpoint.
+"""
+
+from bisect import bisect_left
+from collections import deque
+
+# Histogram bucket upper bounds in seconds
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+
+class Histogram:
+    """Fixed-bucket histogram of every observation since the process started."""
+    
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        """
+        Initialize the histogram.
+        
+        Args:
+            buckets: Sorted bucket upper bounds
+        """
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)  # Last slot is +Inf
+        self.count = 0
+        self.sum = 0.0
+    
+    def observe(self, value):
+        """
+        Record one observation.
+        
+        Args:
+            value: Observed value
+        """
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.sum += value
+    
+    def cumulative(self):
+        """
+        Get cumulative bucket counts.
+        
+        Returns:
+            List of (upper bound, observations <= bound) ending with ("+Inf", count)
+        """
+        result, running = [], 0
+        for bound, count in zip(self.buckets + ("+Inf",), self.counts):
+            running += count
+            result.append((bound, running))
+        return result
+
+class LatencyStats:
+    """Rolling latency samples with count, average, percentiles and max."""
+    
+    def __init__(self, window=1000):
+        """
+        Initialize the latency stats.
+        
+        Args:
+            window: Number of most recent samples kept for percentiles
+        """
+        self.samples = deque(maxlen=window)
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+        self.histogram = Histogram()
+    
+    def add(self, seconds):
+        """
+        Record a latency sample.
+        
+        Args:
+            seconds: Measured latency in seconds
+        """
+        self.samples.append(seconds)
+        self.histogram.observe(seconds)
+        self.count += 1
+        self.total += seconds
+        if seconds > self.max:
+            self.max = seconds
+    
+    def percentile(self, pct):
+        """
+        Get a percentile over the recent sample window.
+        
+        Args:
+            pct: Percentile between 0 and 100
+        
+        Returns:
+            Latency in seconds (0.0 if there are no samples)
+        """
+        if not self.samples:
+            return 0.0
+        ordered = sorted(self.samples)
+        index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+        return ordered[index]
+    
+    def summary(self):
+        """
+        Get a summary of the recorded latencies in milliseconds.
+        
+        Returns:
+            Dictionary with count, avg_ms, p50_ms, p99_ms and max_ms
+        """
+        avg = self.total / self.count if self.count else 0.0
+        return {
+            "count": self.count,
+            "avg_ms": round(avg * 1000, 2),
+            "p50_ms": round(self.percentile(50) * 1000, 2),
+            "p99_ms": round(self.percentile(99) * 1000, 2),
+            "max_ms": round(self.max * 1000, 2)
+        }
+    
+    def format(self):
+        """Get a one-line human readable summary."""
+        s = self.summary()
+        return (f"n={s['count']} avg={s['avg_ms']}ms p50={s['p50_ms']}ms "
+                f"p99={s['p99_ms']}ms max={s['max_ms']}ms")
@@ -1,12 +1,175 @@
 """
 Telegram integration for Discord Member Tracking Bot.
-Sends JSON data files to a Telegram chat before shutdown.
+Sends JSON data files to a Telegram chat before shutdown, optionally
+gzip-compressed on a worker thread first.
+
+One TelegramSender per bot token and chat is shared across the process
+(see get_telegram_sender). It keeps a single pooled keep-alive session, so
+notifications reuse the TCP+TLS connection to api.telegram.org.
+
+Join notifications go through a TelegramOutbox (see get_telegram_outbox):
+a rate-limited queue that sends right away when traffic is quiet and merges
+bursts of joins into one digest message per server.
 """
 
 import asyncio
 import aiohttp
+import gzip
 import os
-from logger import log, log_error, log_success
+import shutil
+import tempfile
+import time
+from logger import log, log_error, log_success, log_warning
+from stats import LatencyStats
+
+_shared_senders = {}  # (bot_token, chat_id) -> TelegramSender
+_shared_outboxes = {}  # (bot_token, chat_id) -> TelegramOutbox
+
+MAX_UPLOAD_BYTES = 49 * 1024 * 1024  # Bot API sendDocument limit is 50 MB
+UPLOAD_CONCURRENCY = 4
+UPLOAD_ATTEMPTS = 5  # Tries per file when Telegram answers 429
+
+def get_telegram_sender(bot_token, chat_id):
+    """
+    Get the process-wide sender for a bot token and chat.
+    
+    Args:
+        bot_token: Telegram bot token
+        chat_id: Telegram chat ID
+    
+    Returns:
+        Shared TelegramSender instance
+    """
+    key = (bot_token, str(chat_id))
+    if key not in _shared_senders:
+        _shared_senders[key] = TelegramSender(bot_token, chat_id)
+    return _shared_senders[key]
+
+def get_telegram_outbox(bot_token, chat_id, rate_per_sec=1.0, burst=3,
+                        digest_seconds=10, max_queue=1000):
+    """
+    Get the process-wide outbound queue for a bot token and chat.
+    
+    The settings only apply when the outbox is first created.
+    
+    Args:
+        bot_token: Telegram bot token
+        chat_id: Telegram chat ID
+        rate_per_sec: Sustained messages per second
+        burst: Messages that may be sent back to back after a quiet period
+        digest_seconds: Minimum seconds between join messages for one server
+        max_queue: Maximum queued messages before new ones are dropped
+    
+    Returns:
+        Shared TelegramOutbox instance (started)
+    """
+    key = (bot_token, str(chat_id))
+    if key not in _shared_outboxes:
+        sender = get_telegram_sender(bot_token, chat_id)
+        outbox = TelegramOutbox(sender, rate_per_sec, burst, digest_seconds, max_queue)
+        outbox.start()
+        _shared_outboxes[key] = outbox
+    return _shared_outboxes[key]
+
+async def close_telegram_senders(timeout=15):
+    """
+    Drain every shared outbox, then close the pooled sessions of every shared sender.
+    
+    Args:
+        timeout: Seconds to wait for each outbox to drain
+    """
+    for outbox in list(_shared_outboxes.values()):
+        await outbox.stop(timeout)
+    _shared_outboxes.clear()
+    for sender in list(_shared_senders.values()):
+        await sender.close()
+    _shared_senders.clear()
+
+def split_file(path, part_size):
+    """
+    Split a file into numbered parts that concatenate back to the original.
+    
+    Args:
+        path: File to split
+        part_size: Maximum bytes per part
+    
+    Returns:
+        List of part paths, in order, inside a new temporary directory
+    """
+    directory = tempfile.mkdtemp(prefix="upload_parts_")
+    parts = []
+    with open(path, 'rb') as source:
+        while True:
+            part = os.path.join(directory, f"part{len(parts) + 1:03d}")
+            written = 0
+            with open(part, 'wb') as target:
+                while written < part_size:
+                    chunk = source.read(min(1024 * 1024, part_size - written))
+                    if not chunk:
+                        break
+                    target.write(chunk)
+                    written += len(chunk)
+            if not written:
+                os.remove(part)
+                break
+            parts.append(part)
+    return parts
+
+def compress_file(path):
+    """
+    Write a gzip-compressed copy of a file.
+    
+    Args:
+        path: File to compress
+    
+    Returns:
+        Path of <name>.gz inside a new temporary directory
+    """
+    directory = tempfile.mkdtemp(prefix="upload_gz_")
+    target = os.path.join(directory, os.path.basename(path) + ".gz")
+    with open(path, 'rb') as source, gzip.open(target, 'wb', compresslevel=6) as compressed:
+        shutil.copyfileobj(source, compressed, 1024 * 1024)
+    return target
+
+def format_join_message(member, server_name):
+    """
+    Format the notification for a single member join.
+    
+    Args:
+        member: Discord Member object
+        server_name: Name of the server
+    
+    Returns:
+        Markdown message text
+    """
+    message = f"🆕 *New Member Joined!*\n\n"
+    message += f"👤 *Username:* {member.name}#{member.discriminator}\n"
+    message += f"🆔 *User ID:* `{member.id}`\n"
+    message += f"🖥️ *Server:* {server_name}\n"
+    message += f"📅 *Joined:* {member.joined_at.strftime('%Y-%m-%d %H:%M:%S UTC') if member.joined_at else 'Unknown'}\n"
+    message += f"🎂 *Account Created:* {member.created_at.strftime('%Y-%m-%d')}\n"
+    message += f"🖼️ *Has Avatar:* {'Yes ✅' if member.avatar else 'No ❌'}"
+    return message
+
+def format_join_digest(server_name, count, members):
+    """
+    Format one message covering several joins in a server.
+    
+    Args:
+        server_name: Name of the server
+        count: Total number of joins covered
+        members: The first few Discord Member objects to list by name
+    
+    Returns:
+        Markdown message text
+    """
+    message = f"🆕 *{count} New Members Joined!*\n\n"
+    message += f"🖥️ *Server:* {server_name}\n\n"
+    for member in members:
+        message += f"👤 {member.name}#{member.discriminator} (`{member.id}`)\n"
+    if count > len(members):
+        message += f"…and {count - len(members)} more"
+    return message.rstrip("\n")
 
 class TelegramSender:
     """Handles sending files to Telegram."""
@@ -22,6 +185,38 @@ class TelegramSender:
         self.bot_token = bot_token
         self.chat_id = chat_id
         self.api_url = f"https://api.telegram.org/bot{bot_token}"
+        self._session = None  # Created on first request, inside the event loop
+        self.latency = LatencyStats()  # Per-request latency of successful calls
+        self.failures = 0
+        self.retry_after = 0  # Seconds Telegram asked us to wait after the last 429
+        self._uploads_paused_until = 0.0  # Monotonic time before which uploads wait
+        self.compress_uploads = False  # gzip plain data files before uploading, set by bot.py
+    
+    def _get_session(self):
+        """Get the pooled keep-alive session, creating it if needed."""
+        if self._session is None or self._session.closed:
+            connector = aiohttp.TCPConnector(limit=8, keepalive_timeout=60, ttl_dns_cache=300)
+            self._session = aiohttp.ClientSession(
+                connector=connector,
+                timeout=aiohttp.ClientTimeout(total=60)
+            )
+        return self._session
+    
+    async def close(self):
+        """Close the pooled session."""
+        if self._session is not None and not self._session.closed:
+            await self._session.close()
+            log(f"📱 Telegram session closed | request latency: {self.latency.format()}")
+        self._session = None
+    
+    def get_stats(self):
+        """
+        Get request statistics.
+        
+        Returns:
+            Dictionary with latency summary and failure count
+        """
+        return {"latency": self.latency.summary(), "failures": self.failures}
     
     async def send_message(self, text):
         """
@@ -37,53 +232,184 @@ class TelegramSender:
             "parse_mode": "Markdown"
         }
         
+        started = time.monotonic()
+        self.retry_after = 0
         try:
-            async with aiohttp.ClientSession() as session:
-                async with session.post(url, json=data) as response:
-                    if response.status == 200:
-                        log("📱 Sent message to Telegram")
-                        return True
-                    else:
-                        log_error(f"Failed to send Telegram message: {response.status}")
-                        return False
+            async with self._get_session().post(url, json=data) as response:
+                if response.status == 200:
+                    self.latency.add(time.monotonic() - started)
+                    log("📱 Sent message to Telegram")
+                    return True
+                elif response.status == 429:
+                    self.failures += 1
+                    self.retry_after = await self._read_retry_after(response)
+                    log_warning(f"Telegram rate limit hit, retry after {self.retry_after}s")
+                    return False
+                else:
+                    self.failures += 1
+                    log_error(f"Failed to send Telegram message: {response.status}")
+                    return False
         except Exception as e:
+            self.failures += 1
             log_error(f"Error sending Telegram message: {e}")
             return False
     
-    async def send_file(self, file_path, caption=None):
+    async def _read_retry_after(self, response):
+        """Get the retry_after seconds from a 429 response (defaults to 5)."""
+        try:
+            body = await response.json(content_type=None)
+            return float(body.get("parameters", {}).get("retry_after", 5))
+        except Exception:
+            return 5.0
+    
+    async def send_file(self, file_path, caption=None, filename=None):
         """
         Send a file to Telegram.
         
         Args:
             file_path: Path to the file to send
             caption: Optional caption for the file
+            filename: Optional name shown in Telegram (default: the file's name)
+        """
+        sent, self.retry_after = await self._post_file(file_path, caption, filename)
+        return sent
+    
+    async def _post_file(self, file_path, caption=None, filename=None):
+        """
+        Upload a file with sendDocument.
+        
+        Returns:
+            Tuple of (whether it was sent, retry_after seconds if Telegram answered 429 else 0)
         """
         if not os.path.exists(file_path):
             log_error(f"File not found: {file_path}")
-            return False
+            return False, 0
         
         url = f"{self.api_url}/sendDocument"
+        filename = filename or os.path.basename(file_path)
         
+        started = time.monotonic()
         try:
-            async with aiohttp.ClientSession() as session:
-                with open(file_path, 'rb') as file:
-                    form = aiohttp.FormData()
-                    form.add_field('chat_id', str(self.chat_id))
-                    form.add_field('document', file, filename=os.path.basename(file_path))
-                    if caption:
-                        form.add_field('caption', caption)
-                    
-                    async with session.post(url, data=form) as response:
-                        if response.status == 200:
-                            log_success(f"📱 Sent file to Telegram: {os.path.basename(file_path)}")
-                            return True
-                        else:
-                            error_text = await response.text()
-                            log_error(f"Failed to send file to Telegram: {response.status} - {error_text}")
-                            return False
+            with open(file_path, 'rb') as file:
+                form = aiohttp.FormData()
+                form.add_field('chat_id', str(self.chat_id))
+                form.add_field('document', file, filename=filename)
+                if caption:
+                    form.add_field('caption', caption)
+                
+                async with self._get_session().post(url, data=form) as response:
+                    if response.status == 200:
+                        self.latency.add(time.monotonic() - started)
+                        log_success(f"📱 Sent file to Telegram: {filename}")
+                        return True, 0
+                    elif response.status == 429:
+                        self.failures += 1
+                        retry_after = await self._read_retry_after(response)
+                        log_warning(f"Telegram rate limit hit on {filename}, retry after {retry_after}s")
+                        return False, retry_after
+                    else:
+                        self.failures += 1
+                        error_text = await response.text()
+                        log_error(f"Failed to send file to Telegram: {response.status} - {error_text}")
+                        return False, 0
         except Exception as e:
+            self.failures += 1
             log_error(f"Error sending file to Telegram: {e}")
-            return False
+            return False, 0
+    
+    async def _upload_with_retry(self, file_path, caption, filename, semaphore):
+        """
+        Upload one file under the shared concurrency limit, honouring retry_after.
+        
+        A 429 on any upload pauses every upload until Telegram's retry_after
+        has passed, then the file is sent again.
+        
+        Returns:
+            True if the file was sent
+        """
+        for _ in range(UPLOAD_ATTEMPTS):
+            async with semaphore:
+                wait = self._uploads_paused_until - time.monotonic()
+                if wait > 0:
+                    await asyncio.sleep(wait)
+                sent, retry_after = await self._post_file(file_path, caption, filename)
+            if sent:
+                return True
+            if not retry_after:
+                return False
+            self._uploads_paused_until = max(self._uploads_paused_until,
+                                             time.monotonic() + retry_after)
+        return False
+    
+    async def _send_data_file(self, server_dm, semaphore):
+        """
+        Upload one server's data file plus any newly sealed segment files.
+        
+        Returns:
+            True if every file was sent
+        """
+        # Sent during shutdown: a server never read this run is not loaded for its caption
+        if server_dm.is_indexed():
+            caption = f"📊 {server_dm.server_name}\n{server_dm.get_total_joins()} members tracked"
+        else:
+            caption = f"📊 {server_dm.server_name}\nNot loaded this run (count in the file)"
+        paths = server_dm.upload_files()
+        results = [await self._send_file(paths[0], caption, semaphore)]
+        for path in paths[1:]:
+            sent = await self._send_file(path, f"{caption}\nSealed segment {os.path.basename(path)}", semaphore)
+            if sent and path in server_dm.sealed_files:
+                # Segments are read-only once sealed, so each is sent once
+                server_dm.sealed_files.remove(path)
+            results.append(sent)
+        return all(results)
+    
+    async def _send_file(self, path, caption, semaphore):
+        """
+        Upload one file, gzip-compressed first if compress_uploads is set.
+        
+        Compression runs on a worker thread so the event loop keeps serving
+        joins, and the temporary copy is removed after the upload.
+        
+        Returns:
+            True if every part was sent
+        """
+        if not self.compress_uploads or path.endswith(".gz") or not os.path.exists(path):
+            return await self._send_parts(path, caption, semaphore)
+        
+        compressed = await asyncio.to_thread(compress_file, path)
+        try:
+            return await self._send_parts(compressed, caption, semaphore)
+        finally:
+            os.remove(compressed)
+            os.rmdir(os.path.dirname(compressed))
+    
+    async def _send_parts(self, path, caption, semaphore):
+        """
+        Upload one file, split into parts if it is too large.
+        
+        Returns:
+            True if every part was sent
+        """
+        if not os.path.exists(path) or os.path.getsize(path) <= MAX_UPLOAD_BYTES:
+            return await self._upload_with_retry(path, caption, None, semaphore)
+        
+        parts = await asyncio.to_thread(split_file, path, MAX_UPLOAD_BYTES)
+        try:
+            name = os.path.basename(path)
+            results = await asyncio.gather(*(
+                self._upload_with_retry(
+                    part,
+                    f"{caption}\nPart {i}/{len(parts)} - rejoin with: cat {name}.part* > {name}",
+                    f"{name}.part{i:03d}",
+                    semaphore
+                )
+                for i, part in enumerate(parts, 1)
+            ))
+        finally:
+            for part in parts:
+                os.remove(part)
+            os.rmdir(os.path.dirname(parts[0]))
+        return all(results)
     
     async def send_member_join_notification(self, member, server_name):
         """
@@ -93,44 +419,286 @@ class TelegramSender:
             member: Discord Member object
             server_name: Name of the server
         """
-        # Format member join message
-        message = f"🆕 *New Member Joined!*\n\n"
-        message += f"👤 *Username:* {member.name}#{member.discriminator}\n"
-        message += f"🆔 *User ID:* `{member.id}`\n"
-        message += f"🖥️ *Server:* {server_name}\n"
-        message += f"📅 *Joined:* {member.joined_at.strftime('%Y-%m-%d %H:%M:%S UTC') if member.joined_at else 'Unknown'}\n"
-        message += f"🎂 *Account Created:* {member.created_at.strftime('%Y-%m-%d')}\n"
-        message += f"🖼️ *Has Avatar:* {'Yes ✅' if member.avatar else 'No ❌'}"
-        
-        await self.send_message(message)
+        await self.send_message(format_join_message(member, server_name))
     
-    async def send_all_data_files(self, data_manager):
+    async def send_all_data_files(self, data_manager, concurrency=UPLOAD_CONCURRENCY):
         """
         Send all server data files to Telegram.
         
+        Uploads run in parallel (at most `concurrency` at a time) and files
+        over Telegram's upload limit are sent in parts.
+        
         Args:
             data_manager: MultiServerDataManager instance
+            concurrency: Maximum simultaneous uploads
+        
+        Returns:
+            True if every file was sent
         """
         # Send summary message first
-        total_joins = data_manager.get_total_joins_all_servers()
+        total_joins = data_manager.get_total_joins_all_servers(indexed_only=True)
+        unindexed = data_manager.count_unindexed()
         server_count = len(data_manager.servers)
         
         summary = f"🤖 *Discord Member Tracker - Final Report*\n\n"
         summary += f"📊 Total Members Tracked: *{total_joins}*\n"
+        if unindexed:
+            summary += f"⏳ {unindexed} server(s) not loaded this run (not counted)\n"
         summary += f"🖥️ Servers Tracked: *{server_count}*\n\n"
         summary += f"📁 Sending {server_count} data file(s)..."
         
         await self.send_message(summary)
         
-        # Send each server's data file
-        for server_dm in data_manager.get_all_servers():
-            joins = server_dm.get_total_joins()
-            caption = f"📊 {server_dm.server_name}\n{joins} members tracked"
-            
-            await self.send_file(server_dm.filename, caption)
-            await asyncio.sleep(0.5)  # Small delay between files
+        # Upload every server's data file with bounded concurrency
+        started = time.monotonic()
+        semaphore = asyncio.Semaphore(concurrency)
+        results = await asyncio.gather(*(
+            self._send_data_file(server_dm, semaphore)
+            for server_dm in data_manager.get_all_servers()
+        ))
+        elapsed = time.monotonic() - started
+        sent = sum(1 for ok in results if ok)
+        log(f"📱 Uploaded {sent}/{server_count} data file(s) in {elapsed:.1f}s")
         
         # Send completion message
-        completion = f"✅ All data files sent successfully!\n\n"
-        completion += f"Total files: {server_count}"
+        if sent == server_count:
+            completion = f"✅ All data files sent successfully!\n\n"
+        else:
+            completion = f"⚠️ {server_count - sent} data file(s) failed to send\n\n"
+        completion += f"Total files: {sent}/{server_count}\n"
+        completion += f"⏱️ Upload time: {elapsed:.1f}s"
         await self.send_message(completion)
+        return sent == server_count
+
+class TokenBucket:
+    """Token bucket rate limiter for outgoing Telegram requests."""
+    
+    def __init__(self, rate, capacity):
+        """
+        Initialize the bucket full.
+        
+        Args:
+            rate: Tokens added per second
+            capacity: Maximum tokens (the allowed burst)
+        """
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = float(capacity)
+        self.updated = time.monotonic()
+        self.blocked_until = 0.0  # Set when Telegram answers 429
+    
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+    
+    async def acquire(self):
+        """Wait until a token is available and take it."""
+        while True:
+            now = time.monotonic()
+            if now < self.blocked_until:
+                await asyncio.sleep(self.blocked_until - now)
+                continue
+            self._refill()
+            if self.tokens >= 1:
+                self.tokens -= 1
+                return
+            await asyncio.sleep((1 - self.tokens) / self.rate)
+    
+    def pause(self, seconds):
+        """
+        Stop handing out tokens for a while (after a 429).
+        
+        Args:
+            seconds: How long to wait before the next request
+        """
+        self.blocked_until = max(self.blocked_until, time.monotonic() + seconds)
+        self.tokens = 0.0
+
+
+class TelegramOutbox:
+    """
+    Rate-limited outbound message queue for one Telegram chat.
+    
+    Messages are sent by a background task at most rate_per_sec per second.
+    Join notifications are kept per server: the first join after a quiet
+    period is sent right away, and joins arriving within digest_seconds of
+    the last message for that server (or while the queue is backed up) are
+    merged into a single digest message.
+    """
+    
+    DIGEST_MEMBER_LIMIT = 10  # Members listed by name in one digest
+    MAX_ATTEMPTS = 3  # Sends per message when Telegram answers 429
+    
+    def __init__(self, sender, rate_per_sec=1.0, burst=3, digest_seconds=10, max_queue=1000):
+        """
+        Initialize the outbox.
+        
+        Args:
+            sender: TelegramSender used for the actual requests
+            rate_per_sec: Sustained messages per second
+            burst: Messages that may be sent back to back after a quiet period
+            digest_seconds: Minimum seconds between join messages for one server
+            max_queue: Maximum queued messages before new ones are dropped
+        """
+        self.sender = sender
+        self.bucket = TokenBucket(rate_per_sec, burst)
+        self.digest_seconds = digest_seconds
+        self.queue = asyncio.Queue(maxsize=max_queue)
+        self._joins = {}  # server_id -> {"server_name", "count", "members"} not yet sent
+        self._queued = set()  # server IDs with a join message queued or scheduled
+        self._timers = {}  # server_id -> TimerHandle for a scheduled digest
+        self._last_join_sent = {}  # server_id -> monotonic time of the last join message
+        self._task = None
+        self.sent = 0
+        self.merged = 0  # Joins folded into another join's message
+        self.dropped = 0  # Messages (or joins) discarded because the queue was full
+        self.rate_limited = 0
+        self.failed = 0
+    
+    def start(self):
+        """Start the background sender task."""
+        if self._task is None:
+            self._task = asyncio.get_running_loop().create_task(self._run())
+    
+    def send_message(self, text):
+        """
+        Queue a text message without waiting for it to be sent.
+        
+        Args:
+            text: Message text to send
+        """
+        self._put(("message", text))
+    
+    def notify_join(self, member, server_name):
+        """
+        Queue a join notification without waiting for it to be sent.
+        
+        Args:
+            member: Discord Member object
+            server_name: Name of the server
+        """
+        server_id = member.guild.id
+        pending = self._joins.get(server_id)
+        if pending is None:
+            pending = self._joins[server_id] = {"server_name": server_name, "count": 0, "members": []}
+        pending["count"] += 1
+        if len(pending["members"]) < self.DIGEST_MEMBER_LIMIT:
+            pending["members"].append(member)
+        
+        if server_id in self._queued:
+            return  # Will go out with the message already on its way
+        self._queued.add(server_id)
+        
+        last = self._last_join_sent.get(server_id)
+        delay = 0 if last is None else last + self.digest_seconds - time.monotonic()
+        if delay > 0:
+            self._timers[server_id] = asyncio.get_running_loop().call_later(
+                delay, self._put, ("joins", server_id))
+        else:
+            self._put(("joins", server_id))
+    
+    def _put(self, item):
+        """Add an item to the queue, dropping it if the queue is full."""
+        kind, payload = item
+        if kind == "joins":
+            self._timers.pop(payload, None)
+        try:
+            self.queue.put_nowait(item)
+        except asyncio.QueueFull:
+            if kind == "joins":
+                self._queued.discard(payload)
+                pending = self._joins.pop(payload, None)
+                self.dropped += pending["count"] if pending else 0
+            else:
+                self.dropped += 1
+            log_warning(f"📱 Telegram queue full ({self.queue.qsize()}) - dropped a notification")
+    
+    def _take_joins(self, server_id):
+        """Build the message for every join pending in a server, or None."""
+        self._queued.discard(server_id)
+        pending = self._joins.pop(server_id, None)
+        if not pending:
+            return None
+        self._last_join_sent[server_id] = time.monotonic()
+        if pending["count"] == 1:
+            return format_join_message(pending["members"][0], pending["server_name"])
+        self.merged += pending["count"] - 1
+        log(f"📱 Merged {pending['count']} joins in {pending['server_name']} into one message")
+        return format_join_digest(pending["server_name"], pending["count"], pending["members"])
+    
+    async def _run(self):
+        """Send queued messages as the rate limit allows."""
+        while True:
+            kind, payload = await self.queue.get()
+            try:
+                # Take the token first so joins arriving meanwhile join the digest
+                await self.bucket.acquire()
+                text = self._take_joins(payload) if kind == "joins" else payload
+                if text:
+                    await self._send(text)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                self.failed += 1
+                log_error(f"Error in Telegram outbox: {e}")
+            finally:
+                self.queue.task_done()
+    
+    async def _send(self, text):
+        """Send one message, waiting out 429 responses."""
+        for _ in range(self.MAX_ATTEMPTS):
+            if await self.sender.send_message(text):
+                self.sent += 1
+                return
+            if not self.sender.retry_after:
+                break
+            self.rate_limited += 1
+            self.bucket.pause(self.sender.retry_after)
+            await self.bucket.acquire()
+        self.failed += 1
+    
+    def get_stats(self):
+        """
+        Get queue statistics.
+        
+        Returns:
+            Dictionary with queue depth, pending joins and sent/merged/dropped counts
+        """
+        return {
+            "queue_depth": self.queue.qsize(),
+            "pending_joins": sum(p["count"] for p in self._joins.values()),
+            "sent": self.sent,
+            "merged": self.merged,
+            "dropped": self.dropped,
+            "rate_limited": self.rate_limited,
+            "failed": self.failed
+        }
+    
+    async def stop(self, timeout=15):
+        """
+        Send everything still pending, then stop the background task.
+        
+        Args:
+            timeout: Seconds to wait for the queue to drain
+        """
+        # Joins waiting for their digest interval go out now
+        for server_id, handle in list(self._timers.items()):
+            handle.cancel()
+            self._put(("joins", server_id))
+        
+        if self._task is not None:
+            try:
+                await asyncio.wait_for(self.queue.join(), timeout)
+            except asyncio.TimeoutError:
+                log_warning(f"📱 Telegram queue not drained in {timeout}s ({self.queue.qsize()} left)")
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        
+        stats = self.get_stats()
+        log(f"📱 Telegram outbox stopped | sent: {stats['sent']} | merged: {stats['merged']} | "
+            f"dropped: {stats['dropped']} | rate limited: {stats['rate_limited']}")
@@ -0,0 +1,244 @@
+"""
+Crash-recovery tests for ServerDataManager storage.
+Each test writes some joins, damages the files the way a crash would,
+reloads the server and checks the history that comes back.
+Run with: python -m pytest test_data_manager.py
+"""
+
+import os
+import shutil
+import tempfile
+import unittest
+from datetime import datetime, timedelta, timezone
+from types import SimpleNamespace
+import logger
+from data_manager import ServerDataManager
+
+logger.configure(level="ERROR", console=False)
+
+NOW = datetime.now(timezone.utc)
+
+def member(user_id, joined_at=NOW):
+    """Build a stand-in for a discord.Member with the fields that are recorded."""
+    return SimpleNamespace(id=user_id, name=f"user{user_id}", discriminator="0001",
+                           joined_at=joined_at, created_at=NOW, avatar=None)
+
+class StorageTest(unittest.TestCase):
+    """Base class: every test gets its own data directory."""
+    
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.filename = os.path.join(self.dir, "join_logs_Test_1.json")
+        self.servers = []
+    
+    def tearDown(self):
+        for server in self.servers:
+            server.close()
+        shutil.rmtree(self.dir, ignore_errors=True)
+    
+    def open_server(self, **options):
+        """Open (or reopen after a simulated crash) the test server."""
+        server = ServerDataManager(self.filename, "Test", 1, **options)
+        self.servers.append(server)
+        return server
+    
+    def user_ids(self, server):
+        """Get the user IDs of the whole history, oldest first."""
+        return [join["user_id"] for join in server.iter_history()]
+
+class JournalRecoveryTest(StorageTest):
+    """Journal mode: a torn final line is cut off on recovery."""
+    
+    def test_torn_line_is_truncated(self):
+        server = self.open_server(storage_mode="journal")
+        for user_id in range(5):
+            server.add_member(member(user_id))
+        self.assertIsNotNone(server.flush_pending())
+        server.close()
+        
+        # Crash in the middle of appending the next record
+        intact = os.path.getsize(server.journal_filename)
+        with open(server.journal_filename, "a", encoding="utf-8") as f:
+            f.write('{"seq": 6, "user_id": "5", "usern')
+        
+        server = self.open_server(storage_mode="journal")
+        self.assertEqual(self.user_ids(server), [str(user_id) for user_id in range(5)])
+        self.assertEqual(os.path.getsize(server.journal_filename), intact)
+        
+        # New appends start on a clean line and survive the next reload
+        server.add_member(member(6))
+        server.flush_pending()
+        server.close()
+        server = self.open_server(storage_mode="journal")
+        self.assertEqual(self.user_ids(server), [str(user_id) for user_id in (0, 1, 2, 3, 4, 6)])
+
+class FlushFailureTest(StorageTest):
+    """A flush that raises puts its batch back instead of dropping it."""
+    
+    def test_failed_flush_keeps_the_batch(self):
+        server = self.open_server()
+        for user_id in range(3):
+            server.add_member(member(user_id))
+        write_active = server._write_active
+        
+        def fail(*args):
+            raise OSError("disk full")
+        
+        server._write_active = fail
+        for user_id in (3, 4):
+            server.add_member(member(user_id))
+        self.assertIsNone(server.flush_pending())
+        self.assertEqual(len(server._pending), 2)
+        
+        server._write_active = write_active
+        self.assertIsNotNone(server.flush_pending())
+        server.close()
+        server = self.open_server()
+        self.assertEqual(self.user_ids(server), ["0", "1", "2", "3", "4"])
+
+class SnapshotRecoveryTest(StorageTest):
+    """Snapshots: the .bak copy and journal_seq make a crash mid-save harmless."""
+    
+    def test_torn_snapshot_falls_back_to_backup(self):
+        server = self.open_server()
+        for user_id in range(3):
+            server.add_member(member(user_id))
+        server.close()
+        
+        # Crash that left the data file cut off half way
+        with open(self.filename, "r+b") as f:
+            f.truncate(os.path.getsize(self.filename) // 2)
+        
+        server = self.open_server()
+        self.assertEqual(self.user_ids(server), ["0", "1"])
+        self.assertTrue(any(name.startswith(os.path.basename(self.filename) + ".corrupt-")
+                            for name in os.listdir(self.dir)))
+        
+        server.add_member(member(3))
+        server.close()
+        server = self.open_server()
+        self.assertEqual(self.user_ids(server), ["0", "1", "3"])
+    
+    def test_missing_snapshot_is_restored_from_backup(self):
+        server = self.open_server(storage_mode="journal")
+        for user_id in range(3):
+            server.add_member(member(user_id))
+        self.assertTrue(server.save_data())
+        server.add_member(member(3))
+        self.assertTrue(server.save_data())
+        server.close()
+        
+        # Crash between moving the old file away and moving the new one in
+        os.remove(self.filename)
+        os.remove(server.journal_filename)
+        
+        server = self.open_server(storage_mode="journal")
+        self.assertEqual(self.user_ids(server), ["0", "1", "2"])
+        self.assertTrue(server.save_data())
+        self.assertTrue(os.path.exists(self.filename))
+    
+    def test_journal_replay_after_compaction_skips_covered_records(self):
+        self.check_replay_after_compaction(hot_window=0)
+    
+    def test_hot_window_replay_after_compaction_skips_covered_records(self):
+        self.check_replay_after_compaction(hot_window=10)
+    
+    def check_replay_after_compaction(self, hot_window):
+        server = self.open_server(storage_mode="journal", hot_window=hot_window)
+        for user_id in range(3):
+            server.add_member(member(user_id))
+        with open(server.journal_filename, "rb") as f:
+            journal = f.read()
+        self.assertTrue(server.compact())
+        server.close()
+        
+        # Crash after the snapshot was written but before the journal was truncated
+        with open(server.journal_filename, "wb") as f:
+            f.write(journal)
+        
+        server = self.open_server(storage_mode="journal", hot_window=hot_window)
+        self.assertEqual(server.get_total_joins(), 3)
+        self.assertEqual(self.user_ids(server), ["0", "1", "2"])
+        
+        # Sequence numbers continue after the snapshot's journal_seq
+        server.add_member(member(3))
+        server.close()
+        server = self.open_server(storage_mode="journal", hot_window=hot_window)
+        self.assertEqual(server.get_total_joins(), 4)
+        self.assertEqual(self.user_ids(server), ["0", "1", "2", "3"])
+
+class SegmentTest(StorageTest):
+    """Sealed segments: written once, late joins stay active, crashes do not double count."""
+    
+    def test_late_joins_stay_in_the_active_file(self):
+        old = NOW - timedelta(days=3)
+        server = self.open_server(segment_period="day")
+        server.add_members([member(user_id, old + timedelta(minutes=user_id)) for user_id in range(5)])
+        server.add_member(member(10))  # The next save seals the old day
+        self.assertEqual(len(server.segments), 1)
+        segment = os.path.join(self.dir, server.segments[0]["file"])
+        sealed = os.stat(segment).st_mtime_ns
+        
+        server.add_member(member(20, old))  # Arrives late for the sealed day
+        server.add_member(member(11))
+        self.assertEqual(os.stat(segment).st_mtime_ns, sealed)
+        self.assertEqual(server.segments[0]["records"], 5)
+        server.close()
+        
+        server = self.open_server(segment_period="day")
+        self.assertEqual(server.get_total_joins(), 8)
+        self.assertEqual(server.count_joins_between(old - timedelta(days=1), old + timedelta(days=1)), 6)
+        self.assertEqual(sorted(self.user_ids(server)), sorted(["0", "1", "2", "3", "4", "10", "20", "11"]))
+    
+    def test_crash_before_manifest_keeps_joins_active(self):
+        old = NOW - timedelta(days=3)
+        server = self.open_server(segment_period="day")
+        server.add_members([member(user_id, old) for user_id in range(5)])
+        with open(self.filename, "rb") as f:
+            before = f.read()
+        server.add_member(member(10))
+        server.close()
+        
+        # Crash after the segment was written but before the active file listed it
+        os.remove(self.filename)
+        with open(self.filename, "wb") as f:
+            f.write(before)
+        
+        server = self.open_server(segment_period="day")
+        self.assertEqual(server.get_total_joins(), 5)
+        server.add_member(member(11))  # Seals the day again over the orphaned segment
+        server.close()
+        server = self.open_server(segment_period="day")
+        self.assertEqual(server.get_total_joins(), 6)
+        self.assertEqual(self.user_ids(server), ["0", "1", "2", "3", "4", "11"])
+
+class HotWindowIndexTest(StorageTest):
+    """Hot window: rejoin counts live in the user index file and survive restarts."""
+    
+    def test_counts_survive_restart_and_rebuild(self):
+        for storage_mode in ("json", "journal"):
+            with self.subTest(storage_mode=storage_mode):
+                self.filename = os.path.join(self.dir, f"join_logs_{storage_mode}_1.json")
+                server = self.open_server(storage_mode=storage_mode, hot_window=2)
+                for user_id in (1, 2, 1, 3):
+                    server.add_member(member(user_id))
+                self.assertTrue(server.save_data())
+                for user_id in (1, 4):
+                    server.add_member(member(user_id))  # Only in the journal (or the data file)
+                server.close()
+                
+                server = self.open_server(storage_mode=storage_mode, hot_window=2)
+                self.assertEqual(server.get_join_count(1), 3)
+                self.assertEqual(server.get_rejoin_summary(), {"first_time": 4, "rejoins": 2})
+                server.close()
+                
+                # Lost (or out of step with the sidecar): rebuilt from the history
+                os.remove(server.user_counts.path)
+                server = self.open_server(storage_mode=storage_mode, hot_window=2)
+                self.assertEqual(server.get_join_count(1), 3)
+                self.assertEqual(server.get_join_count(4), 1)
+                self.assertEqual(server.get_rejoin_summary(), {"first_time": 4, "rejoins": 2})
+                self.assertFalse(server.loaded)
+
+if __name__ == "__main__":
+    unittest.main()
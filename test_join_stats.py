@@ -0,0 +1,58 @@
+"""
+Tests for the rolling join statistics.
+Run with: python -m pytest test_join_stats.py
+"""
+
+import unittest
+from datetime import datetime, timedelta, timezone
+from join_stats import HOURLY_KEEP, JoinStats
+
+START = datetime(2026, 1, 1, tzinfo=timezone.utc)
+
+def record(hours):
+    """Build a join record the given number of hours after START."""
+    joined = START + timedelta(hours=hours)
+    return {"joined_at": joined.isoformat(), "account_created": START.isoformat(), "has_avatar": True}
+
+class EvictionTest(unittest.TestCase):
+    """Hour buckets beyond HOURLY_KEEP are evicted oldest first."""
+    
+    def test_oldest_hours_are_evicted(self):
+        stats = JoinStats()
+        # Added out of order, so eviction cannot rely on insertion order
+        for hours in reversed(range(HOURLY_KEEP + 5)):
+            stats.add(record(hours))
+        self.assertEqual(len(stats.hourly), HOURLY_KEEP)
+        self.assertEqual(min(stats.hourly), record(5)["joined_at"][:13])
+        self.assertEqual(stats.total, HOURLY_KEEP + 5)
+    
+    def test_removing_an_evicted_join_keeps_counters_in_sync(self):
+        stats = JoinStats()
+        for hours in range(HOURLY_KEEP + 1):
+            stats.add(record(hours))
+        hours_before = dict(stats.hourly)
+        
+        stats.remove(record(0))  # Its hour bucket was evicted
+        self.assertEqual(stats.hourly, hours_before)
+        self.assertEqual(stats.total, HOURLY_KEEP)
+        self.assertEqual(stats.with_avatar, HOURLY_KEEP)
+        
+        # Emptying a kept bucket and adding a newer hour evicts in the right order
+        stats.remove(record(1))
+        self.assertEqual(len(stats.hourly), HOURLY_KEEP - 1)
+        stats.add(record(HOURLY_KEEP + 1))
+        stats.add(record(HOURLY_KEEP + 2))
+        self.assertEqual(len(stats.hourly), HOURLY_KEEP)
+        self.assertEqual(min(stats.hourly), record(3)["joined_at"][:13])
+    
+    def test_restored_counters_keep_evicting(self):
+        stats = JoinStats()
+        for hours in range(HOURLY_KEEP):
+            stats.add(record(hours))
+        restored = JoinStats.from_dict(stats.to_dict())
+        restored.add(record(HOURLY_KEEP))
+        self.assertEqual(len(restored.hourly), HOURLY_KEEP)
+        self.assertNotIn(record(0)["joined_at"][:13], restored.hourly)
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,66 @@
+"""
+Tests for the scheduler's one-shot jobs.
+Run with: python -m pytest test_scheduler.py
+"""
+
+import asyncio
+import time
+import unittest
+from scheduler import Scheduler
+
+class OneShotJobTest(unittest.TestCase):
+    """A one-shot job re-armed during its run must not overlap itself."""
+    
+    def test_rearm_during_run_does_not_overlap(self):
+        async def scenario():
+            scheduler = Scheduler()
+            scheduler.start()
+            release = asyncio.Event()
+            state = {"active": 0, "peak": 0, "runs": 0}
+            
+            async def report():
+                state["active"] += 1
+                state["peak"] = max(state["peak"], state["active"])
+                state["runs"] += 1
+                if state["runs"] == 1:
+                    # Re-arm the same name mid-run, like a report scheduling the next one
+                    scheduler.call_at(time.monotonic(), "report", report)
+                    await release.wait()
+                state["active"] -= 1
+            
+            job = scheduler.call_later(0, "report", report)
+            await asyncio.sleep(0.05)
+            self.assertEqual(state["runs"], 1)
+            self.assertIs(scheduler.jobs.get("report"), job)
+            
+            release.set()
+            await asyncio.sleep(0.05)
+            await scheduler.stop()
+            return state, scheduler.jobs
+        
+        state, jobs = asyncio.run(scenario())
+        self.assertEqual(state["peak"], 1)
+        self.assertEqual(state["runs"], 2)
+        self.assertNotIn("report", jobs)
+    
+    def test_finished_job_is_forgotten(self):
+        async def scenario():
+            scheduler = Scheduler()
+            scheduler.start()
+            calls = []
+            scheduler.call_later(0, "sync", lambda: calls.append("sync"))
+            
+            async def coro():
+                calls.append("coro")
+            
+            scheduler.call_later(0, "coro", coro)
+            await asyncio.sleep(0.05)
+            await scheduler.stop()
+            return calls, scheduler.jobs
+        
+        calls, jobs = asyncio.run(scenario())
+        self.assertEqual(sorted(calls), ["coro", "sync"])
+        self.assertEqual(jobs, {})
+
+if __name__ == "__main__":
+    unittest.main()
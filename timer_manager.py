@@ -1,35 +1,53 @@
 """
-Timer and shutdown manager for Discord Member Tracking Bot.
-Handles auto-disable timer and graceful shutdown sequence.
+Timer manager for Discord Member Tracking Bot.
+Schedules the auto-disable shutdown and the periodic status log on the
+Scheduler (see scheduler.py); the shutdown itself is run by the
+ShutdownCoordinator (see shutdown.py).
 """
 
-import asyncio
 from datetime import datetime, timedelta
-from logger import log, log_success, log_warning
+from logger import log, log_warning
+from shutdown import ShutdownCoordinator
 
 class TimerManager:
-    """Manages the auto-disable timer and shutdown sequence."""
+    """Manages the auto-disable timer and status logs."""
     
-    def __init__(self, hours, bot, data_manager, reporter=None):
+    def __init__(self, hours, bot, data_manager, reporter=None, join_pipeline=None, coordinator=None):
         """
         Initialize the timer manager.
         
         Args:
-            hours: Number of hours until auto-shutdown
+            hours: Number of hours until auto-shutdown (0 = never)
             bot: Discord bot instance
             data_manager: DataManager instance
             reporter: Optional Reporter instance for final report
+            join_pipeline: Optional JoinPipeline drained before saving
+            coordinator: ShutdownCoordinator to run (default: a new one for
+                this bot, data manager, reporter and pipeline)
         """
         self.hours = hours
         self.bot = bot
         self.data_manager = data_manager
         self.reporter = reporter
+        self.join_pipeline = join_pipeline
         self.start_time = datetime.now()
-        self.end_time = self.start_time + timedelta(hours=hours)
+        self.end_time = self.start_time + timedelta(hours=hours) if hours > 0 else None
         self.shutdown_triggered = False
+        if coordinator is None:
+            coordinator = ShutdownCoordinator(bot, data_manager)
+            coordinator.reporter = reporter
+            coordinator.join_pipeline = join_pipeline
+            from config import Config
+            if Config.TELEGRAM_BOT_TOKEN and Config.TELEGRAM_CHAT_ID:
+                from telegram_sender import get_telegram_sender
+                coordinator.telegram_sender = get_telegram_sender(Config.TELEGRAM_BOT_TOKEN, Config.TELEGRAM_CHAT_ID)
+                coordinator.telegram_sender.compress_uploads = Config.COMPRESS_UPLOADS
+        self.coordinator = coordinator
     
     def get_remaining_time(self):
         """Get remaining time as a formatted string."""
+        if self.end_time is None:
+            return "no auto-disable"
         remaining = self.end_time - datetime.now()
         if remaining.total_seconds() <= 0:
             return "0h 0m"
@@ -38,27 +56,36 @@ class TimerManager:
         minutes = int((remaining.total_seconds() % 3600) // 60)
         return f"{hours}h {minutes}m"
     
-    async def start(self):
-        """Start the timer and monitor for expiration."""
-        log(f"Timer set: Bot will auto-disable in {self.hours} hours")
-        log(f"Shutdown scheduled for: {self.end_time.strftime('%Y-%m-%d %H:%M:%S')}")
+    def start(self, scheduler, status_interval=3600):
+        """
+        Schedule the auto-disable shutdown and the status log.
         
-        # Check timer every minute
-        while not self.shutdown_triggered:
-            await asyncio.sleep(60)  # Check every minute
-            
-            remaining = self.end_time - datetime.now()
-            
-            # Log status every hour
-            if remaining.total_seconds() % 3600 < 60:
-                total_joins = self.data_manager.get_total_joins_all_servers()
-                log(f"Status: {total_joins} members tracked (all servers) | Time remaining: {self.get_remaining_time()}")
-            
-            # Check if timer expired
-            if remaining.total_seconds() <= 0:
-                log_warning("Timer expired - initiating shutdown")
-                await self.shutdown("Timer expired")
-                break
+        Args:
+            scheduler: Running Scheduler
+            status_interval: Seconds between status log lines
+        """
+        if self.end_time is not None:
+            scheduler.call_later(self.hours * 3600, "auto-disable", self._expire)
+            log(f"Timer set: Bot will auto-disable in {self.hours} hours")
+            log(f"Shutdown scheduled for: {self.end_time.strftime('%Y-%m-%d %H:%M:%S')}")
+        scheduler.every(status_interval, "status-log", self.log_status)
+    
+    def log_status(self):
+        """
+        Log the tracked member count and the time left.
+        
+        Runs on the event loop, so only counters already in memory are
+        summed; a server whose history was not read yet is not loaded for it.
+        """
+        total_joins = self.data_manager.get_total_joins_all_servers(indexed_only=True)
+        unindexed = self.data_manager.count_unindexed()
+        scope = f"{unindexed} server(s) not loaded yet" if unindexed else "all servers"
+        log(f"Status: {total_joins} members tracked ({scope}) | Time remaining: {self.get_remaining_time()}")
+    
+    async def _expire(self):
+        """Scheduler job: the timer ran out."""
+        log_warning("Timer expired - initiating shutdown")
+        await self.shutdown("Timer expired")
     
     async def shutdown(self, reason="Manual shutdown"):
         """
@@ -71,43 +98,4 @@ class TimerManager:
             return  # Prevent multiple shutdowns
         
         self.shutdown_triggered = True
-        
-        log("="*60)
-        log(f"SHUTDOWN INITIATED: {reason}")
-        log("="*60)
-        
-        # Step 1: Save all data for all servers
-        total_joins = self.data_manager.get_total_joins_all_servers()
-        log(f"Final stats: {total_joins} members tracked across all servers")
-        
-        # Save each server's data
-        for server_dm in self.data_manager.get_all_servers():
-            if server_dm.save_data():
-                log_success(f"[{server_dm.server_name}] Data saved to: {server_dm.filename}")
-            else:
-                log_warning(f"[{server_dm.server_name}] Failed to save data to file")
-        
-        # Step 2: Send files to Telegram if configured
-        from config import Config
-        if Config.TELEGRAM_BOT_TOKEN and Config.TELEGRAM_CHAT_ID:
-            try:
-                from telegram_sender import TelegramSender
-                log("📱 Sending data files to Telegram...")
-                telegram = TelegramSender(Config.TELEGRAM_BOT_TOKEN, Config.TELEGRAM_CHAT_ID)
-                await telegram.send_all_data_files(self.data_manager)
-                log_success("All files sent to Telegram successfully!")
-            except Exception as e:
-                log_warning(f"Failed to send files to Telegram: {e}")
-        
-        # Step 3: Send final report to Discord if reporter is configured
-        if self.reporter:
-            try:
-                await self.reporter.send_final_report(reason)
-            except Exception as e:
-                log_warning(f"Failed to send final report: {e}")
-        
-        # Step 4: Disconnect from Discord
-        log("Disconnecting from Discord...")
-        await self.bot.close()
-        log_success("Bot disconnected successfully")
-        log("="*60)
+        await self.coordinator.shutdown(reason)
@@ -0,0 +1,229 @@
+"""
+On-disk user_id index for Discord Member Tracking Bot.
+With a hot window a server's history stays on disk, but rejoin detection
+still needs to know how many times each user joined. Kept as a dict, that
+index grows with every unique joiner. UserIndex keeps it in a small SQLite
+file next to the server's data file instead (join_logs_ServerName_123456.users.db)
+and holds only recently seen users and the changes since the last save in
+memory.
+
+The file is stamped with the number of records and the journal_seq it
+covers and is saved right before the sidecar, which carries the same
+values. Recovery then applies the same journal tail to both; a stamp that
+does not match the sidecar (a crash between the two writes) means the
+index is rebuilt from the history.
+"""
+
+import sqlite3
+import threading
+from collections import OrderedDict
+from logger import log_error
+
+USER_CACHE_SIZE = 10000  # Recently seen users whose counts stay in memory
+REBUILD_BATCH = 10000  # Joins counted per write while the index is rebuilt
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS user_counts (
+    user_id TEXT PRIMARY KEY,
+    count INTEGER NOT NULL
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS stamp (
+    key TEXT PRIMARY KEY,
+    value INTEGER NOT NULL
+);
+"""
+
+UPSERT_COUNT = ("INSERT INTO user_counts (user_id, count) VALUES (?, ?) "
+                "ON CONFLICT(user_id) DO UPDATE SET count = count + excluded.count")
+
+
+class UserIndex:
+    """
+    Join count per user_id, stored in SQLite with a small in-memory cache.
+    
+    Supports the part of the dict interface the data manager uses (get,
+    item assignment and len), so it can stand in for user_counts. Counts
+    read or changed recently are cached; joins recorded since the last
+    save are kept as increments until save writes them.
+    """
+    
+    def __init__(self, path, cache_size=USER_CACHE_SIZE):
+        """
+        Initialize the index. The database is opened on first use.
+        
+        Args:
+            path: Path to the SQLite file
+            cache_size: Users whose counts are kept in memory
+        """
+        self.path = path
+        self.cache_size = cache_size
+        self._conn = None
+        self._lock = threading.Lock()  # Used from the event loop and the flusher thread
+        self._cache = OrderedDict()  # user_id -> count, least recently used first
+        self._changes = {}  # user_id -> joins counted since the last save
+        self._new = set()  # user_ids first seen since the last save
+        self._stored = None  # Users in the database, read on first use
+    
+    def _db(self):
+        """Get the connection, opening the database if needed. Caller holds _lock."""
+        if self._conn is None:
+            self._conn = sqlite3.connect(self.path, check_same_thread=False)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("PRAGMA synchronous=NORMAL")
+            self._conn.executescript(SCHEMA)
+        return self._conn
+    
+    def stamp(self):
+        """
+        Get what the stored counts cover.
+        
+        Returns:
+            Tuple of (records, journal_seq), or None if the index was never saved
+            or a rebuild did not finish
+        """
+        with self._lock:
+            rows = dict(self._db().execute("SELECT key, value FROM stamp"))
+        if "records" not in rows:
+            return None
+        return rows["records"], rows.get("journal_seq", 0)
+    
+    def get(self, user_id, default=0):
+        """
+        Get a user's join count.
+        
+        Args:
+            user_id: Discord user ID (string)
+            default: Returned if the user never joined
+        
+        Returns:
+            Number of recorded joins
+        """
+        with self._lock:
+            count = self._lookup(user_id)
+        return count or default
+    
+    def __setitem__(self, user_id, count):
+        """Set a user's join count (the data manager only ever raises it by one)."""
+        with self._lock:
+            old = self._lookup(user_id)
+            self._changes[user_id] = self._changes.get(user_id, 0) + count - old
+            self._cache[user_id] = count
+            if not old and count:
+                self._new.add(user_id)
+    
+    def __len__(self):
+        """Get the number of unique users."""
+        with self._lock:
+            if self._stored is None:
+                self._stored = self._db().execute("SELECT COUNT(*) FROM user_counts").fetchone()[0]
+            return self._stored + len(self._new)
+    
+    def _lookup(self, user_id):
+        """Get a count from the cache or the database. Caller holds _lock."""
+        count = self._cache.get(user_id)
+        if count is not None:
+            self._cache.move_to_end(user_id)
+            return count
+        row = self._db().execute("SELECT count FROM user_counts WHERE user_id = ?", (user_id,)).fetchone()
+        count = (row[0] if row else 0) + self._changes.get(user_id, 0)
+        self._cache[user_id] = count
+        if len(self._cache) > self.cache_size:
+            self._cache.popitem(last=False)
+        return count
+    
+    def changes(self, exclude=()):
+        """
+        Get the increments to save, leaving out joins that are not on disk yet.
+        
+        Args:
+            exclude: user_ids of pending joins, once per join
+        
+        Returns:
+            Dictionary of user_id -> increment
+        """
+        with self._lock:
+            changes = dict(self._changes)
+        for user_id in exclude:
+            changes[user_id] = changes.get(user_id, 0) - 1
+        return {user_id: count for user_id, count in changes.items() if count}
+    
+    def save(self, changes, records, journal_seq=0):
+        """
+        Write saved increments and the new stamp in one transaction.
+        
+        Args:
+            changes: Increments from changes()
+            records: Number of records the index now covers
+            journal_seq: Journal sequence number it covers
+        
+        Returns:
+            True if the index was written
+        """
+        try:
+            with self._lock:
+                with self._db() as conn:
+                    conn.executemany(UPSERT_COUNT, changes.items())
+                    conn.executemany("INSERT OR REPLACE INTO stamp (key, value) VALUES (?, ?)",
+                                     (("records", records), ("journal_seq", journal_seq)))
+                for user_id, count in changes.items():
+                    left = self._changes.get(user_id, 0) - count
+                    if left:
+                        self._changes[user_id] = left
+                    else:
+                        self._changes.pop(user_id, None)
+                    if user_id in self._new:
+                        # Now stored; counted again when _stored is next read
+                        self._new.discard(user_id)
+                        if self._stored is not None:
+                            self._stored += 1
+            return True
+        except sqlite3.Error as e:
+            log_error(f"Failed to save user index {self.path}: {e}")
+            return False
+    
+    def revert(self):
+        """Drop everything not saved yet, going back to the stored counts."""
+        with self._lock:
+            self._cache.clear()
+            self._changes.clear()
+            self._new.clear()
+            self._stored = None
+    
+    def clear(self):
+        """
+        Remove every stored count before a rebuild.
+        
+        The stamp goes first, so a crash part way through the rebuild leaves
+        an index that is rebuilt again. Rebuilt counts are added with
+        add_stored and stamped with save.
+        """
+        with self._lock:
+            self._cache.clear()
+            self._changes.clear()
+            self._new.clear()
+            self._stored = None
+            with self._db() as conn:
+                conn.execute("DELETE FROM stamp")
+                conn.execute("DELETE FROM user_counts")
+    
+    def add_stored(self, user_ids):
+        """
+        Count joins straight into the database while rebuilding.
+        
+        Args:
+            user_ids: user_id of each join, a batch of the history at a time
+        """
+        counts = {}
+        for user_id in user_ids:
+            counts[user_id] = counts.get(user_id, 0) + 1
+        with self._lock:
+            with self._db() as conn:
+                conn.executemany(UPSERT_COUNT, counts.items())
+            self._stored = None
+    
+    def close(self):
+        """Close the database connection if it is open."""
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None